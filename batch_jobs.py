@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""Resumable batch jobs with a SQLite index and HDF5 results.
+
+A job is a directory that holds:
+
+* ``jobs.sqlite``, the index, with one row per spec: its parameters, its
+  status (``pending``, ``running``, ``done`` or ``failed``), the error of a
+  failed spec and the location of its results;
+* ``results.h5``, with one group ``/points/<spec index>`` per solved spec.
+  The group holds the mode properties (one value per mode) as datasets.
+
+Each spec is written to the HDF5 file and marked ``done`` in the index as
+soon as it is solved.  A crash or an interrupt therefore loses at most the
+specs in flight, and ``resume`` solves only the specs that are not done::
+
+    python -m batch_jobs run specs.json overnight/
+    python -m batch_jobs resume overnight/
+    python -m batch_jobs status overnight/
+    python -m batch_jobs export overnight/ results.csv
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from solver_cache import SolveCache
+from waveguide_solver import MODE_PROPERTIES, WaveguideSpec, mode_properties, solve, write_results
+
+INDEX_NAME = "jobs.sqlite"
+RESULTS_NAME = "results.h5"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATUSES = (PENDING, RUNNING, DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS points (
+    spec_index INTEGER PRIMARY KEY,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    solve_time REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS points_status ON points (status);
+"""
+
+
+class BatchJob:
+    """A batch job directory: the SQLite index and the HDF5 result file.
+
+    Open an existing job with ``BatchJob(path)`` and create one with
+    :meth:`create`.  ``server`` and ``cache_dir`` (``None`` for no cache) are
+    stored with the job so that a resumed job solves the same way.  Set
+    ``server`` to a :class:`server_pool.LocalServer` to run server jobs
+    without network access.
+    """
+
+    def __init__(self, path):
+        index_path = os.path.join(path, INDEX_NAME)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError("No batch job in '{}'.".format(path))
+        self.path = path
+        self.results_path = os.path.join(path, RESULTS_NAME)
+        self._db = sqlite3.connect(index_path)
+        settings = dict(self._db.execute("SELECT name, value FROM settings"))
+        self.server = json.loads(settings.get("server", "false"))
+        self.cache_dir = json.loads(settings.get("cache_dir", "null"))
+
+    @classmethod
+    def create(cls, path, specs, server=False, cache_dir=None):
+        """Create a job directory for ``specs`` with every spec pending."""
+        index_path = os.path.join(path, INDEX_NAME)
+        if os.path.exists(index_path):
+            raise FileExistsError("'{}' already holds a batch job; resume it instead.".format(path))
+        os.makedirs(path, exist_ok=True)
+        db = sqlite3.connect(index_path)
+        with db:
+            db.executescript(SCHEMA)
+            db.executemany("INSERT INTO settings VALUES (?, ?)",
+                           [("server", json.dumps(server)), ("cache_dir", json.dumps(cache_dir))])
+            db.executemany("INSERT INTO points (spec_index, params, updated) VALUES (?, ?, ?)",
+                           [(index, json.dumps(spec.to_dict()), time.time()) for index, spec in enumerate(specs)])
+        db.close()
+        return cls(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def counts(self):
+        """Number of specs per status."""
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self._db.execute("SELECT status, COUNT(*) FROM points GROUP BY status"))
+        return counts
+
+    def specs(self, statuses=STATUSES):
+        """``(spec index, spec)`` of the specs with one of ``statuses``, in index order."""
+        rows = self._db.execute(
+            "SELECT spec_index, params FROM points WHERE status IN ({}) ORDER BY spec_index".format(
+                ", ".join("?" * len(statuses))), tuple(statuses))
+        return [(index, WaveguideSpec.from_dict(json.loads(params))) for index, params in rows]
+
+    def _set_status(self, indices, status, error=None, result=None, solve_time=None):
+        with self._db:
+            self._db.executemany(
+                "UPDATE points SET status = ?, error = ?, result = ?, solve_time = ?, updated = ?,"
+                " attempts = attempts + ? WHERE spec_index = ?",
+                [(status, error, result, solve_time, time.time(), int(status == RUNNING), index)
+                 for index in indices])
+
+    def _write_point(self, index, mode_data):
+        """Write the mode properties of one spec to the HDF5 file and return the group name."""
+        import h5py
+
+        modes = mode_properties(mode_data)
+        group_name = "points/{}".format(index)
+        with h5py.File(self.results_path, "a") as f:
+            # Left over from a run that stopped before marking the spec done
+            if group_name in f:
+                del f[group_name]
+            group = f.create_group(group_name)
+            for name in MODE_PROPERTIES:
+                group.create_dataset(name, data=np.array([mode[name] for mode in modes]))
+        return group_name
+
+    def _finish(self, index, result, solve_time, log):
+        if isinstance(result, Exception):
+            self._set_status([index], FAILED, error=str(result), solve_time=solve_time)
+            if log is not None:
+                log.write("Spec {} failed: {}\n".format(index, result))
+            return
+        group_name = self._write_point(index, result)
+        self._set_status([index], DONE, result=group_name, solve_time=solve_time)
+        if log is not None:
+            counts = self.counts()
+            log.write("Solved spec {} ({} of {} done)\n".format(index, counts[DONE], sum(counts.values())))
+
+    def run(self, retry_failed=False, limit=None, max_concurrent=None, log=None, on_point=None):
+        """Solve the specs that are not done and return the status counts.
+
+        Specs left ``running`` by an interrupted run are solved again; failed
+        specs only with ``retry_failed``.  ``limit`` caps the number of specs
+        solved in this call.  ``on_point(spec_index)`` is called after each
+        spec is recorded.
+        """
+        statuses = (PENDING, RUNNING, FAILED) if retry_failed else (PENDING, RUNNING)
+        todo = self.specs(statuses)[:limit]
+        cache = None if self.cache_dir is None else SolveCache(self.cache_dir)
+
+        if self.server:
+            from server_pool import DEFAULT_MAX_CONCURRENT, ServerPool
+
+            self._set_status([index for index, _ in todo], RUNNING)
+            pool = ServerPool(
+                max_concurrent=max_concurrent or DEFAULT_MAX_CONCURRENT,
+                server=None if self.server is True else self.server,
+                cache=cache,
+            )
+            with pool:
+                for position, spec, result in pool.solve_specs([spec for _, spec in todo]):
+                    index = todo[position][0]
+                    # The run time of the spec's own job; NULL for cached results
+                    self._finish(index, result, pool.solve_times[position], log)
+                    if on_point is not None:
+                        on_point(index)
+        else:
+            for index, spec in todo:
+                self._set_status([index], RUNNING)
+                start = time.perf_counter()
+                try:
+                    result = solve(spec, cache=cache)
+                except Exception as e:
+                    result = e
+                self._finish(index, result, time.perf_counter() - start, log)
+                if on_point is not None:
+                    on_point(index)
+        return self.counts()
+
+    def results(self):
+        """Flat result rows of the finished specs, like :func:`waveguide_solver.run_batch`."""
+        import h5py
+
+        points = self._db.execute(
+            "SELECT spec_index, params, status, error, result FROM points WHERE status IN (?, ?)"
+            " ORDER BY spec_index", (DONE, FAILED)).fetchall()
+        rows = []
+        f = h5py.File(self.results_path, "r") if os.path.exists(self.results_path) else None
+        try:
+            for index, params, status, error, result in points:
+                base = {"spec_index": index}
+                base.update(json.loads(params))
+                if status == FAILED:
+                    base["error"] = error
+                    rows.append(base)
+                    continue
+                group = f[result]
+                for mode_index in range(len(group[MODE_PROPERTIES[0]])):
+                    row = dict(base)
+                    row["mode_index"] = mode_index
+                    row.update((name, float(group[name][mode_index])) for name in MODE_PROPERTIES)
+                    rows.append(row)
+        finally:
+            if f is not None:
+                f.close()
+        return rows
+
+
+def _summary(counts):
+    return ", ".join("{} {}".format(counts[status], status) for status in STATUSES)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m batch_jobs",
+                                     description="Run resumable batches of waveguide solves.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="create a job for a spec file and run it")
+    run.add_argument("specs", help="JSON or CSV file with one waveguide spec per entry")
+    run.add_argument("job", help="job directory (created)")
+    run.add_argument("--server", action="store_true", help="solve on the Flexcompute server")
+    run.add_argument("--cache-dir", default=None,
+                     help="directory of the result cache (default: ~/.cache/tidy3d-mode-explorer)")
+    run.add_argument("--no-cache", action="store_true", help="do not read or write the result cache")
+
+    resume = subparsers.add_parser("resume", help="solve the specs of a job that are not done")
+    resume.add_argument("job", help="job directory")
+    resume.add_argument("--retry-failed", action="store_true", help="solve failed specs again")
+
+    for command in (run, resume):
+        command.add_argument("--limit", type=int, default=None, help="solve at most this many specs")
+        command.add_argument("--workers", type=int, default=None,
+                             help="server jobs in flight (server jobs only; default: 8)")
+        command.add_argument("-o", "--output", default=None,
+                             help="JSON or CSV file to export the results to when the run ends")
+
+    status = subparsers.add_parser("status", help="show the spec counts of a job")
+    status.add_argument("job", help="job directory")
+
+    export = subparsers.add_parser("export", help="write the results of a job to a JSON or CSV file")
+    export.add_argument("job", help="job directory")
+    export.add_argument("output", help="JSON or CSV file")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        from waveguide_solver import load_specs
+
+        cache_dir = None if args.no_cache else (args.cache_dir or SolveCache().cache_dir)
+        try:
+            job = BatchJob.create(args.job, load_specs(args.specs), server=args.server, cache_dir=cache_dir)
+        except FileExistsError as e:
+            parser.error(str(e))
+    else:
+        try:
+            job = BatchJob(args.job)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+
+    with job:
+        if args.command in ("run", "resume"):
+            try:
+                job.run(retry_failed=getattr(args, "retry_failed", False), limit=args.limit,
+                        max_concurrent=args.workers, log=sys.stderr)
+            except KeyboardInterrupt:
+                sys.stderr.write("Interrupted; continue with: python -m batch_jobs resume {}\n".format(args.job))
+                return 130
+        output = args.output if args.command != "status" else None
+        if output is not None:
+            rows = job.results()
+            write_results(output, rows)
+            sys.stderr.write("Wrote {} rows to {}\n".format(len(rows), output))
+        counts = job.counts()
+        print("{}: {}".format(args.job, _summary(counts)))
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Startup-time benchmark of the GUI.
+
+Every run starts a fresh interpreter and records, in seconds since the
+interpreter started the benchmark code:
+
+* ``import``: ``import waveguide_gui`` finished
+* ``first_paint``: the main window has been drawn
+* ``plot_ready``: the cross-section preview has been drawn
+
+Usage::
+
+    python benchmark_startup.py [--runs 5] [--json]
+
+A display is needed (e.g. ``xvfb-run python benchmark_startup.py``).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+# Measurements made in the child interpreter
+STARTUP_PHASES = ("import", "first_paint", "plot_ready")
+
+_CHILD_CODE = """
+import json, time
+start = time.perf_counter()
+import tkinter as tk
+import waveguide_gui
+times = {"import": time.perf_counter() - start}
+root = tk.Tk()
+app = waveguide_gui.WaveguideGUI(root)
+root.update()
+times["first_paint"] = time.perf_counter() - start
+while app.preview is None or app.preview.key is None:
+    root.update()
+    time.sleep(0.005)
+root.update()
+times["plot_ready"] = time.perf_counter() - start
+app.solve_worker.shutdown()
+root.destroy()
+print(json.dumps(times))
+"""
+
+
+def measure_startup():
+    """Start the GUI in a new interpreter and return its startup times."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD_CODE],
+        cwd=here,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_startup_benchmark(runs=5):
+    """Median startup time of every phase over ``runs`` runs."""
+    samples = [measure_startup() for _ in range(runs)]
+    return {phase: float(np.median([s[phase] for s in samples])) for phase in STARTUP_PHASES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure GUI startup time.")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh starts (default: 5)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        results = run_startup_benchmark(args.runs)
+    except subprocess.CalledProcessError as e:
+        print("GUI failed to start:\n{}".format(e.stderr), file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for phase in STARTUP_PHASES:
+            print("{:<12} {:8.3f} s".format(phase, results[phase]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
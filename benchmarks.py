@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite for the build, solve and render hot paths.
+
+Cases are named ``<kind>/<details>``:
+
+* ``build/<type>``: building the waveguide, as the GUI does for every plot
+  and solve
+* ``grid/<type>``: building the waveguide's mode solver and its grid
+* ``solve/<type>/res<R>/modes<M>``: an uncached local mode solve
+* ``render/field``, ``render/field_update`` and ``render/preview``: drawing
+  a mode field in a new figure, switching the field of an existing plot and
+  updating the cross-section preview on an off-screen canvas
+* ``tracking/steps<N>``: matching the modes of ``N`` sweep steps (4 modes)
+  by their field overlaps
+* ``startup/<phase>`` (``--startup``, needs a display): see
+  :mod:`benchmark_startup`
+
+Each run is appended to a JSON history file.  With ``--compare`` every case
+is compared with its latest earlier result in the history, and cases that got
+slower than the threshold are reported as regressions (exit code 1)::
+
+    python benchmarks.py --compare [-k solve/strip] [--repeat 3]
+"""
+import argparse
+import datetime
+import fnmatch
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from mesh_refinement import grid_shape
+from waveguide_solver import WAVEGUIDE_TYPES, WaveguideSpec, build_waveguide, solve_waveguide
+
+DEFAULT_HISTORY = "benchmark_history.json"
+
+# Relative slowdown of a case that is reported as a regression
+DEFAULT_THRESHOLD = 0.2
+
+# (waveguide type, grid resolution, number of modes) of the solve cases
+SOLVE_CASES = (
+    ("strip", 20, 1),
+    ("rib", 20, 1),
+    ("slot", 20, 1),
+    ("strip", 10, 1),
+    ("strip", 30, 1),
+    ("strip", 20, 2),
+    ("strip", 20, 4),
+)
+
+
+def _time_calls(setup, func, repeat):
+    """Times of ``repeat`` calls of ``func(setup())``, excluding the setup."""
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _build_case(waveguide_type):
+    spec = WaveguideSpec(waveguide_type=waveguide_type)
+    return lambda repeat: _time_calls(lambda: spec, build_waveguide, repeat)
+
+
+def _grid_case(waveguide_type):
+    spec = WaveguideSpec(waveguide_type=waveguide_type)
+    return lambda repeat: _time_calls(lambda: spec, lambda s: grid_shape(build_waveguide(s)), repeat)
+
+
+def _solve_case(waveguide_type, grid_resolution, num_modes):
+    spec = WaveguideSpec(waveguide_type=waveguide_type, grid_resolution=grid_resolution, num_modes=num_modes)
+    # A new waveguide per call so that no solver data is reused
+    return lambda repeat: _time_calls(lambda: build_waveguide(spec), solve_waveguide, repeat)
+
+
+def _render_field(repeat):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from field_storage import store_modes
+    from mode_browser import render_mode_figure
+
+    waveguide = build_waveguide(WaveguideSpec())
+    modes = store_modes(solve_waveguide(waveguide), retention="full")
+
+    def render(_):
+        fig = render_mode_figure(waveguide, modes, 0)
+        FigureCanvasAgg(fig).draw()
+
+    return _time_calls(lambda: None, render, repeat)
+
+
+def _update_field(repeat):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from field_storage import store_modes
+    from mode_browser import FieldView
+
+    waveguide = build_waveguide(WaveguideSpec(num_modes=2))
+    modes = store_modes(solve_waveguide(waveguide), retention="full")
+    fig = Figure(figsize=(6, 4))
+    canvas = FigureCanvasAgg(fig)
+    view = FieldView(fig)
+    view.show(waveguide, modes, 0)
+    canvas.draw()
+    # Alternate between modes, fields and values on the same plot
+    fields = itertools.cycle([(1, "Ey", "real"), (0, "E", "abs")])
+
+    def update(args):
+        mode_index, field, val = args
+        view.show(waveguide, modes, mode_index, field=field, val=val)
+        canvas.draw()
+
+    return _time_calls(lambda: next(fields), update, repeat)
+
+
+def _render_preview(repeat):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from geometry_preview import GeometryPreview
+
+    fig = Figure(figsize=(6, 4))
+    canvas = FigureCanvasAgg(fig)
+    preview = GeometryPreview(fig.add_subplot(111))
+    widths = iter(np.linspace(0.4, 0.8, repeat + 1))
+    preview.update(WaveguideSpec(core_width=next(widths)), build_waveguide)
+    canvas.draw()
+
+    def update(spec):
+        preview.update(spec, build_waveguide)
+        canvas.draw()
+
+    return _time_calls(lambda: WaveguideSpec(core_width=next(widths)), update, repeat)
+
+
+def _track_case(num_steps):
+    def timer(repeat):
+        from mode_tracking import track_modes, tracking_fields
+
+        fields = tracking_fields(solve_waveguide(build_waveguide(WaveguideSpec(num_modes=4))))
+        # The same modes in a new solver order at every step
+        rng = np.random.default_rng(0)
+        steps = [fields.reorder(rng.permutation(fields.num_modes)) for _ in range(num_steps)]
+        return _time_calls(lambda: steps, track_modes, repeat)
+
+    return timer
+
+
+def benchmark_cases(startup=False):
+    """Dictionary of case name -> ``timer(repeat)`` returning a list of times."""
+    cases = {}
+    for waveguide_type in WAVEGUIDE_TYPES:
+        cases["build/" + waveguide_type] = _build_case(waveguide_type)
+    for waveguide_type in WAVEGUIDE_TYPES:
+        cases["grid/" + waveguide_type] = _grid_case(waveguide_type)
+    for waveguide_type, grid_resolution, num_modes in SOLVE_CASES:
+        name = "solve/{}/res{}/modes{}".format(waveguide_type, grid_resolution, num_modes)
+        cases[name] = _solve_case(waveguide_type, grid_resolution, num_modes)
+    cases["render/field"] = _render_field
+    cases["render/field_update"] = _update_field
+    cases["render/preview"] = _render_preview
+    cases["tracking/steps500"] = _track_case(500)
+    if startup:
+        from benchmark_startup import STARTUP_PHASES, measure_startup
+        samples = {}
+
+        def startup_case(phase):
+            def timer(repeat):
+                # All phases are measured by the same GUI starts
+                if not samples:
+                    samples.update(enumerate(measure_startup() for _ in range(repeat)))
+                return [sample[phase] for sample in samples.values()]
+            return timer
+
+        for phase in STARTUP_PHASES:
+            cases["startup/" + phase] = startup_case(phase)
+    return cases
+
+
+def run_benchmarks(pattern=None, repeat=3, startup=False, log=None):
+    """Run the cases matching the glob ``pattern`` and return a history record."""
+    # Import the solver outside of the timed cases
+    build_waveguide(WaveguideSpec())
+    import tidy3d
+
+    results = {}
+    for name, timer in benchmark_cases(startup).items():
+        if pattern is not None and not fnmatch.fnmatch(name, pattern + "*"):
+            continue
+        times = timer(repeat)
+        results[name] = {
+            "min": float(np.min(times)),
+            "median": float(np.median(times)),
+            "repeat": len(times),
+        }
+        if log is not None:
+            log("{:<28} {:8.4f} s (median {:.4f} s)".format(name, results[name]["min"], results[name]["median"]))
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "tidy3d": tidy3d.__version__,
+        "machine": platform.node(),
+        "results": results,
+    }
+
+
+def load_history(path):
+    """Runs stored in a history file, oldest first (empty if it does not exist)."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_history(path, record):
+    """Append a run to a history file."""
+    history = load_history(path)
+    history.append(record)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def latest_results(history):
+    """A run made of the most recent result of every case in the history."""
+    results = {}
+    for record in history:
+        results.update(record["results"])
+    return {"timestamp": history[-1]["timestamp"] if history else None, "results": results}
+
+
+def compare_runs(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compare the best times of the cases two runs have in common.
+
+    Returns a list of ``(name, baseline_time, current_time, ratio, regressed)``
+    where ``regressed`` is True if the case got slower by more than
+    ``threshold`` (a fraction).
+    """
+    rows = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        old = baseline["results"][name]["min"]
+        new = result["min"]
+        ratio = new / old if old > 0 else float("inf")
+        rows.append((name, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python benchmarks.py",
+        description="Time the waveguide build, solve and render hot paths."
+    )
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name starts with this glob")
+    parser.add_argument("--repeat", type=int, default=3, help="calls per case (default: 3)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="history file (default: %(default)s)")
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    parser.add_argument("--compare", action="store_true", help="compare with the previous results in the history")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown reported as a regression (default: %(default)s)")
+    parser.add_argument("--startup", action="store_true", help="also measure GUI startup (needs a display)")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    record = run_benchmarks(args.pattern, args.repeat, args.startup, log=print)
+    if not args.no_save:
+        append_history(args.history, record)
+
+    if not args.compare:
+        return 0
+    if not history:
+        print("No previous run in {} to compare with.".format(args.history))
+        return 0
+
+    baseline = latest_results(history)
+    print("\nCompared with the previous results (last run {}):".format(baseline["timestamp"]))
+    regressions = 0
+    for name, old, new, ratio, regressed in compare_runs(baseline, record, args.threshold):
+        regressions += regressed
+        print("{:<28} {:8.4f} s -> {:8.4f} s ({:+.0%}){}".format(
+            name, old, new, ratio - 1, "  REGRESSION" if regressed else ""))
+    if regressions:
+        print("{} regression(s) beyond {:.0%}.".format(regressions, args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
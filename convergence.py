@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Automatic grid-convergence study of a waveguide spec.
+
+The spec is solved at geometrically increasing grid resolutions until n_eff
+changes by less than a tolerance between two resolutions.  Every solve is
+seeded with the previous fundamental n_eff as ``target_neff``.  The results
+are Richardson-extrapolated to an infinitely fine grid, and the cheapest
+resolution whose n_eff is within the tolerance of the extrapolated value is
+reported::
+
+    result = converge_grid(WaveguideSpec(), tolerance=1e-4)
+    result.extrapolated[0], result.recommended_resolution
+
+:class:`GridConvergence` holds the state of a study for callers that run the
+individual solves themselves (e.g. the GUI's background worker).
+"""
+import time
+
+import numpy as np
+
+from waveguide_solver import solve
+
+DEFAULT_TOLERANCE = 1e-4
+DEFAULT_START_RESOLUTION = 10
+DEFAULT_RATIO = 1.5
+DEFAULT_MAX_RESOLUTION = 80
+
+# Convergence order assumed when it cannot be estimated; local solves have
+# no subpixel averaging, so staircased interfaces converge to first order
+ASSUMED_ORDER = 1.0
+
+
+def resolution_steps(start=DEFAULT_START_RESOLUTION, ratio=DEFAULT_RATIO, max_resolution=DEFAULT_MAX_RESOLUTION):
+    """Geometrically increasing integer grid resolutions up to ``max_resolution``."""
+    if start < 1 or ratio <= 1:
+        raise ValueError("The start resolution must be at least 1 and the ratio greater than 1.")
+    resolutions = []
+    value = float(start)
+    while round(value) <= max_resolution:
+        if not resolutions or round(value) > resolutions[-1]:
+            resolutions.append(int(round(value)))
+        value *= ratio
+    return resolutions
+
+
+def richardson_extrapolate(resolutions, n_eff):
+    """Extrapolate n_eff to an infinitely fine grid.
+
+    ``n_eff`` has shape ``(len(resolutions), num_modes)``; the cell size is
+    taken to be proportional to ``1 / resolution``.  The convergence order is
+    estimated from the fundamental mode of the last three resolutions, or
+    ``ASSUMED_ORDER`` is used.  Returns ``(extrapolated, order)``.
+    """
+    resolutions = np.asarray(resolutions, dtype=float)
+    n_eff = np.asarray(n_eff, dtype=float)
+    if len(resolutions) < 2:
+        return n_eff[-1], np.nan
+
+    order = ASSUMED_ORDER
+    if len(resolutions) >= 3:
+        e1 = n_eff[-2, 0] - n_eff[-3, 0]
+        e2 = n_eff[-1, 0] - n_eff[-2, 0]
+        # Only trust monotone convergence
+        if e1 * e2 > 0 and abs(e2) < abs(e1):
+            r = np.sqrt(resolutions[-1] / resolutions[-3])
+            order = float(np.clip(np.log(e1 / e2) / np.log(r), 0.5, 4.0))
+
+    r = resolutions[-1] / resolutions[-2]
+    extrapolated = n_eff[-1] + (n_eff[-1] - n_eff[-2]) / (r**order - 1)
+    return extrapolated, order
+
+
+class ConvergenceResult:
+    """n_eff at every resolution solved and the extrapolated values."""
+
+    def __init__(self, resolutions, n_eff, solve_times, tolerance, converged):
+        self.resolutions = np.asarray(resolutions, dtype=int)
+        self.n_eff = np.asarray(n_eff, dtype=float)
+        self.solve_times = np.asarray(solve_times, dtype=float)
+        self.tolerance = tolerance
+        self.converged = converged
+        self.extrapolated, self.order = richardson_extrapolate(self.resolutions, self.n_eff)
+
+        # Cheapest resolution within the tolerance of the extrapolated values
+        errors = np.max(np.abs(self.n_eff - self.extrapolated), axis=1)
+        within = np.nonzero(errors < tolerance)[0]
+        self.recommended_resolution = int(self.resolutions[within[0]]) if len(within) else None
+
+    @property
+    def num_modes(self):
+        return self.n_eff.shape[1]
+
+
+class GridConvergence:
+    """Step-by-step state of a grid-convergence study.
+
+    Call :meth:`next_spec` for the next spec to solve and :meth:`add` with its
+    n_eff values until :meth:`next_spec` returns None.
+    """
+
+    def __init__(self, spec, tolerance=DEFAULT_TOLERANCE, start=DEFAULT_START_RESOLUTION,
+                 ratio=DEFAULT_RATIO, max_resolution=DEFAULT_MAX_RESOLUTION):
+        self.spec = spec
+        self.tolerance = tolerance
+        self.planned = resolution_steps(start, ratio, max_resolution)
+        if len(self.planned) < 2:
+            raise ValueError("At least two grid resolutions are needed for a convergence study.")
+        self.resolutions = []
+        self.n_eff = []
+        self.solve_times = []
+
+    @property
+    def converged(self):
+        """True once the last two resolutions agree within the tolerance."""
+        if len(self.n_eff) < 2:
+            return False
+        return float(np.max(np.abs(self.n_eff[-1] - self.n_eff[-2]))) < self.tolerance
+
+    @property
+    def done(self):
+        return self.converged or len(self.n_eff) == len(self.planned)
+
+    def next_spec(self):
+        """The spec to solve next, or None when the study is done."""
+        if self.done:
+            return None
+        # Seed the solve with the fundamental n_eff of the previous resolution
+        target = self.n_eff[-1][0] if self.n_eff else self.spec.target_neff
+        return self.spec.replace(grid_resolution=self.planned[len(self.n_eff)], target_neff=target)
+
+    def add(self, n_eff, solve_time=np.nan):
+        """Record the n_eff values (one per mode) solved for ``next_spec()``."""
+        self.resolutions.append(self.planned[len(self.n_eff)])
+        self.n_eff.append(np.asarray(n_eff, dtype=float))
+        self.solve_times.append(solve_time)
+
+    def result(self):
+        """The :class:`ConvergenceResult` of the resolutions solved so far."""
+        return ConvergenceResult(self.resolutions, self.n_eff, self.solve_times, self.tolerance, self.converged)
+
+
+def converge_grid(spec, tolerance=DEFAULT_TOLERANCE, start=DEFAULT_START_RESOLUTION, ratio=DEFAULT_RATIO,
+                  max_resolution=DEFAULT_MAX_RESOLUTION, server=False, cache=None, on_step=None):
+    """Solve ``spec`` at increasing resolutions until n_eff has converged.
+
+    ``on_step(resolution, n_eff)`` is called after every solve.  Returns a
+    :class:`ConvergenceResult`; check ``converged`` to see whether the
+    tolerance was met before ``max_resolution``.
+    """
+    study = GridConvergence(spec, tolerance, start, ratio, max_resolution)
+    step_spec = study.next_spec()
+    while step_spec is not None:
+        t0 = time.perf_counter()
+        mode_data = solve(step_spec, server=server, cache=cache)
+        n_eff = np.asarray(mode_data.n_eff.values[0], dtype=float)
+        study.add(n_eff, time.perf_counter() - t0)
+        if on_step is not None:
+            on_step(step_spec.grid_resolution, n_eff)
+        step_spec = study.next_spec()
+    return study.result()
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""Solve for the parameter value that gives a target mode property.
+
+The inverse of a solve: find the core width, core thickness (or any other
+sweepable spec field) at which one mode reaches a target n_eff or group
+index, or at which a mode reaches cutoff, i.e. its n_eff drops to the
+highest cladding index.  The parameter is searched inside a bracket with a
+safeguarded Brent-style iteration (inverse quadratic or secant steps,
+falling back to bisection), so a smooth target is usually hit in a handful
+of solves::
+
+    result = solve_for_parameter(WaveguideSpec(), "core_width", (0.4, 0.8), target=2.5)
+    result.value, result.achieved, result.evaluations
+
+Every solve inside the bracket is seeded with a ``target_neff`` interpolated
+from the solves made so far, and each parameter value is solved at most once.
+:class:`ParameterSearch` holds the state of a search for callers that run
+the individual solves themselves (e.g. the GUI's background worker).
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from sweep import SWEEP_PARAMETERS, count_eigensolver_steps, predict_neff
+from waveguide_solver import WaveguideSpec, mode_properties, solve
+
+# Mode properties that can be targeted; "cutoff" targets n_eff at the cladding index
+QUANTITIES = ("n_eff", "n_group", "cutoff")
+
+DEFAULT_XTOL = 1e-3
+DEFAULT_FTOL = 1e-4
+DEFAULT_MAX_EVALUATIONS = 20
+
+# Mode whose cutoff is searched by default: the first higher-order mode
+DEFAULT_CUTOFF_MODE = 1
+
+
+class TargetResult:
+    """Parameter values solved during a search and the best one found.
+
+    ``value`` is the parameter value whose ``quantity`` is closest to the
+    target and ``achieved`` that quantity; ``evaluations`` is the number of
+    solves made.  ``values``, ``quantities``, ``seeds`` (the ``target_neff``
+    of each solve), ``solve_times`` and ``eigensolver_steps`` (NaN unless
+    counted) are in solve order.
+    """
+
+    def __init__(self, parameter, quantity, mode_index, target, values, quantities, seeds, solve_times,
+                 eigensolver_steps, converged, error=None):
+        self.parameter = parameter
+        self.quantity = quantity
+        self.mode_index = mode_index
+        self.target = target
+        self.values = np.asarray(values, dtype=float)
+        self.quantities = np.asarray(quantities, dtype=float)
+        self.seeds = list(seeds)
+        self.solve_times = np.asarray(solve_times, dtype=float)
+        self.eigensolver_steps = np.asarray(eigensolver_steps, dtype=float)
+        self.converged = converged
+        self.error = error
+        if len(self.values):
+            best = int(np.argmin(np.abs(self.quantities - target)))
+            self.value = float(self.values[best])
+            self.achieved = float(self.quantities[best])
+        else:
+            self.value = self.achieved = np.nan
+
+    @property
+    def evaluations(self):
+        return len(self.values)
+
+    def summary(self):
+        what = "cutoff of mode {}".format(self.mode_index) if self.quantity == "cutoff" else \
+            "{} {:.6f} of mode {}".format(self.quantity, self.target, self.mode_index)
+        if self.error is not None:
+            return "No {} found: {}".format(what, self.error)
+        return "{} {} {:.6f} gives {} {:.6f} ({} after {} solves).".format(
+            "Found" if self.converged else "Best", self.parameter, self.value,
+            "n_eff" if self.quantity == "cutoff" else self.quantity, self.achieved,
+            "converged" if self.converged else "not converged", self.evaluations)
+
+
+class ParameterSearch:
+    """Step-by-step state of a search for the parameter value that hits a target.
+
+    Call :meth:`next_spec` for the next spec to solve and :meth:`add` with its
+    mode properties (see :func:`waveguide_solver.mode_properties`) until
+    :meth:`next_spec` returns None.  Both bounds are solved first; if the
+    target is not between their values, ``error`` says so and the search stops.
+
+    ``target`` defaults to the highest cladding index for ``"cutoff"``, and
+    ``mode_index`` to 1 for ``"cutoff"`` and 0 otherwise.  The search
+    converges when the quantity is within ``ftol`` of the target or the
+    bracket is narrower than ``xtol``.
+    """
+
+    def __init__(self, spec, parameter, bounds, target=None, quantity="n_eff", mode_index=None,
+                 xtol=DEFAULT_XTOL, ftol=DEFAULT_FTOL, max_evaluations=DEFAULT_MAX_EVALUATIONS, warm_start=True):
+        if parameter not in SWEEP_PARAMETERS:
+            raise ValueError("Unknown parameter '{}', expected one of {}.".format(
+                parameter, ", ".join(SWEEP_PARAMETERS)))
+        if quantity not in QUANTITIES:
+            raise ValueError("Unknown quantity '{}', expected one of {}.".format(quantity, ", ".join(QUANTITIES)))
+        lower, upper = sorted(float(b) for b in bounds)
+        if not lower < upper:
+            raise ValueError("The bounds of the search must differ.")
+        if quantity == "cutoff":
+            mode_index = DEFAULT_CUTOFF_MODE if mode_index is None else mode_index
+            target = max(spec.clad_index, spec.box_index) if target is None else target
+        elif target is None:
+            raise ValueError("A target {} is needed.".format(quantity))
+        mode_index = 0 if mode_index is None else mode_index
+
+        self.spec = spec.replace(num_modes=max(spec.num_modes, mode_index + 1))
+        self.parameter = parameter
+        self.bounds = (lower, upper)
+        self.target = float(target)
+        self.quantity = quantity
+        self.mode_index = mode_index
+        self.xtol = xtol
+        self.ftol = ftol
+        self.max_evaluations = max_evaluations
+        self.warm_start = warm_start
+        self.error = None
+
+        self.values = []
+        self.quantities = []
+        self.seeds = []
+        self.solve_times = []
+        self.eigensolver_steps = []
+        # Fundamental n_eff of every solve, for seeding the next one
+        self._n_effs = []
+        # Bracket ends (value, residual) and the end replaced by the last step
+        self._bracket = None
+        self._previous = None
+        self._widths = []
+        self._next = None
+
+    @property
+    def converged(self):
+        if not self.values:
+            return False
+        residual = min(abs(q - self.target) for q in self.quantities)
+        if residual <= self.ftol:
+            return True
+        return self._bracket is not None and abs(self._bracket[1][0] - self._bracket[0][0]) <= self.xtol
+
+    @property
+    def done(self):
+        return self.error is not None or self.converged or len(self.values) >= self.max_evaluations
+
+    def _residual(self, index):
+        return self.quantities[index] - self.target
+
+    def _step(self):
+        """Next parameter value inside the bracket: interpolation if it makes progress, else bisection."""
+        (a, fa), (b, fb) = self._bracket
+        # Let b be the end closer to the target
+        if abs(fa) < abs(fb):
+            (a, fa), (b, fb) = (b, fb), (a, fa)
+        candidate = None
+        if self._previous is not None:
+            c, fc = self._previous
+            if len({fa, fb, fc}) == 3:
+                # Inverse quadratic interpolation through the bracket ends and the replaced end
+                candidate = (a * fb * fc / ((fa - fb) * (fa - fc)) + b * fa * fc / ((fb - fa) * (fb - fc))
+                             + c * fa * fb / ((fc - fa) * (fc - fb)))
+        if candidate is None and fa != fb:
+            candidate = b - fb * (b - a) / (fb - fa)
+
+        low, high = min(a, b), max(a, b)
+        # Bisect when interpolation leaves the bracket or has not halved it over the last two steps
+        stalled = len(self._widths) >= 3 and self._widths[-1] > 0.5 * self._widths[-3]
+        if candidate is None or not low < candidate < high or stalled:
+            candidate = 0.5 * (low + high)
+        # Stay at least half a tolerance inside the bracket so that it keeps shrinking
+        margin = min(0.5 * self.xtol, 0.25 * (high - low))
+        return float(np.clip(candidate, low + margin, high - margin))
+
+    def next_value(self):
+        """The parameter value to solve next, or None when the search is done."""
+        if self.done:
+            return None
+        if len(self.values) < 2:
+            return self.bounds[len(self.values)]
+        return self._step()
+
+    def next_spec(self):
+        """The spec to solve next, or None when the search is done."""
+        value = self.next_value()
+        if value is None:
+            self._next = None
+            return None
+        seed = self.spec.target_neff
+        if self.warm_start and len(self._n_effs) >= 2:
+            # Interpolate from the solves nearest to the new value.  The bounds are solved
+            # unseeded: a seed far from the fundamental n_eff makes the solver skip modes.
+            nearest = sorted(range(len(self.values)), key=lambda i: abs(self.values[i] - value))[:3]
+            nearest.sort(key=lambda i: self.values[i])
+            seed = predict_neff([self.values[i] for i in nearest], [self._n_effs[i] for i in nearest], value)
+        self._next = (value, seed)
+        return self.spec.replace(**{self.parameter: value, "target_neff": seed})
+
+    def add(self, properties, solve_time=np.nan, eigensolver_steps=np.nan):
+        """Record the mode properties (one dictionary per mode) solved for ``next_spec()``."""
+        value, seed = self._next
+        self._next = None
+        if len(properties) <= self.mode_index:
+            raise ValueError("The solve returned {} modes, mode {} is needed.".format(
+                len(properties), self.mode_index))
+        name = "n_eff" if self.quantity == "cutoff" else self.quantity
+        self.values.append(value)
+        self.quantities.append(float(properties[self.mode_index][name]))
+        self.seeds.append(seed)
+        self.solve_times.append(solve_time)
+        self.eigensolver_steps.append(eigensolver_steps)
+        self._n_effs.append(float(properties[0]["n_eff"]))
+
+        point = (value, self._residual(-1))
+        if len(self.values) == 2:
+            first = (self.values[0], self._residual(0))
+            if first[1] * point[1] > 0 and not self.converged:
+                self.error = "{} {:.6f} is not between {:.6f} at {} = {:g} and {:.6f} at {:g}.".format(
+                    self.quantity, self.target, self.quantities[0], self.parameter, self.values[0],
+                    self.quantities[1], self.values[1])
+                return
+            self._bracket = [first, point]
+        elif len(self.values) > 2:
+            # Replace the bracket end with the same sign as the new point
+            replaced = 0 if self._bracket[0][1] * point[1] > 0 else 1
+            self._previous = self._bracket[replaced]
+            self._bracket[replaced] = point
+        if self._bracket is not None:
+            self._widths.append(abs(self._bracket[1][0] - self._bracket[0][0]))
+
+    def result(self):
+        """The :class:`TargetResult` of the solves made so far."""
+        return TargetResult(self.parameter, self.quantity, self.mode_index, self.target, self.values,
+                            self.quantities, self.seeds, self.solve_times, self.eigensolver_steps,
+                            self.converged, self.error)
+
+
+def solve_for_parameter(spec, parameter, bounds, target=None, quantity="n_eff", mode_index=None,
+                        xtol=DEFAULT_XTOL, ftol=DEFAULT_FTOL, max_evaluations=DEFAULT_MAX_EVALUATIONS,
+                        warm_start=True, server=False, cache=None, on_step=None, count_steps=False):
+    """Find the value of ``parameter`` within ``bounds`` at which a mode property hits ``target``.
+
+    See :class:`ParameterSearch` for the arguments.  ``on_step(value,
+    quantity)`` is called after every solve.  With ``count_steps`` the
+    eigensolver iterations of local solves are counted (see
+    :func:`sweep.count_eigensolver_steps`).  Returns a :class:`TargetResult`;
+    raises ``ValueError`` if the target is not between the values at the bounds.
+    """
+    search = ParameterSearch(spec, parameter, bounds, target, quantity, mode_index, xtol, ftol,
+                             max_evaluations, warm_start)
+    step_spec = search.next_spec()
+    while step_spec is not None:
+        t0 = time.perf_counter()
+        if count_steps and not server:
+            with count_eigensolver_steps() as counter:
+                properties = mode_properties(solve(step_spec, cache=cache))
+            steps = counter.count
+        else:
+            properties = mode_properties(solve(step_spec, server=server, cache=cache))
+            steps = np.nan
+        search.add(properties, time.perf_counter() - t0, steps)
+        if on_step is not None:
+            on_step(search.values[-1], search.quantities[-1])
+        step_spec = search.next_spec()
+    if search.error is not None:
+        raise ValueError(search.error)
+    return search.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m design_target",
+                                     description="Find the parameter value that gives a target mode property.")
+    parser.add_argument("parameter", choices=SWEEP_PARAMETERS, help="spec field to solve for")
+    parser.add_argument("lower", type=float, help="lower bound of the parameter")
+    parser.add_argument("upper", type=float, help="upper bound of the parameter")
+    parser.add_argument("--quantity", choices=QUANTITIES, default="n_eff", help="mode property to target")
+    parser.add_argument("--target", type=float, default=None,
+                        help="target value (default for cutoff: the highest cladding index)")
+    parser.add_argument("--mode", type=int, default=None, help="mode index (default: 0, or 1 for cutoff)")
+    parser.add_argument("--base", help="JSON file with the base waveguide spec (default: the default spec)")
+    parser.add_argument("--xtol", type=float, default=DEFAULT_XTOL, help="parameter tolerance")
+    parser.add_argument("--ftol", type=float, default=DEFAULT_FTOL, help="tolerance on the targeted property")
+    parser.add_argument("--server", action="store_true", help="solve on the Flexcompute server")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the result cache")
+    args = parser.parse_args(argv)
+
+    spec = WaveguideSpec()
+    if args.base is not None:
+        with open(args.base) as f:
+            spec = WaveguideSpec.from_dict(json.load(f))
+    cache = None
+    if not args.no_cache:
+        from solver_cache import SolveCache
+        cache = SolveCache()
+
+    def progress(value, quantity):
+        sys.stderr.write("{} = {:.6f}: {:.6f}\n".format(args.parameter, value, quantity))
+
+    try:
+        result = solve_for_parameter(spec, args.parameter, (args.lower, args.upper), args.target, args.quantity,
+                                     args.mode, args.xtol, args.ftol, server=args.server, cache=cache,
+                                     on_step=progress)
+    except ValueError as e:
+        sys.stderr.write("{}\n".format(e))
+        return 1
+    print(result.summary())
+    return 0 if result.converged else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Multi-wavelength (dispersion) mode solves.
+
+All wavelengths are passed to a single mode solver, so the grid and the
+structures are set up once and the solver keeps the mode order consistent
+across frequencies.  Group index and group velocity dispersion are then
+computed over the whole wavelength axis with vectorized finite differences.
+"""
+import numpy as np
+
+from waveguide_solver import build_waveguide, solve_waveguide
+
+# Speed of light in um/s
+C_UM = 299792458.0e6
+
+
+def group_index_from_neff(wavelengths, n_eff):
+    """Group index ``n - lambda dn/dlambda`` for every wavelength and mode.
+
+    ``n_eff`` has shape ``(num_wavelengths, num_modes)``; wavelengths in um.
+    """
+    wavelengths = np.asarray(wavelengths, dtype=float)
+    dn = np.gradient(n_eff, wavelengths, axis=0)
+    return n_eff - wavelengths[:, None] * dn
+
+
+def gvd_from_group_index(wavelengths, n_group):
+    """Group velocity dispersion ``D = (1/c) dn_g/dlambda`` in ps/(nm km).
+
+    ``n_group`` has shape ``(num_wavelengths, num_modes)``; wavelengths in um.
+    """
+    wavelengths = np.asarray(wavelengths, dtype=float)
+    dng = np.gradient(n_group, wavelengths, axis=0)
+    # dng is in 1/um; 1 s/um^2 = 1e12 s/m^2 = 1e18 ps/(nm km)
+    return dng / C_UM * 1e18
+
+
+class DispersionResult:
+    """Mode properties over a wavelength range, shaped ``(num_wavelengths, num_modes)``."""
+
+    def __init__(self, wavelengths, mode_data):
+        self.wavelengths = np.asarray(wavelengths, dtype=float)
+        self.mode_data = mode_data
+        self.n_eff = np.asarray(mode_data.n_eff.values, dtype=float)
+        self.k_eff = np.asarray(mode_data.k_eff.values, dtype=float)
+        self.te_fraction = np.asarray(mode_data.pol_fraction.te.values, dtype=float)
+        self.mode_area = np.asarray(mode_data.mode_area.values, dtype=float)
+
+        # The solver's group index is computed from its own frequency steps;
+        # fall back to differentiating n_eff if it is not available
+        n_group = mode_data.n_group
+        if n_group is not None:
+            self.n_group = np.asarray(n_group.values, dtype=float)
+        else:
+            self.n_group = group_index_from_neff(self.wavelengths, self.n_eff)
+        self.gvd = gvd_from_group_index(self.wavelengths, self.n_group)
+
+    @property
+    def num_modes(self):
+        return self.n_eff.shape[1]
+
+
+def dispersion_waveguide(spec, wavelengths):
+    """Build the waveguide of ``spec`` for several wavelengths at once."""
+    wavelengths = np.asarray(wavelengths, dtype=float)
+    if wavelengths.ndim != 1 or len(wavelengths) < 3:
+        raise ValueError("At least 3 wavelengths are needed to compute dispersion.")
+    return build_waveguide(spec, wavelength=wavelengths)
+
+
+def solve_dispersion(spec, wavelengths, server=False, cache=None):
+    """Solve ``spec`` at all ``wavelengths`` in one solver call."""
+    waveguide = dispersion_waveguide(spec, wavelengths)
+    mode_data = solve_waveguide(waveguide, server=server, cache=cache, use_symmetry=spec.use_symmetry)
+    return DispersionResult(wavelengths, mode_data)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Compact in-memory storage of solved mode fields.
+
+A ``ModeSolverData`` keeps six complex128 field components for every mode
+and frequency, while the GUI only shows the mode properties and one field
+plot at a time.  :func:`store_modes` keeps a solve result at one of these
+retentions:
+
+* ``"full"``: the ``ModeSolverData`` itself (nothing is saved);
+* ``"single"``: the fields as complex64;
+* ``"display"``: only |E| at the first frequency as float32, downsampled to
+  at most ``DISPLAY_POINTS`` points per axis;
+* ``"scalars"``: only the mode properties.
+
+Except for ``"full"``, the full-precision fields are written to one
+memory-mapped ``.npy`` file per component and read from disk when they
+are needed: by :meth:`StoredModes.full_field`, and by :meth:`StoredModes.field`
+for the ``"display"`` and ``"scalars"`` retentions.
+
+The same files carry solve results out of worker processes:
+:func:`export_modes` writes them in the worker and returns a small
+:class:`ModeFiles` descriptor, and :func:`open_modes` turns the descriptor
+into a :class:`StoredModes` in the GUI without the fields being pickled.
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from waveguide_solver import mode_properties
+
+RETENTIONS = ("full", "single", "display", "scalars")
+DEFAULT_RETENTION = "single"
+
+FIELD_COMPONENTS = ("Ex", "Ey", "Ez", "Hx", "Hy", "Hz")
+
+# Largest number of points per axis of the downsampled |E| copy
+DISPLAY_POINTS = 200
+
+
+def _plane_dims(mode_data):
+    """Names of the two plane axes and of the normal axis of mode data."""
+    normal_axis = list(mode_data.monitor.size).index(0)
+    dims = ["x", "y", "z"]
+    normal = dims.pop(normal_axis)
+    return dims, normal
+
+
+def _plane_field(mode_data, component, normal):
+    """A field component as a (plane axis 0, plane axis 1, frequency, mode) array."""
+    return mode_data.field_components[component].isel({normal: 0}).values
+
+
+def _magnitude(fields):
+    """|E| from the three (possibly memory-mapped) E components."""
+    return np.sqrt(sum(np.abs(field)**2 for field in fields))
+
+
+class StoredModes:
+    """Mode properties and fields of one solve, kept at a chosen retention.
+
+    Create instances with :func:`store_modes`.  ``properties`` holds one
+    dictionary of mode properties per mode (see
+    :func:`waveguide_solver.mode_properties`), ``axes`` the names of the two
+    plane axes and ``coords`` their coordinates.
+    """
+
+    def __init__(self, retention, properties, axes, coords, mode_data=None, fields=None, display=None,
+                 steps=(1, 1), directory=None):
+        self.retention = retention
+        self.properties = properties
+        self.axes = axes
+        self.coords = coords
+        self.mode_data = mode_data
+        self._fields = fields or {}
+        # Downsampled |E| at the first frequency and its steps along the plane axes
+        self._display = display
+        self.steps = steps
+        self.display_coords = tuple(c[::step] for c, step in zip(coords, steps))
+        self.directory = directory
+
+    @property
+    def num_modes(self):
+        return len(self.properties)
+
+    @property
+    def n_eff(self):
+        """n_eff of every mode at the first frequency."""
+        return np.array([props["n_eff"] for props in self.properties])
+
+    @property
+    def nbytes(self):
+        """Bytes of field data held in memory."""
+        if self.mode_data is not None:
+            return sum(self.mode_data.field_components[c].values.nbytes for c in FIELD_COMPONENTS)
+        # Memory-mapped fields are paged in from disk, not held in memory
+        total = sum(field.nbytes for field in self._fields.values() if not isinstance(field, np.memmap))
+        if self._display is not None:
+            total += self._display.nbytes + sum(c.nbytes for c in self.display_coords)
+        return total
+
+    def _component_path(self, component):
+        return os.path.join(self.directory, component + ".npy")
+
+    def full_field(self, component, mode_index, freq_index=0):
+        """A field component of one mode at full precision, loaded from disk if not in memory."""
+        if self.mode_data is not None:
+            _, normal = _plane_dims(self.mode_data)
+            return _plane_field(self.mode_data, component, normal)[:, :, freq_index, mode_index]
+        if self.directory is None:
+            raise ValueError("The fields of these modes were not kept.")
+        fields = np.load(self._component_path(component), mmap_mode="r")
+        return np.array(fields[:, :, freq_index, mode_index])
+
+    def field(self, component, mode_index, freq_index=0):
+        """A field component of one mode, from memory if kept there (possibly single precision)."""
+        field = self._fields.get(component)
+        if field is not None:
+            return field[:, :, freq_index, mode_index]
+        return self.full_field(component, mode_index, freq_index)
+
+    def display_values(self, field, val, mode_index):
+        """``(coords 0, coords 1, values)`` of a field of one mode at the first frequency for plotting.
+
+        ``field`` is a component (``"Ex"``, ..., ``"Hz"``) or ``"E"``/``"H"``
+        for the magnitude of the vector, and ``val`` is ``"abs"``, ``"real"``
+        or ``"imag"`` (only ``"abs"`` for magnitudes).  The values are on the
+        downsampled grid of the ``"display"`` retention, or on the full grid.
+        """
+        if val not in ("abs", "real", "imag"):
+            raise ValueError("Unknown field value '{}', expected abs, real or imag.".format(val))
+        if field in ("E", "H"):
+            if val != "abs":
+                raise ValueError("Only the abs value of the '{}' magnitude can be shown.".format(field))
+            if field == "E" and self._display is not None:
+                values = self._display[:, :, mode_index]
+            else:
+                values = _magnitude(self._display_field(field + axis, mode_index) for axis in "xyz")
+        elif field in FIELD_COMPONENTS:
+            values = getattr(np, val)(self._display_field(field, mode_index))
+        else:
+            raise ValueError("Unknown field '{}'.".format(field))
+        return self.display_coords[0], self.display_coords[1], values
+
+    def _display_field(self, component, mode_index):
+        return self.field(component, mode_index)[::self.steps[0], ::self.steps[1]]
+
+    def close(self):
+        """Delete the memory-mapped field files."""
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+class ModeFiles:
+    """Picklable description of mode fields written to memory-mapped files.
+
+    Sent from a worker process in place of the ``ModeSolverData``: only the
+    mode properties, the plane coordinates and the directory of the field
+    files cross the process boundary.  :func:`open_modes` maps the files.
+    """
+
+    def __init__(self, directory, properties, axes, coords):
+        self.directory = directory
+        self.properties = properties
+        self.axes = axes
+        self.coords = coords
+
+    def close(self):
+        """Delete the field files without opening them."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def export_modes(mode_data, directory):
+    """Write the full-precision fields of a solve to ``directory`` and return its :class:`ModeFiles`."""
+    axes, normal = _plane_dims(mode_data)
+    os.makedirs(directory, exist_ok=True)
+    for component in FIELD_COMPONENTS:
+        values = _plane_field(mode_data, component, normal)
+        fields = np.lib.format.open_memmap(os.path.join(directory, component + ".npy"), mode="w+",
+                                           dtype=values.dtype, shape=values.shape)
+        fields[...] = values
+        fields.flush()
+        del fields
+    coords = tuple(mode_data.Ex.coords[dim].values for dim in axes)
+    return ModeFiles(directory, mode_properties(mode_data), axes, coords)
+
+
+def open_modes(files, retention=DEFAULT_RETENTION):
+    """Keep exported mode fields at a given retention, reading them from the files.
+
+    The ``"full"`` retention maps the complex128 files read-only, so their
+    pages are only loaded when a field is used.  The returned
+    :class:`StoredModes` owns the files and deletes them on ``close``.
+    """
+    if retention not in RETENTIONS:
+        raise ValueError("Unknown retention '{}', expected one of {}.".format(retention, ", ".join(RETENTIONS)))
+
+    def load(component):
+        return np.load(os.path.join(files.directory, component + ".npy"), mmap_mode="r")
+
+    fields = {}
+    display = None
+    steps = (1, 1)
+    if retention == "full":
+        fields = {c: load(c) for c in FIELD_COMPONENTS}
+    elif retention == "single":
+        fields = {c: np.array(load(c), dtype=np.complex64) for c in FIELD_COMPONENTS}
+    elif retention == "display":
+        steps = [max(1, -(-len(c) // DISPLAY_POINTS)) for c in files.coords]
+        magnitude = _magnitude(load(c)[::steps[0], ::steps[1], 0, :] for c in ("Ex", "Ey", "Ez"))
+        display = np.array(magnitude, dtype=np.float32)
+    return StoredModes(retention, files.properties, files.axes, files.coords, fields=fields, display=display,
+                       steps=tuple(steps), directory=files.directory)
+
+
+def store_modes(mode_data, retention=DEFAULT_RETENTION, directory=None):
+    """Keep the result of a solve at a given retention.
+
+    Except for ``"full"``, which keeps ``mode_data`` itself, the
+    full-precision fields are written to ``directory`` (a new temporary
+    directory if None), which :meth:`StoredModes.close` deletes.
+    """
+    if retention not in RETENTIONS:
+        raise ValueError("Unknown retention '{}', expected one of {}.".format(retention, ", ".join(RETENTIONS)))
+    if retention == "full":
+        axes, _ = _plane_dims(mode_data)
+        coords = tuple(mode_data.Ex.coords[dim].values for dim in axes)
+        return StoredModes(retention, mode_properties(mode_data), axes, coords, mode_data=mode_data)
+
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="mode-fields-")
+    return open_modes(export_modes(mode_data, directory), retention)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Fast, incremental cross-section preview of a waveguide.
+
+The preview draws the cross-section of the waveguide structures in the mode
+plane as plain polygons.  The polygon artists are created once and updated in
+place with ``set_xy`` on later calls, and nothing is redrawn when the
+geometry key of the spec has not changed.
+"""
+import numpy as np
+from matplotlib.patches import Patch, Polygon
+
+# Spec fields that change the drawn cross-section
+GEOMETRY_FIELDS = (
+    "waveguide_type",
+    "core_width",
+    "core_thickness",
+    "sidewall_angle",
+    "slab_thickness",
+    "second_core_width",
+    "gap",
+    "clad_thickness",
+    "box_thickness",
+    "side_margin",
+)
+
+# Fill colors of the three material roles
+COLORS = {
+    "clad": "#dbe9f6",
+    "box": "#bdbdbd",
+    "core": "#f28e2b",
+}
+
+
+def geometry_key(spec):
+    """Hashable key of everything in a spec that affects the cross-section."""
+    key = [getattr(spec, name) for name in GEOMETRY_FIELDS]
+    # Fields that the selected waveguide type does not use do not matter
+    if spec.waveguide_type != "rib":
+        key[GEOMETRY_FIELDS.index("slab_thickness")] = None
+    if spec.waveguide_type != "slot":
+        key[GEOMETRY_FIELDS.index("second_core_width")] = None
+        key[GEOMETRY_FIELDS.index("gap")] = None
+    return tuple(key)
+
+
+def domain_bounds(waveguide):
+    """Lateral and vertical bounds ``(y0, y1, z0, z1)`` of the mode plane."""
+    box_thickness = float(np.sum(waveguide.box_thickness))
+    return (
+        -0.5 * waveguide.width,
+        0.5 * waveguide.width,
+        -box_thickness,
+        waveguide.height - box_thickness,
+    )
+
+
+def cross_section_polygons(waveguide):
+    """List ``(role, vertices)`` of the structures cut by the mode plane.
+
+    Vertices are ``(N, 2)`` arrays of (lateral, vertical) coordinates clipped
+    to the mode plane; ``role`` is one of "clad", "box" or "core".
+    """
+    y0, y1, z0, z1 = domain_bounds(waveguide)
+    polygons = []
+    for structure in waveguide.structures:
+        if structure.medium == waveguide.core_medium:
+            role = "core"
+        elif structure.medium == waveguide.box_medium:
+            role = "box"
+        else:
+            role = "clad"
+        for shape in structure.geometry.intersections_plane(x=0):
+            if not hasattr(shape, "exterior"):
+                continue
+            vertices = np.array(shape.exterior.coords)
+            vertices[:, 0] = np.clip(vertices[:, 0], y0, y1)
+            vertices[:, 1] = np.clip(vertices[:, 1], z0, z1)
+            polygons.append((role, vertices))
+    return polygons
+
+
+class GeometryPreview:
+    """Cross-section preview drawn into an existing matplotlib axes."""
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.key = None
+        self.patches = []
+        ax.set_xlabel("y (um)")
+        ax.set_ylabel("z (um)")
+        ax.set_title("Mode solver cross-section")
+        ax.set_aspect("equal")
+        ax.legend(
+            handles=[Patch(facecolor=color, edgecolor="k", label=role) for role, color in COLORS.items()],
+            loc="upper right",
+            fontsize="small"
+        )
+
+    def update(self, spec, build_waveguide):
+        """Redraw for a new spec; returns False if the geometry did not change.
+
+        ``build_waveguide(spec)`` is only called when the geometry key changed.
+        """
+        key = geometry_key(spec)
+        if key == self.key:
+            return False
+        waveguide = build_waveguide(spec)
+        y0, y1, z0, z1 = domain_bounds(waveguide)
+
+        # The domain background is cladding; structures are drawn on top
+        shapes = [("clad", np.array([[y0, z0], [y1, z0], [y1, z1], [y0, z1]]))]
+        shapes.extend(cross_section_polygons(waveguide))
+
+        # Reuse the existing polygon artists and hide the ones not needed
+        while len(self.patches) < len(shapes):
+            patch = Polygon(np.zeros((3, 2)), closed=True, edgecolor="k", linewidth=0.5)
+            self.ax.add_patch(patch)
+            self.patches.append(patch)
+        for patch, (role, vertices) in zip(self.patches, shapes):
+            patch.set_xy(vertices)
+            patch.set_facecolor(COLORS[role])
+            patch.set_visible(True)
+        for patch in self.patches[len(shapes):]:
+            patch.set_visible(False)
+
+        self.ax.set_xlim(y0, y1)
+        self.ax.set_ylim(z0, z1)
+        self.key = key
+        return True
+
+    def invalidate(self):
+        """Force the next update to redraw."""
+        self.key = None
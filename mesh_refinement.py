@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Local mesh refinement around the core edges, rib slab and slot gap.
+
+The waveguide's ``grid_resolution`` sets the background grid; with an
+``edge_resolution`` (steps per wavelength in the core material) mesh-override
+regions with fine steps are added around the material interfaces, where the
+fields and the permittivity change fastest:
+
+* the core sidewalls (fine lateral steps; fine vertical steps too if angled)
+* the core top and bottom and the rib slab top (fine vertical steps)
+* the slot gap (fine lateral steps)
+
+::
+
+    python -m mesh_refinement specs.json
+
+compares the refined mesh with a uniform mesh at the edge resolution and
+reports the cell counts and n_eff of both.
+"""
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+# Width of the refined bands beyond the interfaces, in background cells
+MARGIN_CELLS = 2
+
+
+def refinement_regions(waveguide, edge_resolution):
+    """``MeshOverrideStructure`` regions refining a waveguide's interfaces."""
+    from tidy3d import C_0, Box, MeshOverrideStructure
+
+    wavelength = float(np.min(waveguide.wavelength))
+    n_core = max(waveguide.core_medium.nk_model(C_0 / wl)[0] for wl in np.atleast_1d(waveguide.wavelength))
+    fine = wavelength / (n_core * edge_resolution)
+    margin = MARGIN_CELLS * wavelength / (n_core * waveguide.grid_resolution)
+
+    # (lateral start, lateral end, vertical start, vertical end, fine lateral, fine vertical); every
+    # band is split at its interface so that the grid keeps a boundary on the interface
+    regions = []
+    dx = (waveguide.core_thickness - waveguide.slab_thickness) * math.tan(waveguide.sidewall_angle)
+    bottom, top = waveguide.slab_thickness, waveguide.core_thickness
+    angled = dx != 0
+    vertical_bands = [(-margin, 0.0), (0.0, margin), (top - margin, top), (top, top + margin)]
+    if waveguide.slab_thickness > 0:
+        vertical_bands += [(bottom - margin, bottom), (bottom, bottom + margin)]
+        # The slab interfaces run across the whole domain
+        for vert_lo, vert_hi in vertical_bands:
+            regions.append((-math.inf, math.inf, vert_lo, vert_hi, False, True))
+    for x, w in zip(waveguide._core_starts, waveguide.core_width):
+        for edge, outward in ((x, -dx), (x + w, dx)):
+            lo, hi = sorted((edge, edge + outward))
+            for lat_lo, lat_hi in ((lo - margin, lo), (lo, hi), (hi, hi + margin)):
+                if lat_hi > lat_lo:
+                    regions.append((lat_lo, lat_hi, bottom, top, True, angled))
+        # Core top and bottom
+        for vert_lo, vert_hi in vertical_bands[:4]:
+            regions.append((x - abs(dx) - margin, x + w + abs(dx) + margin, vert_lo, vert_hi, False, True))
+    for x, w, gap in zip(waveguide._core_starts, waveguide.core_width, waveguide.gap):
+        regions.append((x + w, x + w + gap, bottom, top, True, False))
+
+    structures = []
+    for lat_lo, lat_hi, vert_lo, vert_hi, fine_lateral, fine_vertical in regions:
+        center = waveguide._translate(
+            0.5 * (lat_lo + lat_hi) if math.isfinite(lat_lo) else 0.0, 0.5 * (vert_lo + vert_hi), 0)
+        size = waveguide._swap_axis(lat_hi - lat_lo, vert_hi - vert_lo, math.inf)
+        dl = waveguide._swap_axis(fine if fine_lateral else None, fine if fine_vertical else None, None)
+        structures.append(MeshOverrideStructure(geometry=Box(center=center, size=size), dl=dl))
+    return structures
+
+
+def refined_grid_spec(waveguide, edge_resolution):
+    """``GridSpec`` of a ``RectangularDielectric``'s own grid with the refined regions added."""
+    from tidy3d import GridSpec
+
+    return GridSpec.auto(
+        min_steps_per_wvl=waveguide.grid_resolution,
+        wavelength=float(np.min(waveguide.wavelength)),
+        override_structures=list(waveguide._override_structures) + refinement_regions(waveguide, edge_resolution),
+        max_scale=waveguide.max_grid_scaling,
+    )
+
+
+def grid_shape(waveguide):
+    """Cells of a waveguide's mode solver grid along the two plane axes."""
+    mode_solver = waveguide.mode_solver
+    cells = list(mode_solver._solver_grid.num_cells)
+    del cells[mode_solver.normal_axis]
+    return cells
+
+
+class MeshComparison:
+    """Cells, n_eff and solve times (None if unknown) of a uniform and a refined mesh."""
+
+    def __init__(self, spec, uniform_cells, refined_cells, uniform_neff, refined_neff,
+                 uniform_time=None, refined_time=None):
+        self.spec = spec
+        self.uniform_cells = uniform_cells
+        self.refined_cells = refined_cells
+        self.uniform_neff = np.asarray(uniform_neff, dtype=float)
+        self.refined_neff = np.asarray(refined_neff, dtype=float)
+        self.uniform_time = uniform_time
+        self.refined_time = refined_time
+
+    @property
+    def cell_ratio(self):
+        """Cells of the refined mesh as a fraction of the uniform mesh."""
+        return self.refined_cells / self.uniform_cells
+
+    @property
+    def neff_difference(self):
+        """Largest n_eff difference between the two meshes."""
+        return float(np.max(np.abs(self.refined_neff - self.uniform_neff)))
+
+    def summary(self):
+        def timing(seconds):
+            return "" if seconds is None else ", {:.2f} s".format(seconds)
+
+        return ("Uniform mesh (resolution {:g}): {} cells, n_eff {}{}\n"
+                "Refined mesh (resolution {:g}, edges {:g}): {} cells ({:.0%}), n_eff {}{}\n"
+                "Largest n_eff difference: {:.2e}").format(
+            self.spec.edge_resolution, self.uniform_cells, np.round(self.uniform_neff, 6), timing(self.uniform_time),
+            self.spec.grid_resolution, self.spec.edge_resolution, self.refined_cells, self.cell_ratio,
+            np.round(self.refined_neff, 6), timing(self.refined_time), self.neff_difference)
+
+
+def uniform_spec(spec):
+    """The spec with a uniform mesh at its edge resolution."""
+    if spec.edge_resolution is None:
+        raise ValueError("The spec has no edge resolution to compare with.")
+    return spec.replace(grid_resolution=spec.edge_resolution, edge_resolution=None)
+
+
+def compare_meshes(spec, server=False, cache=None):
+    """Solve ``spec`` with its refined mesh and with a uniform mesh at the edge resolution."""
+    from waveguide_solver import build_waveguide, solve
+
+    results = []
+    for mesh_spec in (uniform_spec(spec), spec):
+        cells = int(np.prod(grid_shape(build_waveguide(mesh_spec))))
+        start = time.perf_counter()
+        mode_data = solve(mesh_spec, server=server, cache=cache)
+        results.append((cells, mode_data.n_eff.values[0], time.perf_counter() - start))
+    (uniform_cells, uniform_neff, uniform_time), (refined_cells, refined_neff, refined_time) = results
+    return MeshComparison(spec, uniform_cells, refined_cells, uniform_neff, refined_neff,
+                          uniform_time, refined_time)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m mesh_refinement",
+        description="Compare locally refined meshes with uniform meshes at the edge resolution.",
+    )
+    parser.add_argument("specs", help="JSON or CSV file with one waveguide spec per entry")
+    parser.add_argument("--edge-resolution", type=float, default=None,
+                        help="edge resolution for specs that do not set one")
+    parser.add_argument("--server", action="store_true", help="solve on the Flexcompute server")
+    args = parser.parse_args(argv)
+
+    from waveguide_solver import load_specs
+
+    for index, spec in enumerate(load_specs(args.specs)):
+        if spec.edge_resolution is None:
+            if args.edge_resolution is None:
+                parser.error("spec {} has no edge_resolution; pass --edge-resolution".format(index))
+            spec = spec.replace(edge_resolution=args.edge_resolution)
+        print("Spec {} ({} waveguide):".format(index, spec.waveguide_type))
+        print(compare_meshes(spec, server=args.server).summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
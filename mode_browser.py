@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""Mode browser window listing all solved modes with one field plot.
+
+The browser shows a table of mode properties and a single canvas.  A mode's
+field is only plotted when its row is selected.  The plot (a
+:class:`FieldView`) keeps one mesh artist and one colorbar: switching the
+mode, the field component (E, Ex, ..., Hz), the value (abs, real, imag) or
+the color limits only replaces the mesh's values and redraws the canvas.
+The fields are read from a :class:`field_storage.StoredModes`, so the
+browser works with any field retention.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from field_storage import StoredModes, store_modes
+from profiling import span
+
+# Fields and values the browser can plot
+FIELD_NAMES = ("E", "Ex", "Ey", "Ez", "H", "Hx", "Hy", "Hz")
+FIELD_VALUES = ("abs", "real", "imag")
+
+# Table columns: (key, heading, format)
+COLUMNS = (
+    ("mode", "Mode", "{:d}"),
+    ("n_eff", "n_eff", "{:.6f}"),
+    ("k_eff", "k_eff", "{:.6f}"),
+    ("n_group", "Group Index", "{:.6f}"),
+    ("te_fraction", "TE Fraction", "{:.1%}"),
+    ("tm_fraction", "TM Fraction", "{:.1%}"),
+    ("mode_area", "Mode Area (um²)", "{:.2f}"),
+)
+
+
+def auto_clim(values, val):
+    """Color limits of a field plot: (0, max) for abs values, symmetric about 0 otherwise."""
+    vmax = float(np.nanmax(np.abs(values))) if np.size(values) else 0.0
+    vmax = vmax or 1.0
+    return (0.0, vmax) if val == "abs" else (-vmax, vmax)
+
+
+class FieldView:
+    """A field plot that is updated in place.
+
+    The ``pcolormesh`` mesh and the colorbar are created for the first field
+    and reused: showing another mode, component or value on the same grid
+    only replaces the mesh's values, color limits and colormap.  The mesh is
+    rebuilt when the grid changes, and the geometry edges are redrawn when
+    the waveguide changes.
+    """
+
+    def __init__(self, fig):
+        self.fig = fig
+        self.ax = fig.add_subplot(111)
+        self.mesh = None
+        self.colorbar = None
+        self._grid = None
+        self._waveguide = None
+        self._edge_artists = []
+
+    def _same_grid(self, coords0, coords1):
+        if self._grid is None:
+            return False
+        return all(a is b or (a.shape == b.shape and np.array_equal(a, b))
+                   for a, b in zip(self._grid, (coords0, coords1)))
+
+    def show(self, waveguide, modes, mode_index, field="E", val="abs", clim=None):
+        """Show a field of one mode of a :class:`field_storage.StoredModes`.
+
+        ``clim`` is ``(vmin, vmax)``, with None for an automatic limit.
+        """
+        coords0, coords1, values = modes.display_values(field, val, mode_index)
+        values = np.asarray(values).T
+        auto = auto_clim(values, val)
+        vmin, vmax = clim if clim is not None else (None, None)
+        vmin = auto[0] if vmin is None else vmin
+        vmax = auto[1] if vmax is None else vmax
+        cmap = "magma" if val == "abs" else "RdBu_r"
+
+        ax = self.ax
+        if self._same_grid(coords0, coords1):
+            self.mesh.set_array(values)
+        else:
+            # New grid: replace the mesh; the colorbar follows it
+            if self.mesh is not None:
+                self.mesh.remove()
+            self.mesh = ax.pcolormesh(coords0, coords1, values, shading="nearest", zorder=0)
+            self._grid = (coords0, coords1)
+            ax.set_xlim(coords0[0], coords0[-1])
+            ax.set_ylim(coords1[0], coords1[-1])
+            ax.set_xlabel("{} (um)".format(modes.axes[0]))
+            ax.set_ylabel("{} (um)".format(modes.axes[1]))
+            ax.set_aspect("equal")
+            if self.colorbar is None:
+                self.colorbar = self.fig.colorbar(self.mesh, ax=ax)
+            else:
+                self.colorbar.update_normal(self.mesh)
+        self.mesh.set_cmap(cmap)
+        self.mesh.set_clim(vmin, vmax)
+
+        if waveguide is not self._waveguide:
+            for artist in self._edge_artists:
+                artist.remove()
+            before = set(ax.get_children())
+            waveguide.plot_geometry_edges("white" if val == "abs" else "black", ax=ax)
+            self._edge_artists = [a for a in ax.get_children() if a not in before]
+            self._waveguide = waveguide
+        else:
+            for artist in self._edge_artists:
+                artist.set_color("white" if val == "abs" else "black")
+
+        label = "|{}|".format(field) if field in ("E", "H") else "{}({})".format(
+            {"abs": "abs", "real": "Re", "imag": "Im"}[val], field)
+        self.colorbar.set_label(label)
+        ax.set_title("Mode {} profile".format(mode_index))
+
+
+def render_mode_figure(waveguide, modes, mode_index, field="E", val="abs", figsize=(6, 4)):
+    """Render a field of one mode into a new (non-pyplot) figure.
+
+    ``modes`` is a :class:`field_storage.StoredModes`; the waveguide's
+    geometry edges are drawn over the field.
+    """
+    fig = Figure(figsize=figsize)
+    FieldView(fig).show(waveguide, modes, mode_index, field=field, val=val)
+    return fig
+
+
+class ModeBrowser:
+    """A single window with a table of all modes and one field plot updated in place."""
+
+    def __init__(self, master):
+        self.window = tk.Toplevel(master)
+        self.window.title("Modes")
+        self.waveguide = None
+        self.modes = None
+        # (mode index, field, value, color limits) of the field on the canvas
+        self.current = None
+
+        # Create mode table
+        table_frame = ttk.Frame(self.window)
+        table_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.table = ttk.Treeview(
+            table_frame,
+            columns=[key for key, _, _ in COLUMNS],
+            show="headings",
+            height=6,
+            selectmode="browse"
+        )
+        for key, heading, _ in COLUMNS:
+            self.table.heading(key, text=heading)
+            self.table.column(key, width=95, anchor='e')
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        self.table.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table.bind('<<TreeviewSelect>>', lambda e: self._on_select())
+
+        # Create field controls
+        controls = ttk.Frame(self.window)
+        controls.pack(fill=tk.X, padx=10)
+        ttk.Label(controls, text="Field:").pack(side=tk.LEFT)
+        self.field_var = tk.StringVar(value="E")
+        field_combo = ttk.Combobox(controls, textvariable=self.field_var, values=FIELD_NAMES, width=4,
+                                   state="readonly")
+        field_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Value:").pack(side=tk.LEFT)
+        self.value_var = tk.StringVar(value="abs")
+        self.value_combo = ttk.Combobox(controls, textvariable=self.value_var, values=FIELD_VALUES, width=5,
+                                        state="readonly")
+        self.value_combo.pack(side=tk.LEFT, padx=5)
+        self.value_combo.state(['disabled'])
+        ttk.Label(controls, text="Color limits:").pack(side=tk.LEFT)
+        self.vmin_var = tk.StringVar(value="")
+        self.vmax_var = tk.StringVar(value="")
+        vmin_entry = ttk.Entry(controls, textvariable=self.vmin_var, width=8)
+        vmin_entry.pack(side=tk.LEFT, padx=2)
+        vmax_entry = ttk.Entry(controls, textvariable=self.vmax_var, width=8)
+        vmax_entry.pack(side=tk.LEFT, padx=2)
+        ttk.Label(controls, text="(empty: auto)").pack(side=tk.LEFT, padx=5)
+        for combo in (field_combo, self.value_combo):
+            combo.bind('<<ComboboxSelected>>', lambda e: self._on_field_change())
+        for entry in (vmin_entry, vmax_entry):
+            entry.bind('<Return>', lambda e: self.refresh())
+            entry.bind('<FocusOut>', lambda e: self.refresh())
+
+        # Create the field canvas and its persistent plot
+        self.figure = Figure(figsize=(6, 4))
+        self.view = FieldView(self.figure)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, pady=5)
+
+    def exists(self):
+        """True while the browser window is open."""
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def set_result(self, waveguide, modes):
+        """Show a new solve result and plot its first mode.
+
+        ``modes`` is a :class:`field_storage.StoredModes` or a ``ModeSolverData``.
+        """
+        if not isinstance(modes, StoredModes):
+            modes = store_modes(modes, retention="full")
+        self.waveguide = waveguide
+        self.modes = modes
+        self.current = None
+
+        self.table.delete(*self.table.get_children())
+        for mode_index, props in enumerate(modes.properties):
+            props = dict(props, mode=mode_index)
+            values = [fmt.format(props[key]) for key, _, fmt in COLUMNS]
+            self.table.insert("", tk.END, iid=str(mode_index), values=values)
+
+        if self.table.get_children():
+            self.table.selection_set("0")
+            self.show_mode(0)
+        self.window.lift()
+
+    def _on_select(self):
+        selection = self.table.selection()
+        if selection:
+            self.show_mode(int(selection[0]))
+
+    def _on_field_change(self):
+        # Vector magnitudes only have an abs value
+        if self.field_var.get() in ("E", "H"):
+            self.value_var.set("abs")
+            self.value_combo.state(['disabled'])
+        else:
+            self.value_combo.state(['!disabled'])
+        self.refresh()
+
+    def _get_clim(self):
+        limits = []
+        for var in (self.vmin_var, self.vmax_var):
+            try:
+                limits.append(float(var.get()))
+            except ValueError:
+                limits.append(None)
+        return tuple(limits)
+
+    def refresh(self):
+        """Show the selected field, value and color limits of the current mode."""
+        if self.current is not None:
+            self.show_mode(self.current[0])
+
+    def show_mode(self, mode_index):
+        """Plot the selected field of one mode, updating the existing plot."""
+        state = (mode_index, self.field_var.get(), self.value_var.get(), self._get_clim())
+        if self.modes is None or state == self.current:
+            return
+        _, field, val, clim = state
+        with span("render.field", mode_index=mode_index, field=field, val=val):
+            self.view.show(self.waveguide, self.modes, mode_index, field=field, val=val, clim=clim)
+        self.canvas.draw_idle()
+        self.current = state
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Consistent mode labels across parameter steps from field overlaps.
+
+The solver returns the modes of every solve sorted by n_eff, so when two
+modes cross (e.g. TE0 and TM0 as the core gets taller) their indices swap
+and index-by-index curves jump between modes.  Tracking compares the modes
+of each step with those of the step before by their field overlaps::
+
+    |∫ (E_m* × H_n + E_n × H_m*) · dA| / 2
+
+normalized by the power of both modes, for all mode pairs at once, and
+relabels the modes by the assignment that maximizes the total overlap::
+
+    steps = [tracking_fields(solve(spec)) for spec in specs]
+    tracking = track_modes(steps)
+    n_eff = relabel(n_eff, tracking.order)    # n_eff[step, mode label]
+
+Only the transverse fields are kept per step, resampled to a coarse uniform
+grid (``TRACK_POINTS`` per axis) over the region where the fields are, so
+that steps on different solver grids can be compared and the fields of
+hundreds of steps fit in memory.
+"""
+import numpy as np
+
+# Points per axis of the resampled fields
+TRACK_POINTS = 48
+
+# Fraction of the peak intensity that bounds the resampled region
+FIELD_THRESHOLD = 1e-4
+
+# Matches with a lower overlap are probably modes entering or leaving the solved set
+MIN_OVERLAP = 0.5
+
+
+class TrackingFields:
+    """Transverse E and H of the modes of one solve on a uniform grid.
+
+    ``coords`` are the coordinates of the two plane axes and ``fields`` has
+    shape ``(4, num_modes, len(coords[0]), len(coords[1]))``: E and H along
+    the first plane axis, then E and H along the second one.
+    """
+
+    def __init__(self, coords, fields):
+        self.coords = coords
+        self.fields = fields
+
+    @property
+    def num_modes(self):
+        return self.fields.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.fields.nbytes + sum(c.nbytes for c in self.coords)
+
+    def reorder(self, order):
+        """The same fields with the modes in ``order``."""
+        return TrackingFields(self.coords, self.fields[:, order])
+
+
+def interpolation_matrix(source, target):
+    """Matrix that interpolates values at ``source`` points linearly to ``target`` points.
+
+    Targets outside the source points get zero.  ``source`` must be increasing.
+    """
+    source = np.asarray(source, dtype=float)
+    target = np.asarray(target, dtype=float)
+    matrix = np.zeros((len(target), len(source)))
+    if len(source) == 1:
+        matrix[target == source[0], 0] = 1.0
+        return matrix
+    upper = np.clip(np.searchsorted(source, target), 1, len(source) - 1)
+    lower = upper - 1
+    weight = (target - source[lower]) / (source[upper] - source[lower])
+    inside = (target >= source[0]) & (target <= source[-1])
+    rows = np.nonzero(inside)[0]
+    matrix[rows, lower[inside]] = 1.0 - weight[inside]
+    matrix[rows, upper[inside]] += weight[inside]
+    return matrix
+
+
+def tracking_fields(mode_data, freq_index=0, points=TRACK_POINTS):
+    """Resample the transverse fields of a ``ModeSolverData`` for tracking."""
+    dims = ["x", "y", "z"]
+    normal = dims.pop(list(mode_data.monitor.size).index(0))
+    components = ["E" + dims[0], "H" + dims[1], "E" + dims[1], "H" + dims[0]]
+    data = {c: mode_data.field_components[c].isel({normal: 0, "f": freq_index}) for c in components}
+
+    # Resample only where the modes have noticeable intensity
+    intensity = sum(np.abs(data[c].values)**2 for c in components[::2]).max(axis=-1)
+    rows, cols = np.nonzero(intensity >= FIELD_THRESHOLD * intensity.max())
+    first = data[components[0]]
+    bounds = [
+        first.coords[dims[0]].values[[rows.min(), rows.max()]],
+        first.coords[dims[1]].values[[cols.min(), cols.max()]],
+    ]
+    coords = tuple(np.linspace(low, high, points) for low, high in bounds)
+
+    fields = []
+    for c in components:
+        matrix_0 = interpolation_matrix(data[c].coords[dims[0]].values, coords[0])
+        matrix_1 = interpolation_matrix(data[c].coords[dims[1]].values, coords[1])
+        fields.append(matrix_0 @ np.moveaxis(data[c].values, -1, 0) @ matrix_1.T)
+    return TrackingFields(coords, np.array(fields, dtype=np.complex64))
+
+
+def _cross_power(first, second):
+    """∫ (E × H*) · dA of the E of every mode of ``first`` with the H of every mode of ``second``."""
+    e_0, _, e_1, _ = (f.reshape(f.shape[0], -1) for f in first)
+    _, h_1, _, h_0 = (f.reshape(f.shape[0], -1) for f in second)
+    return e_0 @ h_1.conj().T - e_1 @ h_0.conj().T
+
+
+def overlap_matrix(previous, current):
+    """Normalized overlaps of every mode of ``previous`` with every mode of ``current``.
+
+    The fields of ``current`` are interpolated to the grid of ``previous``.
+    Returns an array of shape ``(previous.num_modes, current.num_modes)``,
+    about 1 for the same mode and 0 for orthogonal modes.
+    """
+    matrix_0 = interpolation_matrix(current.coords[0], previous.coords[0])
+    matrix_1 = interpolation_matrix(current.coords[1], previous.coords[1])
+    a = previous.fields
+    b = matrix_0 @ current.fields @ matrix_1.T
+    # E_m* x H_n is the conjugate of E_m x H_n*
+    overlap = np.abs(_cross_power(a, b).conj() + _cross_power(b, a).T) / 2
+    power_a = np.abs(np.diag(_cross_power(a, a)).real)
+    power_b = np.abs(np.diag(_cross_power(b, b)).real)
+    norm = np.sqrt(np.outer(power_a, power_b))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(norm > 0, overlap / norm, 0.0)
+
+
+def match_modes(overlap):
+    """Mode of the current step for every mode of the previous step, maximizing the total overlap.
+
+    Returns ``(order, matched_overlap)``; previous modes left without a
+    match (fewer current modes) get ``-1``.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    rows, cols = linear_sum_assignment(overlap, maximize=True)
+    order = np.full(overlap.shape[0], -1, dtype=int)
+    matched = np.full(overlap.shape[0], np.nan)
+    order[rows] = cols
+    matched[rows] = overlap[rows, cols]
+    return order, matched
+
+
+class ModeTracking:
+    """Mode order and match quality of every step of a tracked sequence.
+
+    ``order[step, label]`` is the solver's mode index of the mode with that
+    label, and ``overlap[step, label]`` its overlap with the same label at
+    the reference step (1 at the first step, NaN where a step has no fields).
+    """
+
+    def __init__(self, order, overlap):
+        self.order = order
+        self.overlap = overlap
+
+    @property
+    def swaps(self):
+        """Number of steps whose solver order differs from the label order."""
+        return int(np.any(self.order != np.arange(self.order.shape[1]), axis=1).sum())
+
+    def uncertain(self, min_overlap=MIN_OVERLAP):
+        """Boolean mask of the matches with an overlap below ``min_overlap``."""
+        return self.overlap < min_overlap
+
+
+def track_modes(steps, references=None):
+    """Label the modes of a sequence of steps consistently.
+
+    ``steps`` holds one :class:`TrackingFields` per step (None for failed
+    steps).  Each step is matched to ``references[step]`` (an earlier step,
+    or -1 to keep the solver order), by default the step before it.  Failed
+    references are skipped in favour of their own reference.  All steps
+    must have the same number of modes.  Returns a :class:`ModeTracking`.
+    """
+    num_steps = len(steps)
+    num_modes = next((s.num_modes for s in steps if s is not None), 0)
+    if references is None:
+        references = np.arange(num_steps) - 1
+    order = np.tile(np.arange(num_modes), (num_steps, 1))
+    overlap = np.full((num_steps, num_modes), np.nan)
+    labelled = [None] * num_steps
+    for step, fields in enumerate(steps):
+        if fields is None:
+            continue
+        reference = references[step]
+        while reference >= 0 and steps[reference] is None:
+            reference = references[reference]
+        if reference < 0:
+            overlap[step] = 1.0
+        else:
+            if fields.num_modes != num_modes:
+                raise ValueError("Step {} has {} modes, expected {}.".format(step, fields.num_modes, num_modes))
+            order[step], overlap[step] = match_modes(overlap_matrix(labelled[reference], fields))
+        labelled[step] = fields.reorder(order[step])
+    return ModeTracking(order, overlap)
+
+
+def relabel(values, order):
+    """Reorder the last (mode) axis of ``values`` by a tracking order of the same leading shape."""
+    return np.take_along_axis(np.asarray(values), np.asarray(order), axis=-1)
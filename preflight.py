@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""Pre-solve cost estimates with memory and run-time limits.
+
+A local solve's peak memory and run time grow with the number of grid cells
+of the mode plane.  :func:`estimate_cost` counts the cells of a built
+waveguide and predicts both with a :class:`CostModel`, a power law in the
+cell and mode counts::
+
+    cost = a * cells**b * num_modes**c
+
+The default model was fitted on a reference machine (about 9 kB and
+0.2 ms per cell for one mode).  Calibrate it for this machine with::
+
+    python -m preflight --calibrate
+
+which runs the benchmark solve cases (and two larger ones) in fresh
+processes, measures their time and peak memory, and stores the fitted
+model in ``~/.cache/tidy3d-mode-explorer/calibration.json`` (or
+``$MODE_EXPLORER_CALIBRATION``).  ``python -m preflight specs.json`` prints
+the estimates of a spec file.
+
+:class:`Limits` sets the memory and time above which a solve gets a
+warning or is refused.  By default, solves that would need more than half
+of the physical memory get a warning, and solves that would need more than
+80% are refused.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from solver_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_CALIBRATION_PATH = os.path.join(DEFAULT_CACHE_DIR, "calibration.json")
+
+# Environment variable that overrides the calibration file
+CALIBRATION_ENV = "MODE_EXPLORER_CALIBRATION"
+
+# Fractions of the physical memory above which a solve is warned about / refused
+WARN_MEMORY_FRACTION = 0.5
+MAX_MEMORY_FRACTION = 0.8
+
+# Run time (s) above which a solve is warned about
+DEFAULT_WARN_TIME = 60.0
+
+# Environment variables that override the limits (GB and s)
+LIMIT_ENV = {
+    "warn_memory": "MODE_EXPLORER_WARN_MEMORY_GB",
+    "max_memory": "MODE_EXPLORER_MAX_MEMORY_GB",
+    "warn_time": "MODE_EXPLORER_WARN_TIME",
+    "max_time": "MODE_EXPLORER_MAX_TIME",
+}
+
+# Larger solves added to the benchmark solve cases for calibration
+EXTRA_CALIBRATION_CASES = (
+    ("strip", 45, 1),
+    ("strip", 60, 2),
+)
+
+OK = "ok"
+WARN = "warn"
+REFUSE = "refuse"
+
+
+def physical_memory():
+    """Physical memory of this machine in bytes, or None if unknown."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def format_bytes(num_bytes):
+    """Human-readable size, e.g. ``1.2 GB``."""
+    for unit in ("B", "kB", "MB"):
+        if num_bytes < 1000:
+            return "{:.0f} {}".format(num_bytes, unit)
+        num_bytes /= 1000
+    return "{:.1f} GB".format(num_bytes)
+
+
+def format_seconds(seconds):
+    """Human-readable duration, e.g. ``45 s`` or ``3.2 min``."""
+    if seconds < 10:
+        return "{:.1f} s".format(seconds)
+    if seconds < 120:
+        return "{:.0f} s".format(seconds)
+    return "{:.1f} min".format(seconds / 60)
+
+
+class CostModel:
+    """Power-law model of the peak memory (bytes) and run time (s) of a local solve.
+
+    ``memory`` and ``time`` are ``(a, b, c)`` coefficients of
+    ``a * cells**b * num_modes**c``; ``source`` says where they come from.
+    Coefficients that are not finite, or a non-positive ``a``, raise
+    ``ValueError``.
+    """
+
+    def __init__(self, memory, time, source="default"):
+        self.memory_coefficients = tuple(float(x) for x in memory)
+        self.time_coefficients = tuple(float(x) for x in time)
+        self.source = source
+        for what, coefficients in (("memory", self.memory_coefficients), ("time", self.time_coefficients)):
+            if not np.all(np.isfinite(coefficients)) or coefficients[0] <= 0:
+                raise ValueError("Invalid {} coefficients {} of the cost model.".format(what, coefficients))
+
+    @staticmethod
+    def _evaluate(coefficients, cells, num_modes):
+        a, b, c = coefficients
+        return a * np.power(cells, b) * np.power(num_modes, c)
+
+    def memory(self, cells, num_modes=1):
+        return self._evaluate(self.memory_coefficients, cells, num_modes)
+
+    def time(self, cells, num_modes=1):
+        return self._evaluate(self.time_coefficients, cells, num_modes)
+
+    @classmethod
+    def fit(cls, samples, source="calibrated"):
+        """Fit a model to ``(cells, num_modes, seconds, bytes)`` samples by least squares in log space.
+
+        Samples with a value that is not positive (e.g. an unmeasured peak
+        memory) raise ``ValueError``.
+        """
+        samples = np.asarray(samples, dtype=float)
+        if len(samples) < 3:
+            raise ValueError("At least 3 samples are needed to fit a cost model.")
+        invalid = ~np.all(np.isfinite(samples) & (samples > 0), axis=1)
+        if invalid.any():
+            raise ValueError("Cost samples need positive cells, modes, time and memory, got {}.".format(
+                ", ".join(str(tuple(sample)) for sample in samples[invalid].tolist())))
+        design = np.column_stack([np.ones(len(samples)), np.log(samples[:, 0]), np.log(samples[:, 1])])
+        if len(np.unique(samples[:, 1])) < 2:
+            # Without several mode counts the mode exponent cannot be fitted
+            design[:, 2] = 0.0
+
+        def fit_column(values):
+            (log_a, b, c), *_ = np.linalg.lstsq(design, np.log(values), rcond=None)
+            return float(np.exp(log_a)), b, c
+
+        return cls(fit_column(samples[:, 3]), fit_column(samples[:, 2]), source=source)
+
+    def to_dict(self):
+        return {"memory": list(self.memory_coefficients), "time": list(self.time_coefficients),
+                "source": self.source}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(values["memory"], values["time"], source=values.get("source", "calibrated"))
+
+
+# Fitted on a 1-CPU reference machine (strip waveguides, 3.6k-117k cells, 1-4 modes)
+DEFAULT_MODEL = CostModel(memory=(9.33e3, 0.992, 0.024), time=(6.30e-4, 0.907, 0.528))
+
+
+def calibration_path():
+    """File that holds the calibrated cost model."""
+    return os.environ.get(CALIBRATION_ENV, DEFAULT_CALIBRATION_PATH)
+
+
+def load_model(path=None):
+    """The calibrated cost model, or :data:`DEFAULT_MODEL` if there is none."""
+    path = calibration_path() if path is None else path
+    try:
+        with open(path) as f:
+            return CostModel.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return DEFAULT_MODEL
+
+
+def save_model(model, path=None):
+    """Store a cost model as the calibration (see :func:`load_model`)."""
+    path = calibration_path() if path is None else path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(model.to_dict(), f, indent=2)
+
+
+class Limits:
+    """Memory (bytes) and run time (s) above which a local solve is warned about or refused.
+
+    A limit of None is not checked.  :meth:`from_env` takes the defaults
+    from the physical memory and overrides them from the environment.
+    """
+
+    def __init__(self, warn_memory=None, max_memory=None, warn_time=None, max_time=None):
+        self.warn_memory = warn_memory
+        self.max_memory = max_memory
+        self.warn_time = warn_time
+        self.max_time = max_time
+
+    @classmethod
+    def from_env(cls):
+        total = physical_memory()
+        limits = cls(
+            warn_memory=None if total is None else WARN_MEMORY_FRACTION * total,
+            max_memory=None if total is None else MAX_MEMORY_FRACTION * total,
+            warn_time=DEFAULT_WARN_TIME,
+        )
+        for name, variable in LIMIT_ENV.items():
+            value = os.environ.get(variable)
+            if value:
+                scale = 1e9 if name.endswith("memory") else 1.0
+                setattr(limits, name, float(value) * scale)
+        return limits
+
+
+class CostEstimate:
+    """Grid size and predicted peak memory and run time of a local solve.
+
+    ``level`` is ``OK``, ``WARN`` or ``REFUSE``, and ``reasons`` lists the
+    exceeded limits.  ``memory`` is that of ``concurrent`` solves running at
+    once; ``time`` is the run time of one of them.
+    """
+
+    def __init__(self, grid, num_modes, num_freqs, memory, time, level=OK, reasons=(), concurrent=1):
+        self.grid = tuple(grid)
+        self.num_modes = num_modes
+        self.num_freqs = num_freqs
+        self.concurrent = concurrent
+        self.memory = float(memory)
+        self.time = float(time)
+        self.level = level
+        self.reasons = list(reasons)
+
+    @property
+    def cells(self):
+        return int(np.prod(self.grid))
+
+    def summary(self):
+        text = "{:,} cells ({} x {}): ~{}, ~{}".format(
+            self.cells, self.grid[0], self.grid[1], format_bytes(self.memory), format_seconds(self.time))
+        if self.concurrent > 1:
+            text += " ({} solves at once)".format(self.concurrent)
+        return text
+
+
+def estimate_cost(waveguide, model=None, limits=None, concurrent=1):
+    """Estimate the cost of solving a built waveguide locally and check it against ``limits``.
+
+    With ``concurrent`` > 1, e.g. the worker processes of a sweep, that many
+    solves of the waveguide run at once and need that many times the memory.
+    """
+    from mesh_refinement import grid_shape
+
+    model = load_model() if model is None else model
+    grid = grid_shape(waveguide)
+    cells = int(np.prod(grid))
+    num_modes = waveguide.mode_spec.num_modes
+    # Every frequency is a separate eigen-solve on the same grid
+    num_freqs = int(np.size(waveguide.wavelength))
+    memory = concurrent * model.memory(cells, num_modes)
+    run_time = num_freqs * model.time(cells, num_modes)
+
+    level = OK
+    reasons = []
+    if limits is not None:
+        for value, warn, refuse, what, fmt in (
+            (memory, limits.warn_memory, limits.max_memory, "memory", format_bytes),
+            (run_time, limits.warn_time, limits.max_time, "run time", format_seconds),
+        ):
+            if refuse is not None and value > refuse:
+                level = REFUSE
+                reasons.append("{} {} exceeds the limit of {}".format(what, fmt(value), fmt(refuse)))
+            elif warn is not None and value > warn:
+                level = WARN if level == OK else level
+                reasons.append("{} {} exceeds {}".format(what, fmt(value), fmt(warn)))
+    return CostEstimate(grid, num_modes, num_freqs, memory, run_time, level, reasons, concurrent)
+
+
+def _resident_memory():
+    """Resident memory of this process in bytes, or None without ``/proc``."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PeakMemory:
+    """Peak resident memory above the memory at entry, sampled by a background thread.
+
+    ``peak`` is in bytes after the ``with`` block.  Without ``/proc`` (e.g.
+    on macOS) it is the increase of ``ru_maxrss``, which is 0 if the process
+    used more memory before the block than in it.
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = 0
+        self._baseline = None
+        self._max = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self._max = max(self._max, _resident_memory())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        import resource
+
+        self._baseline = _resident_memory()
+        self._maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if self._baseline is not None:
+            self._max = self._baseline
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        import resource
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._max = max(self._max, _resident_memory())
+            # A peak above the process's earlier maximum is exact even between samples
+            if maxrss > self._maxrss:
+                self._max = max(self._max, maxrss * 1024)
+            self.peak = self._max - self._baseline
+        else:
+            # ru_maxrss is in kB on Linux and in bytes on macOS
+            scale = 1 if sys.platform == "darwin" else 1024
+            self.peak = (maxrss - self._maxrss) * scale
+        return False
+
+
+def _measure_solve(spec):
+    """Cells, mode count, run time and peak memory increase of one solve (run in a fresh process)."""
+    from mesh_refinement import grid_shape
+    from waveguide_solver import build_waveguide
+
+    waveguide = build_waveguide(spec)
+    cells = int(np.prod(grid_shape(waveguide)))
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        waveguide.mode_solver.solve()
+        seconds = time.perf_counter() - start
+    return cells, spec.num_modes, seconds, memory.peak
+
+
+def calibrate(cases=None, log=None):
+    """Measure solves of ``(type, resolution, modes)`` cases and fit a :class:`CostModel`.
+
+    Every solve runs in a new process so that its peak memory is measured
+    on its own.  Needs the ``resource`` module (not available on Windows).
+    """
+    import concurrent.futures
+    import multiprocessing
+
+    from benchmarks import SOLVE_CASES
+    from waveguide_solver import WaveguideSpec
+
+    cases = list(SOLVE_CASES) + list(EXTRA_CALIBRATION_CASES) if cases is None else cases
+    context = multiprocessing.get_context("spawn")
+    samples = []
+    for waveguide_type, grid_resolution, num_modes in cases:
+        spec = WaveguideSpec(waveguide_type=waveguide_type, grid_resolution=grid_resolution, num_modes=num_modes)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            sample = executor.submit(_measure_solve, spec).result()
+        samples.append(sample)
+        if log is not None:
+            log.write("{} res {} modes {}: {:,} cells, {}, {}\n".format(
+                waveguide_type, grid_resolution, num_modes, sample[0], format_seconds(sample[2]),
+                format_bytes(sample[3])))
+    return CostModel.fit(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m preflight",
+                                     description="Estimate the memory and run time of local mode solves.")
+    parser.add_argument("specs", nargs="?", help="JSON or CSV file with one waveguide spec per entry")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="fit the cost model to solves on this machine and store it")
+    args = parser.parse_args(argv)
+    if not args.calibrate and args.specs is None:
+        parser.error("give a spec file or --calibrate")
+
+    if args.calibrate:
+        model = calibrate(log=sys.stderr)
+        save_model(model)
+        sys.stderr.write("Stored the cost model in {}\n".format(calibration_path()))
+
+    if args.specs is not None:
+        from waveguide_solver import build_waveguide, load_specs
+
+        model = load_model()
+        limits = Limits.from_env()
+        print("Cost model: {}".format(model.source))
+        refused = 0
+        for index, spec in enumerate(load_specs(args.specs)):
+            estimate = estimate_cost(build_waveguide(spec), model, limits)
+            refused += estimate.level == REFUSE
+            print("Spec {}: {}{}".format(index, estimate.summary(),
+                                         "".join("; " + reason for reason in estimate.reasons)))
+        return 1 if refused else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
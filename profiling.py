@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Lightweight phase-level profiling.
+
+Code marks its phases with :func:`span`::
+
+    with span("eigensolve", num_modes=2) as args:
+        ...
+        args["grid"] = [ny, nz]
+
+Spans are recorded in the process-wide :data:`PROFILER` with wall-clock start
+times, so spans recorded in worker processes can be sent back and merged with
+:meth:`Profiler.add`.  Recorded spans can be exported as a Chrome trace
+(``chrome://tracing`` or https://ui.perfetto.dev), and :func:`cprofile` dumps
+a cProfile of a block for ``python -m pstats`` or snakeviz.
+"""
+import collections
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+
+# Maximum number of spans kept by a profiler
+DEFAULT_MAX_SPANS = 10000
+
+# One timed phase; ``start`` is a time.time() timestamp, ``duration`` in s
+Span = collections.namedtuple("Span", ("name", "start", "duration", "pid", "tid", "args"))
+
+
+class Profiler:
+    """Thread-safe, bounded record of timed spans."""
+
+    def __init__(self, max_spans=DEFAULT_MAX_SPANS):
+        self._spans = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    @property
+    def spans(self):
+        """All recorded spans, oldest first."""
+        with self._lock:
+            return list(self._spans)
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Time the block as a span; the yielded dict can be filled with arguments."""
+        start = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self._append(Span(name, start, time.perf_counter() - t0, os.getpid(), threading.get_ident(), args))
+
+    def record(self, name, start, end, **args):
+        """Record a span measured elsewhere from its wall-clock start and end."""
+        self._append(Span(name, start, end - start, os.getpid(), threading.get_ident(), args))
+
+    def _append(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def add(self, spans):
+        """Merge spans recorded by another profiler (e.g. in a worker process)."""
+        with self._lock:
+            self._spans.extend(Span(*s) for s in spans)
+
+    def since(self, start):
+        """Spans that started at or after the wall-clock time ``start``."""
+        return [s for s in self.spans if s.start >= start]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def write_chrome_trace(self, path, spans=None):
+        """Write spans (all recorded ones by default) as a Chrome trace JSON file."""
+        if spans is None:
+            spans = self.spans
+        events = [
+            {
+                "name": s.name,
+                "cat": s.name.split(".")[0],
+                "ph": "X",
+                "ts": s.start * 1e6,
+                "dur": s.duration * 1e6,
+                "pid": s.pid,
+                "tid": s.tid,
+                "args": s.args,
+            }
+            for s in spans
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+# Profiler of this process
+PROFILER = Profiler()
+
+
+def span(name, **args):
+    """Time a block as a span of the process-wide profiler."""
+    return PROFILER.span(name, **args)
+
+
+def format_duration(seconds):
+    if seconds < 1:
+        return "{:.0f} ms".format(seconds * 1e3)
+    return "{:.2f} s".format(seconds)
+
+
+def summarize(spans):
+    """One-line summary of the total time per span name, in order of appearance."""
+    totals = collections.OrderedDict()
+    for s in sorted(spans, key=lambda s: s.start):
+        totals[s.name] = totals.get(s.name, 0.0) + s.duration
+    return ", ".join("{} {}".format(name, format_duration(total)) for name, total in totals.items())
+
+
+@contextlib.contextmanager
+def cprofile(path):
+    """Profile the block with cProfile and dump the stats to ``path``."""
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Concurrent server mode solves.
+
+:class:`ServerPool` keeps up to ``max_concurrent`` server jobs in flight from
+a thread pool.  Requests for a mode solver that is already in flight share
+its job, transient failures (network errors) are retried with exponential
+backoff, and results are streamed back as they finish::
+
+    pool = ServerPool(max_concurrent=8)
+    for index, spec, result in pool.solve_specs(specs):
+        ...   # result is ModeSolverData or the exception of a failed solve
+
+:class:`LocalServer` stands in for the web API: it creates tasks with the
+interface of ``tidy3d.web.api.mode.ModeSolverTask`` that solve locally, with
+optional latency and injected transient failures, so the pool can be
+exercised without network access::
+
+    pool = ServerPool(server=LocalServer(latency=0.5, failures=2))
+"""
+import concurrent.futures
+import random
+import threading
+import time
+
+from profiling import span
+from solver_cache import cache_key
+from waveguide_solver import build_waveguide, run_on_server, store_result
+
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_MAX_RETRIES = 3
+
+# First retry delay and upper bound of the exponential backoff, in s
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 30.0
+
+# Errors worth retrying; ConnectionError, TimeoutError and the requests
+# library's network errors are all OSErrors
+DEFAULT_TRANSIENT_ERRORS = (OSError,)
+
+
+class LocalServer:
+    """Stand-in for the mode solver web API that solves in this process.
+
+    ``latency`` is the time (s) every task spends queued before it runs.
+    The first ``failures`` uploads raise ``ConnectionError``.  ``solve`` is
+    called with the mode solver to produce the result (a local solve by
+    default).
+    """
+
+    def __init__(self, latency=0.0, failures=0, solve=None):
+        self.latency = latency
+        self.failures = failures
+        self.solve = solve if solve is not None else (lambda mode_solver: mode_solver.solve())
+        # Number of tasks submitted, for checking deduplication
+        self.submitted = 0
+        self._lock = threading.Lock()
+
+    def create(self, mode_solver):
+        """Create a task, like ``ModeSolverTask.create``."""
+        return LocalTask(self, mode_solver)
+
+    def _fail_upload(self):
+        with self._lock:
+            if self.failures > 0:
+                self.failures -= 1
+                return True
+            return False
+
+
+class LocalTask:
+    """Task of a :class:`LocalServer`, with the ``ModeSolverTask`` methods used by ``run_on_server``."""
+
+    def __init__(self, server, mode_solver):
+        self.server = server
+        self.mode_solver = mode_solver
+        self.status = "draft"
+        self._result = None
+        self._error = None
+        self._thread = None
+
+    def upload(self, verbose=True):
+        if self.server._fail_upload():
+            raise ConnectionError("Simulated connection failure.")
+        self.status = "queued"
+
+    def submit(self):
+        with self.server._lock:
+            self.server.submitted += 1
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        time.sleep(self.server.latency)
+        self.status = "running"
+        try:
+            self._result = self.server.solve(self.mode_solver)
+        except Exception as e:
+            self._error = e
+            self.status = "error"
+        else:
+            self.status = "success"
+
+    def get_info(self):
+        return self
+
+    def get_result(self, to_file=None, verbose=True):
+        return self._result
+
+
+class ServerPool:
+    """Bounded pool of concurrent server solves with deduplication and retries.
+
+    ``server`` creates the tasks (``ModeSolverTask`` by default, or a
+    :class:`LocalServer`).  A failure that is an instance of
+    ``transient_errors`` is retried up to ``max_retries`` times, waiting
+    ``backoff * 2**attempt`` seconds (capped at ``max_backoff``, with
+    jitter) before each retry.  If a :class:`solver_cache.SolveCache` is
+    given, cached results are returned without a job and new ones are stored.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF,
+                 transient_errors=DEFAULT_TRANSIENT_ERRORS, server=None, cache=None, poll_interval=0.5,
+                 sleep=time.sleep):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.transient_errors = transient_errors
+        self.server = server
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self._sleep = sleep
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent,
+                                                               thread_name_prefix="server-solve")
+        # Cache key -> future of every job in flight
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.deduplicated = 0
+        # Seconds from job start to result of every spec of the last solve_specs
+        # call, by spec index (None for cached results and specs that failed to build)
+        self.solve_times = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs; with ``wait``, wait for the jobs in flight."""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def retry_delay(self, attempt):
+        """Seconds to wait before retry number ``attempt`` (counting from 0)."""
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self, mode_solver, timing):
+        """Run one job, retrying transient failures (runs in a pool thread).
+
+        The job's start and end times are stored in ``timing``.
+        """
+        create_task = None if self.server is None else self.server.create
+        timing["start"] = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    return run_on_server(mode_solver, poll_interval=self.poll_interval, create_task=create_task)
+                except self.transient_errors:
+                    if attempt >= self.max_retries:
+                        raise
+                with span("server.backoff", attempt=attempt + 1):
+                    self._sleep(self.retry_delay(attempt))
+                with self._lock:
+                    self.retries += 1
+                attempt += 1
+        finally:
+            timing["end"] = time.perf_counter()
+
+    def submit(self, mode_solver):
+        """Queue a server solve and return a ``concurrent.futures.Future``.
+
+        A mode solver identical to one in flight gets that job's future.  The
+        future's ``timing`` dictionary gets the ``start`` and ``end``
+        (``time.perf_counter``) of the job once it runs; it is empty for
+        cached results.
+        """
+        key = cache_key(mode_solver, server=True)
+        if self.cache is not None:
+            mode_data = self.cache.get(key)
+            if mode_data is not None:
+                future = concurrent.futures.Future()
+                future.timing = {}
+                future.set_result(mode_data)
+                return future
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            timing = {}
+            future = self._executor.submit(self._run, mode_solver, timing)
+            future.timing = timing
+            self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return future
+
+    def _finish(self, key, future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if self.cache is not None and not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    def solve_specs(self, specs):
+        """Solve specs concurrently and yield ``(index, spec, result)`` as they finish.
+
+        ``result`` is the ``ModeSolverData``, or the exception of a spec that
+        failed to build or solve.  ``solve_times[index]`` holds the run time
+        of the spec's job by the time it is yielded.
+        """
+        self.solve_times = {}
+        futures = {}
+        for index, spec in enumerate(specs):
+            try:
+                waveguide = build_waveguide(spec)
+                future = self.submit(waveguide.mode_solver)
+            except Exception as e:
+                self.solve_times[index] = None
+                yield index, spec, e
+                continue
+            futures[future] = futures.get(future, []) + [(index, spec, waveguide)]
+        for future in concurrent.futures.as_completed(futures):
+            timing = future.timing
+            for index, spec, waveguide in futures[future]:
+                self.solve_times[index] = timing["end"] - timing["start"] if "end" in timing else None
+                error = future.exception()
+                if error is not None:
+                    yield index, spec, error
+                    continue
+                store_result(waveguide, future.result(), server=True)
+                yield index, spec, future.result()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Background mode solves for the GUI.
+
+:class:`SolveWorker` runs solves in a separate process so the Tk main loop
+stays responsive.  Jobs are queued in the calling process and sent to the
+worker one at a time; results come back through a multiprocessing queue that
+the GUI drains from ``root.after`` callbacks via :meth:`SolveWorker.poll`.
+A running job is cancelled by terminating the worker process, which is
+restarted on demand for the next job.  The profiling spans recorded while a
+job ran are returned with it in ``job.spans``.
+
+A job submitted with a ``field_dir`` does not send its ``ModeSolverData``
+back: the worker writes the fields to memory-mapped files in that directory
+(see :func:`field_storage.export_modes`) and returns the small
+:class:`field_storage.ModeFiles` descriptor instead, which is far cheaper
+than pickling the fields at high grid resolutions.  The directory belongs
+to the worker until the job is done; the files of jobs that are cancelled
+or fail are deleted, and the caller owns (and must close) the files of a
+finished job.
+"""
+import collections
+import multiprocessing
+import queue
+import shutil
+import time
+import traceback
+
+# Event kinds returned by SolveWorker.poll
+STARTED = "started"
+DONE = "done"
+ERROR = "error"
+
+
+def _worker_main(jobs, events):
+    """Entry point of the worker process: solve jobs until a None job arrives."""
+    from field_storage import export_modes
+    from profiling import PROFILER, cprofile, span
+    from solver_cache import SolveCache
+    from waveguide_solver import load_solver_modules, solve_waveguide
+
+    # Import tidy3d before the first job arrives
+    load_solver_modules()
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, waveguide, server, use_symmetry, profile_path, field_dir, cache_dir = job
+        events.put((STARTED, job_id, None, None))
+        PROFILER.clear()
+        cache = None if cache_dir is None else SolveCache(cache_dir)
+        try:
+            if profile_path is not None:
+                with cprofile(profile_path):
+                    result = solve_waveguide(waveguide, server=server, cache=cache, use_symmetry=use_symmetry)
+            else:
+                result = solve_waveguide(waveguide, server=server, cache=cache, use_symmetry=use_symmetry)
+            if field_dir is not None:
+                with span("transport.export"):
+                    result = export_modes(result, field_dir)
+        except Exception as e:
+            events.put((ERROR, job_id, "{}\n{}".format(e, traceback.format_exc()), PROFILER.spans))
+        else:
+            events.put((DONE, job_id, result, PROFILER.spans))
+
+
+def _discard_fields(job):
+    """Delete the field files of a job whose result will never be used."""
+    if job.field_dir is not None:
+        shutil.rmtree(job.field_dir, ignore_errors=True)
+
+
+class SolveJob:
+    """A queued or running solve request."""
+
+    def __init__(self, job_id, waveguide, server=False, context=None, profile_path=None, use_symmetry=False,
+                 field_dir=None, cache_dir=None):
+        self.job_id = job_id
+        self.waveguide = waveguide
+        self.server = server
+        # Solve every symmetry class on the reduced domain
+        self.use_symmetry = use_symmetry
+        # File the worker dumps a cProfile of the solve to, if given
+        self.profile_path = profile_path
+        # Directory the worker writes the fields to (result is then ModeFiles)
+        self.field_dir = field_dir
+        # Result cache directory the worker reads and updates, if given
+        self.cache_dir = cache_dir
+        # Arbitrary caller data returned with the job's events
+        self.context = context
+        self.submitted = time.time()
+        self.started = None
+        # ModeSolverData (or ModeFiles) when done, error message on failure
+        self.result = None
+        # Profiling spans recorded by the worker while solving
+        self.spans = []
+
+    @property
+    def elapsed(self):
+        """Seconds since the job started running (0 while queued)."""
+        if self.started is None:
+            return 0.0
+        return time.time() - self.started
+
+
+class SolveWorker:
+    """Queue of waveguide solves executed one at a time in a worker process."""
+
+    def __init__(self):
+        # Spawn rather than fork so the worker never inherits Tk state
+        self._mp = multiprocessing.get_context("spawn")
+        self._process = None
+        self._jobs = None
+        self._events = None
+        self._next_id = 1
+        self.queued = collections.OrderedDict()
+        self.running = None
+
+    @property
+    def busy(self):
+        """True while a job is running or queued."""
+        return self.running is not None or bool(self.queued)
+
+    def _ensure_process(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        self._jobs = self._mp.Queue()
+        self._events = self._mp.Queue()
+        self._process = self._mp.Process(
+            target=_worker_main, args=(self._jobs, self._events), daemon=True
+        )
+        self._process.start()
+
+    def start(self):
+        """Start the worker process ahead of the first job."""
+        self._ensure_process()
+
+    def submit(self, waveguide, server=False, context=None, profile_path=None, use_symmetry=False,
+               field_dir=None, cache_dir=None):
+        """Queue a solve and return its job.
+
+        With ``field_dir`` the result is a :class:`field_storage.ModeFiles`
+        for fields written to that directory.  With ``cache_dir`` the worker
+        checks and updates the result cache in that directory.
+        """
+        job = SolveJob(self._next_id, waveguide, server=server, context=context, profile_path=profile_path,
+                       use_symmetry=use_symmetry, field_dir=field_dir, cache_dir=cache_dir)
+        self._next_id += 1
+        self.queued[job.job_id] = job
+        self._dispatch()
+        return job
+
+    def _dispatch(self):
+        """Send the next queued job to the worker if it is idle."""
+        if self.running is not None or not self.queued:
+            return
+        self._ensure_process()
+        _, job = self.queued.popitem(last=False)
+        self.running = job
+        self._jobs.put((job.job_id, job.waveguide, job.server, job.use_symmetry, job.profile_path,
+                        job.field_dir, job.cache_dir))
+
+    def cancel(self, job_id=None):
+        """Cancel a job (the running one by default) and return it, or None.
+
+        Cancelling the running job terminates the worker process; a server
+        job that was already submitted keeps running on the server, but its
+        result is discarded.
+        """
+        if job_id is None or (self.running is not None and self.running.job_id == job_id):
+            job = self.running
+            if job is None:
+                return None
+            self._terminate()
+            self.running = None
+            _discard_fields(job)
+            self._dispatch()
+            return job
+        job = self.queued.pop(job_id, None)
+        if job is not None:
+            _discard_fields(job)
+        return job
+
+    def cancel_all(self):
+        """Cancel the running job and clear the queue; return the cancelled jobs."""
+        cancelled = list(self.queued.values())
+        self.queued.clear()
+        for job in cancelled:
+            _discard_fields(job)
+        running = self.cancel()
+        if running is not None:
+            cancelled.insert(0, running)
+        return cancelled
+
+    def poll(self):
+        """Return a list of ``(kind, job)`` events, with results in ``job.result``.
+
+        Never blocks; call it periodically from the Tk main loop.
+        """
+        events = []
+        while self._events is not None:
+            try:
+                kind, job_id, payload, spans = self._events.get_nowait()
+            except queue.Empty:
+                break
+            job = self.running
+            if job is None or job.job_id != job_id:
+                # Stale event from a cancelled job
+                continue
+            if kind == STARTED:
+                job.started = time.time()
+            else:
+                job.result = payload
+                job.spans = spans
+                self.running = None
+                if kind == ERROR:
+                    _discard_fields(job)
+            events.append((kind, job))
+
+        # Detect a worker that died without reporting (e.g. out of memory)
+        if self.running is not None and not self._process.is_alive():
+            job = self.running
+            job.result = "Solver process exited unexpectedly (exit code {}).".format(
+                self._process.exitcode)
+            self.running = None
+            _discard_fields(job)
+            events.append((ERROR, job))
+
+        self._dispatch()
+        return events
+
+    def _terminate(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+        self._jobs = None
+        self._events = None
+
+    def shutdown(self):
+        """Stop the worker process and drop all queued jobs."""
+        jobs = list(self.queued.values())
+        if self.running is not None:
+            jobs.append(self.running)
+        self.queued.clear()
+        self.running = None
+        if self._process is not None and self._process.is_alive():
+            self._jobs.put(None)
+            self._process.join(timeout=1.0)
+        self._terminate()
+        for job in jobs:
+            _discard_fields(job)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Persistent on-disk cache for mode solver results.
+
+Results are stored as ``ModeSolverData`` HDF5 files named by a SHA-256 hash of
+the mode solver definition (the waveguide structures, grid and ``ModeSpec``),
+the solver kind (local or server) and the tidy3d version.  The least recently
+used entries are evicted once the cache grows beyond ``max_bytes``.
+"""
+import hashlib
+import os
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tidy3d-mode-explorer")
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+# Environment variable that overrides the default cache directory
+CACHE_DIR_ENV = "MODE_EXPLORER_CACHE_DIR"
+
+CACHE_SUFFIX = ".hdf5"
+
+
+def cache_key(mode_solver, server=False, symmetry=False):
+    """Canonical hash of a mode solver definition, solver kind and symmetry use."""
+    import tidy3d
+
+    h = hashlib.sha256()
+    h.update(tidy3d.__version__.encode())
+    h.update(b"server" if server else b"local")
+    if symmetry:
+        h.update(b"symmetry")
+    h.update(mode_solver._json_string.encode())
+    return h.hexdigest()
+
+
+class SolveCache:
+    """Content-addressed, size-bounded LRU cache of ``ModeSolverData`` files."""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        if cache_dir is None:
+            cache_dir = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """Return the cached data for ``key``, or None on a miss."""
+        from tidy3d import ModeSolverData
+
+        path = self._path(key)
+        data = None
+        if os.path.exists(path):
+            try:
+                data = ModeSolverData.from_file(path)
+            except Exception:
+                # Drop unreadable entries (e.g. written by an incompatible version)
+                self._remove(path)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Touch the file so that eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store data under ``key`` and evict old entries if over the size limit."""
+        path = self._path(key)
+        # Write to a temporary file first so readers never see partial files
+        tmp_path = os.path.join(self.cache_dir, "{}.{}.{}.tmp{}".format(
+            key, os.getpid(), threading.get_ident(), CACHE_SUFFIX))
+        data.to_file(tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    @staticmethod
+    def _remove(path):
+        """Remove a cache file, returning False if it could not be removed."""
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+    def _entries(self):
+        """List (mtime, size, path) of all cache files, oldest first."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_SUFFIX) or ".tmp" in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        """Total size of the cached files in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+
+    def clear(self):
+        """Remove every cached entry and reset the counters."""
+        for _, _, path in self._entries():
+            self._remove(path)
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and the current cache size."""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""Precomputed lookup tables of mode properties with N-D interpolation.
+
+A table is built by solving a parameter grid around a base
+:class:`waveguide_solver.WaveguideSpec` (see :func:`sweep.run_sweep`) and is
+stored as two files: ``<name>.npy`` with the property values (float32,
+memory-mapped when loaded) and ``<name>.json`` with the base spec and axes.
+Specs that only differ from the base spec along the table axes are answered
+by multilinear interpolation, with an error estimate from the curvature of
+the table::
+
+    python -m surrogate build --preset soi220-strip
+    python -m surrogate list
+
+The GUI loads every table in ``~/.cache/tidy3d-mode-explorer/tables`` (or
+``$MODE_EXPLORER_TABLE_DIR``) and checks them before running a solve.
+"""
+import argparse
+import dataclasses
+import glob
+import itertools
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from solver_cache import DEFAULT_CACHE_DIR
+from sweep import run_sweep
+from waveguide_solver import WaveguideSpec
+
+DEFAULT_TABLE_DIR = os.path.join(DEFAULT_CACHE_DIR, "tables")
+
+# Environment variable that overrides the default table directory
+TABLE_DIR_ENV = "MODE_EXPLORER_TABLE_DIR"
+
+# Properties stored in a table
+TABLE_PROPERTIES = ("n_eff", "n_group", "mode_area")
+
+# Spec fields that do not change the solved properties
+IGNORED_FIELDS = ("target_neff", "num_modes", "use_symmetry")
+
+# Standard platforms: name -> (base spec, axes)
+PRESETS = {
+    "soi220-strip": (
+        WaveguideSpec(waveguide_type="strip", core_thickness=0.22, clad_index=1.44, num_modes=2),
+        {"core_width": np.linspace(0.35, 0.8, 10), "wavelength": np.linspace(1.5, 1.6, 5)},
+    ),
+    "soi220-rib": (
+        WaveguideSpec(waveguide_type="rib", core_thickness=0.22, slab_thickness=0.09, clad_index=1.44, num_modes=2),
+        {"core_width": np.linspace(0.4, 1.0, 13), "wavelength": np.linspace(1.5, 1.6, 5)},
+    ),
+}
+
+
+def table_dir():
+    """Directory that holds the lookup tables."""
+    return os.environ.get(TABLE_DIR_ENV, DEFAULT_TABLE_DIR)
+
+
+def _table_paths(path):
+    stem, ext = os.path.splitext(path)
+    if ext not in (".npy", ".json"):
+        stem = path
+    return stem + ".npy", stem + ".json"
+
+
+def _curvature(values, axis):
+    """Absolute second differences of ``values`` along ``axis`` (edges repeated)."""
+    values = np.moveaxis(values, axis, 0)
+    curvature = np.empty_like(values)
+    curvature[1:-1] = np.abs(values[2:] - 2 * values[1:-1] + values[:-2])
+    curvature[0] = curvature[1]
+    curvature[-1] = curvature[-2]
+    return np.moveaxis(curvature, 0, axis)
+
+
+class SurrogateTable:
+    """Mode properties on a regular grid of spec parameters.
+
+    ``values`` has shape ``axis_lengths + (len(TABLE_PROPERTIES), num_modes)``.
+    """
+
+    def __init__(self, base_spec, axes, values, name=None):
+        self.base_spec = base_spec
+        self.axes = {axis: np.asarray(points, dtype=float) for axis, points in axes.items()}
+        self.values = values
+        self.name = name
+        self._curvatures = None
+        for axis, points in self.axes.items():
+            if len(points) < 3 or np.any(np.diff(points) <= 0):
+                raise ValueError("Table axis '{}' needs at least 3 increasing values.".format(axis))
+
+    @property
+    def num_modes(self):
+        return self.values.shape[-1]
+
+    @classmethod
+    def from_sweep(cls, result, name=None):
+        """Create a table from a :class:`sweep.SweepResult`."""
+        values = np.stack([getattr(result, prop) for prop in TABLE_PROPERTIES], axis=-2)
+        return cls(result.base_spec, result.axes, values.astype(np.float32), name=name)
+
+    def save(self, path):
+        """Write the table to ``<path>.npy`` and ``<path>.json``."""
+        values_path, meta_path = _table_paths(path)
+        np.save(values_path, np.asarray(self.values, dtype=np.float32))
+        meta = {
+            "base_spec": self.base_spec.to_dict(),
+            "axes": {axis: points.tolist() for axis, points in self.axes.items()},
+            "properties": list(TABLE_PROPERTIES),
+            "failed_points": int(np.isnan(self.values[..., 0, 0]).sum()),
+        }
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Load a table; the values are memory-mapped, not read into memory."""
+        values_path, meta_path = _table_paths(path)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if tuple(meta["properties"]) != TABLE_PROPERTIES:
+            raise ValueError("Table {} has unsupported properties {}.".format(path, meta["properties"]))
+        values = np.load(values_path, mmap_mode="r")
+        name = os.path.splitext(os.path.basename(meta_path))[0]
+        return cls(WaveguideSpec.from_dict(meta["base_spec"]), meta["axes"], values, name=name)
+
+    def covers(self, spec):
+        """True if ``spec`` lies inside the table and matches its base spec elsewhere."""
+        if spec.num_modes > self.num_modes:
+            return False
+        for field in dataclasses.fields(WaveguideSpec):
+            name = field.name
+            value = getattr(spec, name)
+            if name in self.axes:
+                points = self.axes[name]
+                if value is None or not points[0] <= value <= points[-1]:
+                    return False
+            elif name not in IGNORED_FIELDS:
+                base = getattr(self.base_spec, name)
+                if isinstance(base, float) and isinstance(value, (int, float)):
+                    if not math.isclose(base, value, rel_tol=1e-9, abs_tol=1e-12):
+                        return False
+                elif base != value:
+                    return False
+        return True
+
+    def _interpolate_array(self, table, cells, fractions):
+        """Multilinear interpolation of ``table`` at prepared cell positions."""
+        result = 0.0
+        for corner in itertools.product((0, 1), repeat=len(cells)):
+            weight = np.ones_like(fractions[0])
+            for bit, t in zip(corner, fractions):
+                weight = weight * (t if bit else 1 - t)
+            index = tuple(cell + bit for cell, bit in zip(cells, corner))
+            result = result + weight[:, None, None] * np.asarray(table[index], dtype=float)
+        return result
+
+    def interpolate(self, points):
+        """Interpolate the table at points given as ``{axis: values}``.
+
+        Returns ``(values, errors)``, each a dictionary of arrays of shape
+        ``point_shape + (num_modes,)`` keyed by ``TABLE_PROPERTIES``.  The
+        error is estimated from the second differences of the table (the
+        linear interpolation error ``f'' h^2 t (1 - t) / 2`` summed over the
+        axes).  Points outside the table are NaN with an infinite error.
+        """
+        coords = np.broadcast_arrays(*[np.asarray(points[axis], dtype=float) for axis in self.axes])
+        shape = coords[0].shape
+        cells, fractions = [], []
+        inside = np.ones(coords[0].size, dtype=bool)
+        for axis_points, coord in zip(self.axes.values(), coords):
+            coord = coord.ravel()
+            cell = np.clip(np.searchsorted(axis_points, coord, side="right") - 1, 0, len(axis_points) - 2)
+            t = (coord - axis_points[cell]) / (axis_points[cell + 1] - axis_points[cell])
+            inside &= (t >= 0) & (t <= 1)
+            cells.append(cell)
+            fractions.append(np.clip(t, 0, 1))
+
+        values = self._interpolate_array(self.values, cells, fractions)
+        if self._curvatures is None:
+            table = np.asarray(self.values, dtype=float)
+            self._curvatures = [_curvature(table, axis) for axis in range(len(self.axes))]
+        errors = 0.0
+        for curvature, t in zip(self._curvatures, fractions):
+            errors = errors + (t * (1 - t) / 2)[:, None, None] * self._interpolate_array(curvature, cells, fractions)
+
+        values[~inside] = np.nan
+        errors = np.where(inside[:, None, None], errors, np.inf)
+        out_shape = shape + (self.num_modes,)
+        return (
+            {prop: values[:, i].reshape(out_shape) for i, prop in enumerate(TABLE_PROPERTIES)},
+            {prop: errors[:, i].reshape(out_shape) for i, prop in enumerate(TABLE_PROPERTIES)},
+        )
+
+    def lookup(self, spec):
+        """Interpolated ``(values, errors)`` of one spec's modes, or None if not covered."""
+        if not self.covers(spec):
+            return None
+        values, errors = self.interpolate({axis: getattr(spec, axis) for axis in self.axes})
+        num_modes = spec.num_modes
+        return (
+            {prop: value[:num_modes] for prop, value in values.items()},
+            {prop: error[:num_modes] for prop, error in errors.items()},
+        )
+
+
+def build_table(path, base_spec, axes, max_workers=None, cache_dir=None, on_point=None):
+    """Solve the grid ``axes`` around ``base_spec`` and save it as a table."""
+    result = run_sweep(base_spec, axes, max_workers=max_workers, cache_dir=cache_dir,
+                       on_point=on_point, warm_start=True)
+    table = SurrogateTable.from_sweep(result, name=os.path.basename(path))
+    table.save(path)
+    return table
+
+
+def load_tables(directory=None):
+    """Load every table in a directory (the default table directory if None)."""
+    if directory is None:
+        directory = table_dir()
+    tables = []
+    for meta_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            tables.append(SurrogateTable.load(meta_path))
+        except (OSError, ValueError, KeyError):
+            # Skip incomplete or incompatible tables
+            continue
+    return tables
+
+
+def lookup(tables, spec):
+    """Answer a spec from the first covering table: ``(table, values, errors)`` or None."""
+    for table in tables:
+        answer = table.lookup(spec)
+        if answer is not None:
+            return (table,) + answer
+    return None
+
+
+def _parse_axis(text):
+    """Parse an ``name=start:stop:num`` axis argument."""
+    try:
+        name, values = text.split("=")
+        start, stop, num = values.split(":")
+        return name, np.linspace(float(start), float(stop), int(num))
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected name=start:stop:num, got '{}'.".format(text))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m surrogate", description="Build and list mode lookup tables.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="solve a parameter grid and store it as a table")
+    build.add_argument("--preset", choices=sorted(PRESETS), help="standard platform table to build")
+    build.add_argument("--base", help="JSON file with the base waveguide spec (instead of a preset)")
+    build.add_argument("--axis", action="append", type=_parse_axis, default=[],
+                       help="table axis as name=start:stop:num (repeatable)")
+    build.add_argument("-o", "--output", help="table path without extension (default: table directory)")
+    build.add_argument("--workers", type=int, default=None, help="solver processes (default: all cores)")
+
+    subparsers.add_parser("list", help="list the tables in the table directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for table in load_tables():
+            ranges = ", ".join("{} {:g}..{:g} ({})".format(axis, points[0], points[-1], len(points))
+                               for axis, points in table.axes.items())
+            print("{}: {} waveguide, {} modes; {}".format(
+                table.name, table.base_spec.waveguide_type, table.num_modes, ranges))
+        return 0
+
+    if args.preset is not None:
+        base_spec, axes = PRESETS[args.preset]
+        name = args.preset
+    elif args.base is not None:
+        with open(args.base) as f:
+            base_spec = WaveguideSpec.from_dict(json.load(f))
+        axes = {}
+        name = os.path.splitext(os.path.basename(args.base))[0]
+    else:
+        parser.error("build needs --preset or --base")
+    axes = dict(axes)
+    axes.update(args.axis)
+    if not axes:
+        parser.error("build needs at least one --axis")
+
+    output = args.output
+    if output is None:
+        os.makedirs(table_dir(), exist_ok=True)
+        output = os.path.join(table_dir(), name)
+
+    total = int(np.prod([len(points) for points in axes.values()]))
+    done = []
+
+    def progress(index, props):
+        done.append(index)
+        sys.stderr.write("\rSolved {} of {} points".format(len(done), total))
+
+    table = build_table(output, base_spec, axes, max_workers=args.workers, on_point=progress)
+    failed = int(np.isnan(table.values[..., 0, 0]).sum())
+    sys.stderr.write("\nWrote {} ({} failed points)\n".format(output, failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
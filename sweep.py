@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""Parameter sweeps over waveguide specs using every local core.
+
+A sweep takes a base :class:`waveguide_solver.WaveguideSpec` and one or more
+axes (spec field name -> values).  Every point of the Cartesian product is
+solved locally in a process pool and the mode properties are collected in
+NumPy arrays of shape ``axis_lengths + (num_modes,)``.
+
+Example::
+
+    result = run_sweep(WaveguideSpec(num_modes=2),
+                       {"core_width": np.linspace(0.4, 0.8, 9),
+                        "core_thickness": [0.21, 0.22, 0.23]})
+    result.n_eff.shape   # (9, 3, 2)
+
+Warm-started sweeps (``warm_start=True``) solve the points along the last
+axis in order and seed each solve's ``target_neff`` from the previous points;
+lines are split into chunks so that every worker gets one.
+Server sweeps (``server=True``) keep many server jobs in flight at once with
+a :class:`server_pool.ServerPool`.  With ``track_modes=True`` the modes are
+relabelled by field overlaps so that crossing modes keep their index (see
+:mod:`mode_tracking`).
+"""
+import concurrent.futures
+import contextlib
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from mode_tracking import relabel, track_modes, tracking_fields
+from server_pool import DEFAULT_MAX_CONCURRENT, ServerPool
+from waveguide_solver import MODE_PROPERTIES, mode_properties, solve
+
+# Spec fields that can be swept
+SWEEP_PARAMETERS = (
+    "core_width",
+    "core_thickness",
+    "sidewall_angle",
+    "slab_thickness",
+    "second_core_width",
+    "gap",
+    "core_index",
+    "clad_index",
+    "box_index",
+    "clad_thickness",
+    "box_thickness",
+    "wavelength",
+    "bend_radius",
+)
+
+# Fewest points of a warm-started chunk: the first is solved cold and seeds the others
+MIN_WARM_CHUNK = 3
+
+# Interval (s) at which run_sweep checks for failed workers while waiting for points
+POLL_INTERVAL = 0.2
+
+# Per-point statistics recorded by run_sweep
+SOLVE_STATS = (
+    "target_neff",
+    "solve_time",
+    "eigensolver_steps",
+    "cold_solve_time",
+    "cold_eigensolver_steps",
+)
+
+
+class SweepResult:
+    """Mode properties of a sweep, indexed by the sweep axes and mode index."""
+
+    def __init__(self, base_spec, axes, num_modes):
+        self.base_spec = base_spec
+        self.axes = OrderedDict((name, np.asarray(values, dtype=float)) for name, values in axes.items())
+        self.num_modes = num_modes
+        shape = self.shape + (num_modes,)
+        for name in MODE_PROPERTIES:
+            setattr(self, name, np.full(shape, np.nan))
+        # Error message of every point that failed, keyed by its index tuple
+        self.errors = {}
+        # Per-point solve statistics (NaN where not measured)
+        for name in SOLVE_STATS:
+            setattr(self, name, np.full(self.shape, np.nan))
+        # Solver mode index of every tracked mode and its overlap with the neighbour (see track)
+        self.mode_order = None
+        self.mode_overlap = None
+
+    @property
+    def shape(self):
+        """Shape of the sweep grid (without the mode axis)."""
+        return tuple(len(values) for values in self.axes.values())
+
+    def spec_at(self, index):
+        """The spec solved at a grid index."""
+        changes = {name: float(values[i]) for (name, values), i in zip(self.axes.items(), index)}
+        return self.base_spec.replace(**changes)
+
+    def set_point(self, index, props):
+        """Store the per-mode property dictionaries of one grid point."""
+        for mode_index, mode_props in enumerate(props[:self.num_modes]):
+            for name in MODE_PROPERTIES:
+                getattr(self, name)[index + (mode_index,)] = mode_props[name]
+
+    def set_stats(self, index, stats):
+        """Store the solve statistics of one grid point."""
+        for name, value in stats.items():
+            if value is not None:
+                getattr(self, name)[index] = value
+
+    def track(self, fields):
+        """Relabel the modes of every point consistently from their tracking fields.
+
+        ``fields`` maps grid indices to :class:`mode_tracking.TrackingFields`.
+        Each point is matched to the point before it along the last axis,
+        and the first point of a line to the first point of the line before
+        it.  The mode properties are reordered in place; ``mode_order`` holds
+        the solver's mode index of every tracked mode.
+        """
+        indices = list(itertools.product(*(range(n) for n in self.shape)))
+        references = []
+        for index in indices:
+            # The neighbour with the last non-zero coordinate one step back
+            changed = [axis for axis, i in enumerate(index) if i > 0]
+            if changed:
+                reference = list(index)
+                reference[changed[-1]] -= 1
+                references.append(int(np.ravel_multi_index(reference, self.shape)))
+            else:
+                references.append(-1)
+        tracking = track_modes([fields.get(index) for index in indices], references)
+        self.mode_order = tracking.order.reshape(self.shape + (-1,))
+        self.mode_overlap = tracking.overlap.reshape(self.shape + (-1,))
+        for name in MODE_PROPERTIES:
+            setattr(self, name, relabel(getattr(self, name), self.mode_order))
+        return tracking
+
+    def warm_start_savings(self):
+        """Summarize eigensolver steps and solve time of seeded vs cold solves.
+
+        Only points that were solved both ways (``compare_cold``) are used.
+        """
+        compared = ~np.isnan(self.cold_solve_time)
+        if not compared.any():
+            return None
+        summary = {"points": int(compared.sum())}
+        for name in ("eigensolver_steps", "solve_time"):
+            warm = getattr(self, name)[compared].sum()
+            cold = getattr(self, "cold_" + name)[compared].sum()
+            summary[name] = float(warm)
+            summary["cold_" + name] = float(cold)
+            summary[name + "_saved"] = float(1 - warm / cold) if cold > 0 else 0.0
+        return summary
+
+    def save(self, path):
+        """Save the axes and property arrays to a NumPy ``.npz`` file."""
+        arrays = {"axis_" + name: values for name, values in self.axes.items()}
+        arrays.update({name: getattr(self, name) for name in MODE_PROPERTIES + SOLVE_STATS})
+        if self.mode_order is not None:
+            arrays.update(mode_order=self.mode_order, mode_overlap=self.mode_overlap)
+        np.savez(path, **arrays)
+
+
+class EigensolverCounter:
+    """Number of shift-invert operator applications made by the eigensolver."""
+
+    def __init__(self):
+        self.count = 0
+
+
+@contextlib.contextmanager
+def count_eigensolver_steps():
+    """Count the ARPACK iterations of local mode solves inside the block.
+
+    The local mode solver calls ``scipy.sparse.linalg.eigs`` in shift-invert
+    mode, where every Arnoldi iteration applies the inverse operator once.
+    This temporarily wraps ``eigs`` so that operator is built here (with the
+    same sparse LU factorization scipy uses) and its applications are counted.
+    Not thread-safe: only use it where a single thread is solving.
+    """
+    import scipy.sparse as sp
+    import scipy.sparse.linalg as spl
+
+    counter = EigensolverCounter()
+    original_eigs = spl.eigs
+
+    def counting_eigs(A, k=6, M=None, sigma=None, **kwargs):
+        if sigma is not None and M is None:
+            op_inv = kwargs.pop("OPinv", None)
+            if op_inv is None:
+                shifted = (A - sigma * sp.eye(A.shape[0], dtype=A.dtype, format="csr")).tocsc()
+                op_inv = spl.splu(shifted)
+                solve_fn = op_inv.solve
+            else:
+                solve_fn = op_inv.matvec
+
+            def counted_solve(x):
+                counter.count += 1
+                return solve_fn(x)
+
+            kwargs["OPinv"] = spl.LinearOperator(A.shape, matvec=counted_solve, dtype=A.dtype)
+        return original_eigs(A, k=k, M=M, sigma=sigma, **kwargs)
+
+    spl.eigs = counting_eigs
+    try:
+        yield counter
+    finally:
+        spl.eigs = original_eigs
+
+
+def predict_neff(values, n_effs, value):
+    """Extrapolate the fundamental n_eff to a new parameter value.
+
+    Uses a quadratic fit through the last three points, a linear one through
+    the last two, or the previous value; returns None without history.
+    """
+    if not n_effs:
+        return None
+    if len(n_effs) == 1:
+        return n_effs[-1]
+    degree = min(len(n_effs), 3) - 1
+    coeffs = np.polyfit(values[-degree - 1:], n_effs[-degree - 1:], degree)
+    return float(np.polyval(coeffs, value))
+
+
+def _solve_point(spec, cache_dir, track_modes=False):
+    """Solve one sweep point and return its mode properties and tracking fields (runs in a worker)."""
+    cache = None
+    if cache_dir is not None:
+        from solver_cache import SolveCache
+        cache = SolveCache(cache_dir)
+    mode_data = solve(spec, cache=cache)
+    return mode_properties(mode_data), tracking_fields(mode_data) if track_modes else None
+
+
+def _timed_solve(spec, cache_dir, track_modes=False, count_steps=False):
+    """Solve one point and return its properties, tracking fields and solve statistics.
+
+    The eigensolver iterations are only counted with ``count_steps``, as
+    counting replaces scipy's ``eigs`` for the duration of the solve.
+    """
+    start = time.perf_counter()
+    if count_steps:
+        with count_eigensolver_steps() as steps:
+            props, fields = _solve_point(spec, cache_dir, track_modes)
+        return props, fields, {"solve_time": time.perf_counter() - start, "eigensolver_steps": steps.count}
+    props, fields = _solve_point(spec, cache_dir, track_modes)
+    return props, fields, {"solve_time": time.perf_counter() - start}
+
+
+def _solve_line(points, warm_start, compare_cold, cache_dir, track_modes=False, report=None):
+    """Solve a line of sweep points in order.
+
+    ``points`` is a list of ``(index, spec, value)``.  With ``warm_start``,
+    each solve gets a ``target_neff`` extrapolated from the earlier points of
+    the line.  ``report((index, props_or_error_message, stats, fields))`` is
+    called as each point finishes, where ``fields`` are the tracking fields
+    with ``track_modes``.  Eigensolver iterations are counted with
+    ``compare_cold`` only.
+    """
+    report = _REPORT_QUEUE.put if report is None else report
+    values = []
+    n_effs = []
+    for index, spec, value in points:
+        target = predict_neff(values, n_effs, value) if warm_start else None
+        stats = {"target_neff": spec.target_neff if target is None else target}
+        try:
+            props, fields, solve_stats = _timed_solve(
+                spec.replace(target_neff=stats["target_neff"]), cache_dir, track_modes, count_steps=compare_cold)
+            stats.update(solve_stats)
+            if compare_cold and target is not None:
+                # Solve again without the seed and without the cache for reference
+                _, _, cold_stats = _timed_solve(spec, None, count_steps=True)
+                stats.update(("cold_" + name, v) for name, v in cold_stats.items())
+        except Exception as e:
+            report((index, str(e), stats, None))
+            continue
+        values.append(value)
+        n_effs.append(props[0]["n_eff"])
+        report((index, props, stats, fields))
+
+
+# Queue a pool worker reports its finished points to (see _init_worker)
+_REPORT_QUEUE = None
+
+
+def _init_worker(report_queue):
+    global _REPORT_QUEUE
+    _REPORT_QUEUE = report_queue
+
+
+def _split_line(line, chunks):
+    """Split a line of points into ``chunks`` contiguous parts of nearly equal length."""
+    bounds = np.linspace(0, len(line), chunks + 1).round().astype(int)
+    return [line[start:stop] for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def _run_server_sweep(result, points, finish, max_concurrent, cache_dir, server, track_modes):
+    """Solve sweep points on the server, finishing each as its job completes."""
+    cache = None
+    if cache_dir is not None:
+        from solver_cache import SolveCache
+        cache = SolveCache(cache_dir)
+    pool = ServerPool(
+        max_concurrent=max_concurrent or DEFAULT_MAX_CONCURRENT,
+        server=None if server is True else server,
+        cache=cache,
+    )
+    with pool:
+        for i, spec, mode_data in pool.solve_specs([spec for _, spec, _ in points]):
+            index = points[i][0]
+            if isinstance(mode_data, Exception):
+                finish((index, str(mode_data), {}, None))
+            else:
+                fields = tracking_fields(mode_data) if track_modes else None
+                finish((index, mode_properties(mode_data), {}, fields))
+
+
+def run_sweep(base_spec, axes, max_workers=None, cache_dir=None, on_point=None,
+              warm_start=False, compare_cold=False, server=False, track_modes=False):
+    """Solve every point of a sweep grid and return a :class:`SweepResult`.
+
+    ``axes`` maps spec field names (see ``SWEEP_PARAMETERS``) to sequences of
+    values; the grid is their Cartesian product in the given order.  Points
+    are solved locally in a pool of ``max_workers`` processes (all cores by
+    default, or in this process if ``max_workers`` is 0).  If ``cache_dir``
+    is given, the workers read and fill the solver cache in that directory.
+    ``on_point(index, props_or_error)`` is called as each point finishes.
+
+    With ``warm_start``, the points along the last axis are solved in order,
+    each seeded with a ``target_neff`` extrapolated from the previous points.
+    Lines are split into chunks of at least ``MIN_WARM_CHUNK`` points so that
+    all workers are busy; the first point of every chunk is solved cold.
+    ``compare_cold`` additionally counts the eigensolver iterations and
+    re-solves every seeded point without a seed, so that the savings can be
+    measured.
+
+    With ``server`` (True, or a :class:`server_pool.LocalServer` stand-in)
+    the points are solved on the server with up to ``max_workers`` jobs in
+    flight (``DEFAULT_MAX_CONCURRENT`` by default).
+
+    With ``track_modes``, the modes of every point are matched to those of
+    its neighbour by field overlaps (see :meth:`SweepResult.track`), so that
+    mode ``i`` of the result is the same mode at every point.
+    """
+    for name in axes:
+        if name not in SWEEP_PARAMETERS:
+            raise ValueError("Cannot sweep '{}', expected one of {}.".format(
+                name, ", ".join(SWEEP_PARAMETERS)))
+
+    if server and warm_start:
+        raise ValueError("Warm-started sweeps are solved locally; server sweeps solve all points at once.")
+
+    result = SweepResult(base_spec, axes, base_spec.num_modes)
+    last_values = list(result.axes.values())[-1]
+    workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+
+    # Split the grid into tasks: chunks of lines along the last axis, or single points
+    if warm_start:
+        lines = [
+            [(outer + (i,), result.spec_at(outer + (i,)), last_values[i]) for i in range(len(last_values))]
+            for outer in itertools.product(*(range(n) for n in result.shape[:-1]))
+        ]
+        chunks = max(1, min(-(-workers // len(lines)), len(last_values) // MIN_WARM_CHUNK))
+        tasks = [chunk for line in lines for chunk in _split_line(line, chunks)]
+    else:
+        tasks = [
+            [(index, result.spec_at(index), last_values[index[-1]])]
+            for index in itertools.product(*(range(n) for n in result.shape))
+        ]
+
+    # Tracking fields of every solved point, for matching the modes at the end
+    tracked = {}
+
+    def finish(point):
+        index, props, stats, fields = point
+        if fields is not None:
+            tracked[index] = fields
+        result.set_stats(index, stats)
+        if isinstance(props, str):
+            result.errors[index] = props
+        else:
+            result.set_point(index, props)
+        if on_point is not None:
+            on_point(index, props)
+
+    if server:
+        _run_server_sweep(result, [task[0] for task in tasks], finish, max_workers, cache_dir, server, track_modes)
+    elif workers == 0:
+        for task in tasks:
+            _solve_line(task, warm_start, compare_cold, cache_dir, track_modes, report=finish)
+    else:
+        workers = min(workers, len(tasks))
+
+        # Spawn the workers so sweeps can be started from the GUI process;
+        # they report every point through the queue as soon as it is solved
+        context = multiprocessing.get_context("spawn")
+        report_queue = context.Queue()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                    initializer=_init_worker, initargs=(report_queue,)) as pool:
+            futures = [
+                pool.submit(_solve_line, task, warm_start, compare_cold, cache_dir, track_modes)
+                for task in tasks
+            ]
+            remaining = sum(len(task) for task in tasks)
+            while remaining:
+                try:
+                    point = report_queue.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    # Raise the error of a worker that failed outside of a solve
+                    for future in futures:
+                        if future.done():
+                            future.result()
+                    continue
+                finish(point)
+                remaining -= 1
+    if track_modes:
+        result.track(tracked)
+    return result
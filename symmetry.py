@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Mirror symmetries of waveguide cross-sections and symmetry-reduced solves.
+
+A cross-section can have two mirror planes through the core center: the
+lateral one (y = 0) and the vertical one (halfway through the core layer).
+Each symmetric axis splits the modes into an even and an odd class, which
+are solved separately on the reduced domain, with tidy3d's PMC (+1) and PEC
+(-1) symmetry boundaries, and merged into one mode list sorted by n_eff::
+
+    detect_symmetry(waveguide)         # e.g. (True, False)
+    solve_waveguide(waveguide, use_symmetry=True)
+
+Every class is solved for the full number of modes, so the merged list holds
+the same modes as a solve of the full domain.
+
+The local solver has no subpixel averaging, so n_eff depends on which side
+of a material interface the samples next to it fall.  A reduced domain is
+gridded as the mirror image of its half, while the automatic grid of the
+full domain is not exactly mirror-symmetric: its boundaries on the core
+edges can lie a rounding error inside or outside the core.  Waveguides with
+a mirror plane are therefore always solved on :func:`mirrored_grid_spec`, a
+mirror-symmetric grid with the boundaries on the interfaces snapped onto
+them, so that full and reduced solves sample the same permittivity.
+"""
+import itertools
+
+import numpy as np
+
+# Tolerance of the length and index comparisons, in um or index units
+SYMMETRY_TOLERANCE = 1e-9
+
+# Distance (um) within which grid boundaries are snapped onto an interface
+SNAP_TOLERANCE = 1e-6
+
+
+def _close(a, b):
+    return abs(a - b) <= SYMMETRY_TOLERANCE
+
+
+def detect_symmetry(waveguide):
+    """Mirror symmetries ``(lateral, vertical)`` of a ``RectangularDielectric``.
+
+    Slot waveguides are laterally symmetric only with equal core widths, and
+    a bend (curved in the lateral direction) breaks the lateral symmetry.
+    The vertical symmetry needs upright sidewalls, no rib slab or surface
+    layer, and identical, equally thick cladding and substrate.
+    """
+    widths = np.atleast_1d(waveguide.core_width)
+    bent = waveguide.mode_spec.bend_radius is not None
+    lateral = not bent and all(_close(w, widths[0]) for w in widths)
+    vertical = (
+        _close(waveguide.sidewall_angle, 0)
+        and _close(waveguide.slab_thickness, 0)
+        and _close(waveguide.surface_thickness, 0)
+        and _close(waveguide.clad_thickness, waveguide.box_thickness)
+        and waveguide.clad_medium == waveguide.box_medium
+    )
+    return lateral, vertical
+
+
+def symmetry_classes(waveguide):
+    """Simulation ``symmetry`` tuples of the classes to solve, one per class.
+
+    Returns ``[(0, 0, 0)]`` (the full domain) for asymmetric cross-sections.
+    """
+    vertical_axis = waveguide.normal_axis
+    lateral_axis = 3 - waveguide.propagation_axis - vertical_axis
+    choices = [(1, -1) if symmetric else (0,) for symmetric in detect_symmetry(waveguide)]
+    classes = []
+    for lateral, vertical in itertools.product(*choices):
+        symmetry = [0, 0, 0]
+        symmetry[lateral_axis] = lateral
+        symmetry[vertical_axis] = vertical
+        classes.append(tuple(symmetry))
+    return classes
+
+
+def _snap(boundaries, positions):
+    boundaries = np.array(boundaries)
+    for position in positions:
+        boundaries[np.abs(boundaries - position) < SNAP_TOLERANCE] = position
+    return [float(b) for b in boundaries]
+
+
+def mirrored_grid_spec(waveguide, grid_spec=None):
+    """Mirror-symmetric version of a waveguide's grid spec (its own if None).
+
+    The grid is that of ``grid_spec`` generated for the reduced domain of
+    the detected mirror planes and mirrored, as for a symmetric solve, with
+    the boundaries next to the structure interfaces and the domain center
+    snapped onto them.  It is returned as custom lateral and vertical grid
+    boundaries, which already include the override structures of
+    ``grid_spec``; cross-sections without a mirror plane keep ``grid_spec``.
+    """
+    from tidy3d import CustomGridBoundaries
+
+    symmetry = symmetry_classes(waveguide)[0]
+    if not any(symmetry):
+        return waveguide.grid_spec if grid_spec is None else grid_spec
+    simulation = waveguide.mode_solver.simulation
+    if grid_spec is not None:
+        simulation = simulation.updated_copy(grid_spec=grid_spec)
+    grid = simulation.updated_copy(symmetry=symmetry).grid
+
+    axes = {}
+    for axis in range(3):
+        if axis == waveguide.propagation_axis:
+            continue
+        positions = {simulation.center[axis]}
+        for structure in simulation.structures:
+            for bound in (structure.geometry.bounds[0][axis], structure.geometry.bounds[1][axis]):
+                if np.isfinite(bound):
+                    positions.add(bound)
+        axes["grid_" + "xyz"[axis]] = CustomGridBoundaries(coords=_snap(grid.boundaries.to_list[axis], positions))
+    return simulation.grid_spec.updated_copy(override_structures=(), **axes)
+
+
+def merge_mode_data(mode_datas, num_modes):
+    """Merge the data of several symmetry classes into one sorted mode list.
+
+    The symmetry-expanded data of all classes share one grid; the modes are
+    concatenated, sorted by decreasing n_eff at the first frequency and cut
+    to ``num_modes``.
+    """
+    import xarray as xr
+
+    if len(mode_datas) == 1:
+        return mode_datas[0]
+    first = mode_datas[0]
+    n_eff = np.concatenate([data.n_eff.values[0] for data in mode_datas])
+    order = np.argsort(-n_eff, kind="stable")[:num_modes]
+
+    updates = {}
+    for name in ("Ex", "Ey", "Ez", "Hx", "Hy", "Hz", "n_complex", "grid_primal_correction",
+                 "grid_dual_correction", "n_group_raw", "dispersion_raw"):
+        arrays = [getattr(data, name) for data in mode_datas]
+        if any(array is None for array in arrays):
+            continue
+        merged = xr.concat(arrays, dim="mode_index").isel(mode_index=order)
+        updates[name] = merged.assign_coords(mode_index=np.arange(len(order)))
+    monitor = first.monitor.updated_copy(mode_spec=first.monitor.mode_spec.updated_copy(num_modes=len(order)))
+    return first.updated_copy(monitor=monitor, **updates)
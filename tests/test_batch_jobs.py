@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import h5py
+from batch_jobs import DONE, FAILED, INDEX_NAME, PENDING, RUNNING, BatchJob, main
+from server_pool import LocalServer
+from waveguide_solver import WaveguideSpec
+
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+class TestBatchJob(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "job")
+        self.specs = [FAST_SPEC.replace(core_width=w) for w in (0.45, -1.0, 0.6)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_run(self):
+        """Test that a job records every spec in the index and the results file"""
+        with BatchJob.create(self.path, self.specs) as job:
+            counts = job.run()
+            self.assertEqual(counts, {PENDING: 0, RUNNING: 0, DONE: 2, FAILED: 1})
+            rows = job.results()
+        self.assertEqual([row["spec_index"] for row in rows], [0, 1, 2])
+        self.assertIn("error", rows[1])
+        self.assertEqual(rows[2]["core_width"], 0.6)
+        self.assertGreater(rows[2]["n_eff"], rows[0]["n_eff"])
+        with h5py.File(os.path.join(self.path, "results.h5"), "r") as f:
+            self.assertEqual(sorted(f["points"]), ["0", "2"])
+        with self.assertRaises(FileExistsError):
+            BatchJob.create(self.path, self.specs)
+
+    def test_resume(self):
+        """Test that a resumed job solves only the specs that are not done"""
+        def interrupt(index):
+            raise KeyboardInterrupt
+
+        with BatchJob.create(self.path, self.specs) as job:
+            with self.assertRaises(KeyboardInterrupt):
+                job.run(on_point=interrupt)
+            self.assertEqual(job.counts()[DONE], 1)
+
+        # A spec left running by a crash after its results were written
+        db = sqlite3.connect(os.path.join(self.path, INDEX_NAME))
+        with db:
+            db.execute("UPDATE points SET status = ? WHERE spec_index = 0", (RUNNING,))
+        db.close()
+
+        solved = []
+        with BatchJob(self.path) as job:
+            job.run(on_point=solved.append)
+            self.assertEqual(solved, [0, 1, 2])
+            self.assertEqual(len(job.results()), 3)
+            solved.clear()
+            job.run(on_point=solved.append)
+            self.assertEqual(solved, [])
+            job.run(retry_failed=True, on_point=solved.append)
+            self.assertEqual(solved, [1])
+
+    def test_limit(self):
+        """Test solving a job in chunks"""
+        with BatchJob.create(self.path, self.specs) as job:
+            job.run(limit=2)
+            self.assertEqual(job.counts()[PENDING], 1)
+            job.run()
+            self.assertEqual(job.counts()[PENDING], 0)
+
+    def test_server_solve_times(self):
+        """Test that server specs record the run time of their own job, not the time since the run began"""
+        specs = [FAST_SPEC.replace(core_width=w) for w in (0.45, 0.5, 0.55)]
+        with BatchJob.create(self.path, specs, server=True) as job:
+            job.server = LocalServer(latency=0.3)
+            self.assertEqual(job.run(max_concurrent=1)[DONE], 3)
+        db = sqlite3.connect(os.path.join(self.path, INDEX_NAME))
+        times = [row[0] for row in db.execute("SELECT solve_time FROM points ORDER BY spec_index")]
+        db.close()
+        # One job at a time: times since the start would add up
+        self.assertTrue(all(t >= 0.3 for t in times))
+        self.assertLess(max(times), 0.5 * sum(times))
+
+    def test_cli(self):
+        """Test the run, resume and export commands"""
+        specs_path = os.path.join(self.tmp.name, "specs.json")
+        with open(specs_path, "w") as f:
+            f.write('[{"core_width": 0.5, "clad_thickness": 1.0, "box_thickness": 1.0, "grid_resolution": 10}]')
+        output = os.path.join(self.tmp.name, "results.csv")
+        self.assertEqual(main(["run", specs_path, self.path, "--no-cache", "--limit", "0"]), 0)
+        self.assertEqual(main(["resume", self.path, "-o", output]), 0)
+        with open(output) as f:
+            self.assertIn("n_eff", f.readline())
+        self.assertEqual(main(["export", self.path, output]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
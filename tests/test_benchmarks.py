@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from benchmarks import append_history, compare_runs, latest_results, load_history, main, run_benchmarks
+
+def make_run(timestamp, **times):
+    return {"timestamp": timestamp, "results": {name: {"min": t} for name, t in times.items()}}
+
+class TestBenchmarkHistory(unittest.TestCase):
+    def test_compare_flags_regressions(self):
+        """Test that only cases slower than the threshold are flagged"""
+        baseline = make_run("a", build=1.0, solve=2.0, render=1.0)
+        current = make_run("b", build=1.1, solve=3.0, extra=5.0)
+        rows = {name: regressed for name, _, _, _, regressed in compare_runs(baseline, current, threshold=0.2)}
+        self.assertEqual(rows, {"build": False, "solve": True})
+
+    def test_latest_results(self):
+        """Test that the baseline holds the most recent result of every case"""
+        history = [make_run("a", build=1.0, solve=2.0), make_run("b", build=3.0)]
+        baseline = latest_results(history)
+        self.assertEqual(baseline["results"]["build"]["min"], 3.0)
+        self.assertEqual(baseline["results"]["solve"]["min"], 2.0)
+
+    def test_history_file(self):
+        """Test that runs are appended to the history file"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.json")
+            self.assertEqual(load_history(path), [])
+            append_history(path, make_run("a", build=1.0))
+            append_history(path, make_run("b", build=1.0))
+            self.assertEqual([run["timestamp"] for run in load_history(path)], ["a", "b"])
+
+class TestRunBenchmarks(unittest.TestCase):
+    def test_build_cases(self):
+        """Test running the build cases and comparing them through the command line"""
+        record = run_benchmarks("build", repeat=2)
+        self.assertEqual(sorted(record["results"]), ["build/rib", "build/slot", "build/strip"])
+        self.assertEqual(record["results"]["build/strip"]["repeat"], 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.json")
+            self.assertEqual(main(["-k", "build", "--repeat", "1", "--history", path]), 0)
+            # Any time is a regression against a threshold of -100%
+            self.assertEqual(main(["-k", "build", "--repeat", "1", "--history", path,
+                                   "--compare", "--threshold", "-1"]), 1)
+            self.assertEqual(len(load_history(path)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
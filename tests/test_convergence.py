@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from convergence import GridConvergence, converge_grid, resolution_steps, richardson_extrapolate
+from waveguide_solver import WaveguideSpec
+
+class TestRichardson(unittest.TestCase):
+    def test_resolution_steps(self):
+        """Test that resolutions grow geometrically up to the maximum"""
+        self.assertEqual(resolution_steps(10, 1.5, 40), [10, 15, 22, 34])
+        with self.assertRaises(ValueError):
+            resolution_steps(10, 1.0, 40)
+
+    def test_known_order(self):
+        """Test extrapolating values that converge with a known order"""
+        resolutions = np.array([10, 20, 40])
+        for order in (1.0, 2.0):
+            n_eff = (2.0 + 0.5 / resolutions**order)[:, None]
+            extrapolated, estimated = richardson_extrapolate(resolutions, n_eff)
+            self.assertAlmostEqual(estimated, order)
+            self.assertAlmostEqual(extrapolated[0], 2.0)
+
+    def test_assumed_order(self):
+        """Test that two resolutions are extrapolated with the assumed first order"""
+        extrapolated, order = richardson_extrapolate([10, 20], [[2.05], [2.025]])
+        self.assertEqual(order, 1.0)
+        self.assertAlmostEqual(extrapolated[0], 2.0)
+
+class TestGridConvergence(unittest.TestCase):
+    def test_steps(self):
+        """Test that each step is seeded with the previous n_eff and stops once converged"""
+        study = GridConvergence(WaveguideSpec(), tolerance=1e-3, start=10, ratio=2, max_resolution=80)
+        first = study.next_spec()
+        self.assertEqual(first.grid_resolution, 10)
+        self.assertIsNone(first.target_neff)
+        study.add([2.10])
+        second = study.next_spec()
+        self.assertEqual(second.grid_resolution, 20)
+        self.assertEqual(second.target_neff, 2.10)
+        study.add([2.05])
+        study.add([2.0496])
+        self.assertTrue(study.converged)
+        self.assertIsNone(study.next_spec())
+        result = study.result()
+        self.assertEqual(list(result.resolutions), [10, 20, 40])
+        self.assertEqual(result.recommended_resolution, 20)
+
+    def test_converge_grid(self):
+        """Test a real convergence study on a coarse grid"""
+        steps = []
+        spec = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, num_modes=2)
+        result = converge_grid(spec, tolerance=0.1, start=8, ratio=1.5, max_resolution=20,
+                               on_step=lambda res, n_eff: steps.append(res))
+        self.assertEqual(steps, list(result.resolutions))
+        self.assertEqual(result.n_eff.shape, (len(steps), 2))
+        self.assertTrue(result.converged)
+        self.assertTrue(np.all(np.isfinite(result.extrapolated)))
+
+if __name__ == '__main__':
+    unittest.main()
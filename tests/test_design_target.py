@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from design_target import ParameterSearch, main, solve_for_parameter
+from waveguide_solver import WaveguideSpec
+
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+def run_search(search, n_eff):
+    """Drive a search with a stand-in n_eff(value) for the fundamental mode"""
+    spec = search.next_spec()
+    while spec is not None:
+        value = getattr(spec, search.parameter)
+        search.add([{"n_eff": n_eff(value), "n_group": 4.0}, {"n_eff": n_eff(value) - 0.8, "n_group": 4.2}])
+        spec = search.next_spec()
+    return search.result()
+
+class TestParameterSearch(unittest.TestCase):
+    def test_smooth_target(self):
+        """Test that a smooth target is hit in a few solves, solving the bounds first"""
+        search = ParameterSearch(WaveguideSpec(), "core_width", (0.4, 0.8), target=2.8, xtol=1e-6, ftol=1e-8)
+        result = run_search(search, lambda w: 1.6 + 3.0 * w - 1.2 * w**2)
+        self.assertTrue(result.converged)
+        self.assertEqual(list(result.values[:2]), [0.4, 0.8])
+        self.assertAlmostEqual(1.6 + 3.0 * result.value - 1.2 * result.value**2, 2.8, places=7)
+        self.assertLessEqual(result.evaluations, 8)
+
+    def test_warm_start(self):
+        """Test that solves inside the bracket are seeded and the bounds are not"""
+        search = ParameterSearch(WaveguideSpec(), "core_width", (0.4, 0.8), target=2.5)
+        result = run_search(search, lambda w: 1.6 + 2.0 * w)
+        self.assertEqual(result.seeds[:2], [None, None])
+        # Linear n_eff is interpolated exactly
+        for value, seed in zip(result.values[2:], result.seeds[2:]):
+            self.assertAlmostEqual(seed, 1.6 + 2.0 * value)
+        unseeded = run_search(ParameterSearch(WaveguideSpec(), "core_width", (0.4, 0.8), target=2.5,
+                                              warm_start=False), lambda w: 1.6 + 2.0 * w)
+        self.assertEqual(set(unseeded.seeds), {None})
+
+    def test_bisection_fallback(self):
+        """Test that a step-like target still converges by bisection within the evaluation limit"""
+        search = ParameterSearch(WaveguideSpec(), "core_width", (0.0, 1.0), target=2.0, xtol=1e-3)
+        result = run_search(search, lambda w: 1.0 + 2.0 / (1.0 + np.exp(-(w - 0.3) * 500)))
+        self.assertTrue(result.converged)
+        self.assertAlmostEqual(result.value, 0.3, places=2)
+        self.assertEqual(len(set(result.values)), result.evaluations)
+
+    def test_not_bracketed(self):
+        """Test that a target outside the values at the bounds stops after two solves"""
+        search = ParameterSearch(WaveguideSpec(), "core_width", (0.4, 0.8), target=3.5)
+        result = run_search(search, lambda w: 1.6 + 2.0 * w)
+        self.assertEqual(result.evaluations, 2)
+        self.assertFalse(result.converged)
+        self.assertIn("not between", result.error)
+
+    def test_cutoff_defaults(self):
+        """Test that cutoff searches target mode 1 at the highest cladding index"""
+        search = ParameterSearch(WaveguideSpec(num_modes=1), "core_width", (0.1, 0.6), quantity="cutoff")
+        self.assertEqual(search.mode_index, 1)
+        self.assertEqual(search.target, 1.44)
+        self.assertEqual(search.spec.num_modes, 2)
+        result = run_search(search, lambda w: 1.6 + 2.0 * w)
+        self.assertAlmostEqual(result.achieved, 1.44, places=4)
+        with self.assertRaises(ValueError):
+            ParameterSearch(WaveguideSpec(), "core_width", (0.4, 0.8))
+        with self.assertRaises(ValueError):
+            ParameterSearch(WaveguideSpec(), "num_modes", (1, 2), target=2.0)
+
+class TestSolveForParameter(unittest.TestCase):
+    def test_core_width(self):
+        """Test finding the core width of a target n_eff with real solves"""
+        steps = []
+        result = solve_for_parameter(FAST_SPEC, "core_width", (0.4, 0.7), target=2.45, ftol=1e-3,
+                                     on_step=lambda value, n_eff: steps.append(value))
+        self.assertTrue(result.converged)
+        self.assertLess(abs(result.achieved - 2.45), 1e-3)
+        self.assertEqual(steps, list(result.values))
+        self.assertLessEqual(result.evaluations, 8)
+        self.assertTrue(np.isnan(result.eigensolver_steps).all())
+        with self.assertRaises(ValueError):
+            solve_for_parameter(FAST_SPEC, "core_width", (0.4, 0.7), target=3.0)
+
+    def test_cli(self):
+        """Test the command line search"""
+        self.assertEqual(main(["core_width", "0.4", "0.7", "--target", "3.0", "--no-cache"]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from dispersion import (
+    C_UM, group_index_from_neff, gvd_from_group_index, dispersion_waveguide, solve_dispersion
+)
+from waveguide_solver import WaveguideSpec
+
+# Small domain and coarse grid to keep the real solves in this file fast
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+class TestDispersionMath(unittest.TestCase):
+    def test_quadratic_index(self):
+        """Test group index and GVD against an analytic n(lambda)"""
+        wavelengths = np.linspace(1.5, 1.6, 41)
+        # Two "modes" with n = a + b*lambda + c*lambda^2
+        coeffs = np.array([[2.0, -0.5, 0.1], [1.6, -0.2, 0.05]])
+        n_eff = np.stack([a + b * wavelengths + c * wavelengths**2 for a, b, c in coeffs], axis=1)
+
+        n_group = group_index_from_neff(wavelengths, n_eff)
+        expected_ng = np.stack([a - c * wavelengths**2 for a, b, c in coeffs], axis=1)
+        np.testing.assert_allclose(n_group[1:-1], expected_ng[1:-1], rtol=1e-6)
+
+        gvd = gvd_from_group_index(wavelengths, expected_ng)
+        expected_gvd = np.stack([-2 * c * wavelengths for a, b, c in coeffs], axis=1) / C_UM * 1e18
+        np.testing.assert_allclose(gvd[1:-1], expected_gvd[1:-1], rtol=1e-6)
+
+    def test_needs_three_wavelengths(self):
+        """Test that too few wavelengths are rejected"""
+        with self.assertRaises(ValueError):
+            dispersion_waveguide(FAST_SPEC, [1.5, 1.6])
+
+class TestSolveDispersion(unittest.TestCase):
+    def test_single_solver_call(self):
+        """Test a dispersion solve over several wavelengths"""
+        wavelengths = np.linspace(1.5, 1.6, 5)
+        result = solve_dispersion(FAST_SPEC.replace(num_modes=2), wavelengths)
+        self.assertEqual(result.n_eff.shape, (5, 2))
+        self.assertEqual(result.gvd.shape, (5, 2))
+        # n_eff falls with wavelength; the solver and finite-difference group indices agree
+        self.assertTrue(np.all(np.diff(result.n_eff[:, 0]) < 0))
+        n_group_fd = group_index_from_neff(wavelengths, result.n_eff)
+        np.testing.assert_allclose(n_group_fd[1:-1, 0], result.n_group[1:-1, 0], rtol=1e-2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import time
+import unittest
+import numpy as np
+from effective_index import estimate_neff, estimate_spec, slab_neff
+from waveguide_solver import WaveguideSpec, solve
+
+class TestSlabNeff(unittest.TestCase):
+    def test_symmetric_slab(self):
+        """Test the fundamental modes of a silicon slab in oxide against known values"""
+        self.assertAlmostEqual(float(slab_neff([1.444, 3.476, 1.444], [0.22], 1.55, "TE")), 2.8478, places=3)
+        self.assertAlmostEqual(float(slab_neff([1.444, 3.476, 1.444], [0.22], 1.55, "TM")), 2.0533, places=3)
+
+    def test_no_guided_mode(self):
+        """Test that a slab without a guided mode gets the larger outer index"""
+        self.assertEqual(float(slab_neff([1.44, 3.47, 1.0], [0.0], 1.55)), 1.44)
+
+    def test_vectorized(self):
+        """Test estimating thousands of geometries at once"""
+        widths = np.linspace(0.3, 0.8, 2000)
+        start = time.perf_counter()
+        n_eff = estimate_neff("strip", widths, 0.22, 3.47, 1.0, 1.44, 1.55)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(n_eff.shape, widths.shape)
+        self.assertTrue(np.all(np.diff(n_eff) > 0))
+
+class TestEstimateSpec(unittest.TestCase):
+    def test_rib_without_slab_is_strip(self):
+        """Test that a rib without a slab is estimated like a strip"""
+        strip = estimate_spec(WaveguideSpec())
+        rib = estimate_spec(WaveguideSpec(waveguide_type="rib", slab_thickness=0.0))
+        self.assertEqual(strip, rib)
+        self.assertGreater(estimate_spec(WaveguideSpec(waveguide_type="rib"))[0], strip[0])
+
+    def test_close_to_solver(self):
+        """Test that the estimate is within a few percent of a full solve"""
+        spec = WaveguideSpec(clad_thickness=1.5, box_thickness=1.5, grid_resolution=20)
+        n_eff = float(solve(spec).n_eff.values[0][0])
+        self.assertLess(abs(estimate_spec(spec)[0] - n_eff) / n_eff, 0.06)
+
+if __name__ == '__main__':
+    unittest.main()
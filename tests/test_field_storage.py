@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from field_storage import DISPLAY_POINTS, RETENTIONS, store_modes
+from waveguide_solver import WaveguideSpec, solve
+
+class TestStoreModes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Solve one waveguide for all tests"""
+        cls.mode_data = solve(WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10, num_modes=2))
+
+    def test_retentions(self):
+        """Test that every retention keeps the mode properties and gives the same fields"""
+        full = store_modes(self.mode_data, retention="full")
+        expected = full.field("Ey", 1)
+        for retention in RETENTIONS:
+            modes = store_modes(self.mode_data, retention=retention)
+            np.testing.assert_allclose(modes.n_eff, self.mode_data.n_eff.values[0])
+            np.testing.assert_array_equal(modes.full_field("Ey", 1), expected)
+            np.testing.assert_allclose(modes.field("Ey", 1), expected, rtol=1e-6, atol=1e-6 * np.abs(expected).max())
+            self.assertLessEqual(modes.nbytes, full.nbytes)
+            modes.close()
+        with self.assertRaises(ValueError):
+            store_modes(self.mode_data, retention="half")
+
+    def test_memory(self):
+        """Test the in-memory size of the compact retentions"""
+        full = store_modes(self.mode_data, retention="full")
+        single = store_modes(self.mode_data, retention="single")
+        scalars = store_modes(self.mode_data, retention="scalars")
+        self.assertEqual(single.nbytes, full.nbytes // 2)
+        self.assertEqual(single.field("Ex", 0).dtype, np.complex64)
+        self.assertEqual(scalars.nbytes, 0)
+        single.close()
+        scalars.close()
+
+    def test_display(self):
+        """Test the downsampled |E| copy and the deletion of the field files"""
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "fields")
+            modes = store_modes(self.mode_data, retention="display", directory=directory)
+            coords0, coords1, magnitude = modes.display_values("E", "abs", 0)
+            self.assertEqual(magnitude.shape, (len(coords0), len(coords1)))
+            self.assertLessEqual(max(magnitude.shape), DISPLAY_POINTS)
+            self.assertEqual(magnitude.dtype, np.float32)
+            self.assertTrue(os.path.exists(os.path.join(directory, "Ex.npy")))
+            modes.close()
+            self.assertFalse(os.path.exists(directory))
+
+    def test_display_downsampled(self):
+        """Test that grids finer than the display limit are downsampled"""
+        modes = store_modes(solve(WaveguideSpec(grid_resolution=60)), retention="display")
+        _, _, magnitude = modes.display_values("E", "abs", 0)
+        _, _, component = modes.display_values("Hz", "imag", 0)
+        self.assertEqual(component.shape, magnitude.shape)
+        self.assertLessEqual(max(magnitude.shape), DISPLAY_POINTS)
+        self.assertLess(magnitude.size, modes.coords[0].size * modes.coords[1].size)
+        modes.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import time
+import unittest
+from unittest import mock
+from matplotlib.figure import Figure
+from geometry_preview import GeometryPreview, geometry_key
+from waveguide_solver import WaveguideSpec, build_waveguide
+
+class TestGeometryKey(unittest.TestCase):
+    def test_ignores_unused_fields(self):
+        """Test that fields not used by the waveguide type or the drawing do not change the key"""
+        spec = WaveguideSpec()
+        self.assertEqual(geometry_key(spec), geometry_key(spec.replace(gap=0.3, slab_thickness=0.05)))
+        self.assertEqual(geometry_key(spec), geometry_key(spec.replace(wavelength=1.31, core_index=2.0)))
+        self.assertNotEqual(geometry_key(spec), geometry_key(spec.replace(core_width=0.6)))
+        slot = spec.replace(waveguide_type="slot")
+        self.assertNotEqual(geometry_key(slot), geometry_key(slot.replace(gap=0.3)))
+
+class TestGeometryPreview(unittest.TestCase):
+    def setUp(self):
+        self.fig = Figure()
+        self.preview = GeometryPreview(self.fig.add_subplot(111))
+
+    def test_skips_unchanged_geometry(self):
+        """Test that the waveguide is not rebuilt when the geometry did not change"""
+        spec = WaveguideSpec()
+        self.assertTrue(self.preview.update(spec, build_waveguide))
+        build = mock.Mock(side_effect=build_waveguide)
+        self.assertFalse(self.preview.update(spec.replace(wavelength=1.31), build))
+        build.assert_not_called()
+        self.preview.invalidate()
+        self.assertTrue(self.preview.update(spec, build))
+        build.assert_called_once()
+
+    def test_reuses_artists(self):
+        """Test that updates move the existing polygons instead of adding new ones"""
+        self.preview.update(WaveguideSpec(), build_waveguide)
+        patches = list(self.preview.patches)
+        self.preview.update(WaveguideSpec(core_width=0.8), build_waveguide)
+        self.assertEqual(self.preview.patches, patches)
+        self.assertEqual(len(self.preview.ax.patches), len(patches))
+
+    def test_slot_has_two_cores(self):
+        """Test that a slot waveguide is drawn with two core polygons"""
+        self.preview.update(WaveguideSpec(waveguide_type="slot"), build_waveguide)
+        cores = [p for p in self.preview.patches if p.get_visible() and p.get_facecolor()[0] > 0.9]
+        self.assertEqual(len(cores), 2)
+        # Switching back to a strip hides the extra polygon
+        self.preview.update(WaveguideSpec(), build_waveguide)
+        cores = [p for p in self.preview.patches if p.get_visible() and p.get_facecolor()[0] > 0.9]
+        self.assertEqual(len(cores), 1)
+
+    def test_update_latency(self):
+        """Test that a preview update with a canvas draw stays well under the interactive budget"""
+        self.preview.update(WaveguideSpec(), build_waveguide)
+        self.fig.canvas.draw()
+        start = time.perf_counter()
+        self.preview.update(WaveguideSpec(core_width=0.6), build_waveguide)
+        self.fig.canvas.draw()
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
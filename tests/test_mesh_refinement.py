@@ -0,0 +1,54 @@
+import pickle
+import unittest
+import numpy as np
+from dispersion import dispersion_waveguide
+from mesh_refinement import compare_meshes, grid_shape, uniform_spec
+from waveguide_solver import WaveguideSpec, build_waveguide
+
+class TestMeshRefinement(unittest.TestCase):
+    def setUp(self):
+        self.spec = WaveguideSpec(waveguide_type="slot", core_width=0.25, second_core_width=0.25, gap=0.1,
+                                  sidewall_angle=0.0, grid_resolution=10, edge_resolution=30)
+
+    def test_refined_grid(self):
+        """Test that the edges get fine steps and the grid keeps boundaries on the interfaces"""
+        grid = build_waveguide(self.spec).mode_solver._solver_grid
+        fine = self.spec.wavelength / (self.spec.core_index * self.spec.edge_resolution)
+        y, z = grid.boundaries.y, grid.boundaries.z
+        for edge in (-0.3, -0.05, 0.05, 0.3):
+            self.assertTrue(np.any(np.isclose(y, edge)))
+        for interface in (0.0, self.spec.core_thickness):
+            self.assertTrue(np.any(np.isclose(z, interface)))
+        # The slot gap is resolved with fine lateral steps
+        gap_steps = np.diff(y[(y >= -0.05 - 1e-9) & (y <= 0.05 + 1e-9)])
+        self.assertLessEqual(gap_steps.max(), fine * 1.01)
+
+    def test_fewer_cells(self):
+        """Test that the refined grid has fewer cells than a uniform grid at the edge resolution"""
+        refined = np.prod(grid_shape(build_waveguide(self.spec)))
+        uniform = np.prod(grid_shape(build_waveguide(uniform_spec(self.spec))))
+        coarse = np.prod(grid_shape(build_waveguide(self.spec.replace(edge_resolution=None))))
+        self.assertLess(coarse, refined)
+        self.assertLess(refined, uniform)
+        with self.assertRaises(ValueError):
+            uniform_spec(self.spec.replace(edge_resolution=None))
+
+    def test_refinement_kept(self):
+        """Test that pickled (worker) and dispersion waveguides keep the refined grid"""
+        shape = grid_shape(build_waveguide(self.spec))
+        self.assertEqual(grid_shape(pickle.loads(pickle.dumps(build_waveguide(self.spec)))), shape)
+        wavelengths = [1.5, 1.55, 1.6]
+        refined = np.prod(grid_shape(dispersion_waveguide(self.spec, wavelengths)))
+        coarse = np.prod(grid_shape(dispersion_waveguide(self.spec.replace(edge_resolution=None), wavelengths)))
+        self.assertGreater(refined, coarse)
+
+    def test_compare_meshes(self):
+        """Test comparing a coarse refined mesh with its uniform mesh"""
+        comparison = compare_meshes(WaveguideSpec(grid_resolution=8, edge_resolution=15))
+        self.assertLess(comparison.refined_cells, comparison.uniform_cells)
+        self.assertEqual(comparison.refined_neff.shape, comparison.uniform_neff.shape)
+        self.assertTrue(np.isfinite(comparison.neff_difference))
+        self.assertIn("Refined mesh", comparison.summary())
+
+if __name__ == '__main__':
+    unittest.main()
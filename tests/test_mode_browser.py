@@ -0,0 +1,99 @@
+import unittest
+import tkinter as tk
+import numpy as np
+from matplotlib.figure import Figure
+from field_storage import store_modes
+from mode_browser import FieldView, ModeBrowser, render_mode_figure
+from waveguide_solver import WaveguideSpec, build_waveguide, solve_waveguide
+
+# Small domain and coarse grid to keep the real solves in this file fast
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10, num_modes=3)
+
+class TestFieldView(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Solve one waveguide for all tests"""
+        cls.waveguide = build_waveguide(FAST_SPEC)
+        cls.modes = store_modes(solve_waveguide(cls.waveguide), retention="single")
+
+    def test_update_in_place(self):
+        """Test that switching mode, field and value reuses the mesh and colorbar"""
+        fig = Figure()
+        view = FieldView(fig)
+        view.show(self.waveguide, self.modes, 0)
+        mesh, colorbar = view.mesh, view.colorbar
+        view.show(self.waveguide, self.modes, 2, field="Ey", val="real", clim=(None, 5.0))
+        self.assertIs(view.mesh, mesh)
+        self.assertIs(view.colorbar, colorbar)
+        self.assertEqual(len(fig.axes), 2)
+        vmin, vmax = mesh.get_clim()
+        self.assertEqual(vmax, 5.0)
+        self.assertLess(vmin, 0.0)
+        expected = np.real(self.modes.field("Ey", 2)).T
+        np.testing.assert_allclose(np.asarray(mesh.get_array()).reshape(expected.shape), expected)
+        self.assertEqual(view.ax.get_title(), "Mode 2 profile")
+
+    def test_new_grid(self):
+        """Test that a result on another grid replaces the mesh but keeps the colorbar"""
+        fig = Figure()
+        view = FieldView(fig)
+        view.show(self.waveguide, self.modes, 0)
+        mesh, colorbar = view.mesh, view.colorbar
+        waveguide = build_waveguide(FAST_SPEC.replace(grid_resolution=12))
+        view.show(waveguide, store_modes(solve_waveguide(waveguide), retention="full"), 0, field="Hz", val="imag")
+        self.assertIsNot(view.mesh, mesh)
+        self.assertIs(view.colorbar, colorbar)
+        self.assertEqual(len(view.ax.collections), 1)
+        self.assertEqual(len(view.ax.lines), len(view._edge_artists))
+        with self.assertRaises(ValueError):
+            view.show(waveguide, self.modes, 0, field="E", val="real")
+
+class TestRenderModeFigure(unittest.TestCase):
+    def test_render_without_pyplot(self):
+        """Test that mode figures are rendered outside pyplot's figure registry"""
+        import matplotlib.pyplot as plt
+        waveguide = build_waveguide(FAST_SPEC)
+        solve_waveguide(waveguide)
+        num_figures = len(plt.get_fignums())
+        fig = render_mode_figure(waveguide, store_modes(waveguide.data, retention="scalars"), 1)
+        self.assertEqual(fig.axes[0].get_title(), "Mode 1 profile")
+        self.assertEqual(len(plt.get_fignums()), num_figures)
+
+class TestModeBrowser(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Set up test environment once for all tests"""
+        cls.root = tk.Tk()
+        cls.waveguide = build_waveguide(FAST_SPEC)
+        cls.mode_data = solve_waveguide(cls.waveguide)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up after all tests"""
+        cls.root.destroy()
+
+    def test_switch_field(self):
+        """Test that selecting modes and fields updates one persistent plot"""
+        browser = ModeBrowser(self.root)
+        browser.set_result(self.waveguide, self.mode_data)
+        self.root.update()
+        self.assertEqual(len(browser.table.get_children()), 3)
+        mesh = browser.view.mesh
+
+        browser.show_mode(2)
+        browser.field_var.set("Hx")
+        browser._on_field_change()
+        browser.value_var.set("imag")
+        browser.vmax_var.set("2.5")
+        browser.refresh()
+        self.assertEqual(browser.current, (2, "Hx", "imag", (None, 2.5)))
+        self.assertIs(browser.view.mesh, mesh)
+        self.assertIs(browser.canvas.figure, browser.figure)
+        browser.field_var.set("E")
+        browser._on_field_change()
+        self.assertEqual(browser.value_var.get(), "abs")
+        browser.window.destroy()
+        self.assertFalse(browser.exists())
+
+if __name__ == '__main__':
+    unittest.main()
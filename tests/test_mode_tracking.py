@@ -0,0 +1,89 @@
+import unittest
+import numpy as np
+from mode_tracking import (TrackingFields, interpolation_matrix, match_modes, overlap_matrix, relabel, track_modes,
+                           tracking_fields)
+from sweep import run_sweep
+from waveguide_solver import WaveguideSpec, solve
+
+def gaussian_modes(y, z, widths, order=None):
+    """Stand-in TE-like (Ey, Hz) and TM-like (Ez, Hy) modes with the given widths"""
+    yy, zz = np.meshgrid(y, z, indexing="ij")
+    fields = np.zeros((4, len(widths), len(y), len(z)), dtype=np.complex64)
+    for mode_index, (width, polarization) in enumerate(widths):
+        profile = np.exp(-(yy**2 + zz**2) / width**2)
+        if polarization == "te":
+            fields[0, mode_index] = profile
+            fields[1, mode_index] = profile
+        else:
+            fields[2, mode_index] = profile
+            fields[3, mode_index] = -profile
+    return TrackingFields((y, z), fields if order is None else fields[:, order])
+
+class TestOverlaps(unittest.TestCase):
+    def test_interpolation_matrix(self):
+        """Test linear weights and zeros outside the source points"""
+        matrix = interpolation_matrix([0.0, 1.0, 3.0], [-1.0, 0.0, 0.5, 2.0, 3.0, 4.0])
+        np.testing.assert_allclose(matrix @ np.array([0.0, 1.0, 3.0]), [0.0, 0.0, 0.5, 2.0, 3.0, 0.0])
+        np.testing.assert_allclose(matrix.sum(axis=1), [0, 1, 1, 1, 1, 0])
+
+    def test_overlap_matrix(self):
+        """Test that same modes overlap fully across grids and different polarizations do not"""
+        y, z = np.linspace(-2, 2, 41), np.linspace(-1.5, 1.5, 31)
+        first = gaussian_modes(y, z, [(0.5, "te"), (0.5, "tm"), (1.0, "te")])
+        second = gaussian_modes(np.linspace(-2.5, 2.5, 57), np.linspace(-1.2, 1.4, 25),
+                                [(0.55, "tm"), (0.5, "te"), (1.0, "te")])
+        overlap = overlap_matrix(first, second)
+        self.assertEqual(overlap.shape, (3, 3))
+        self.assertGreater(overlap[0, 1], 0.99)
+        self.assertGreater(overlap[1, 0], 0.99)
+        self.assertLess(overlap[0, 0], 1e-6)
+        order, matched = match_modes(overlap)
+        self.assertEqual(list(order), [1, 0, 2])
+        self.assertTrue(np.all(matched > 0.6))
+
+class TestTrackModes(unittest.TestCase):
+    def test_crossing(self):
+        """Test that modes keep their labels when the solver order swaps"""
+        y = z = np.linspace(-2, 2, 33)
+        modes = [(0.5, "te"), (0.6, "tm")]
+        steps = [gaussian_modes(y, z, modes, order) for order in ([0, 1], [0, 1], [1, 0], [1, 0])]
+        steps.insert(2, None)
+        tracking = track_modes(steps)
+        self.assertEqual(tracking.order.tolist(), [[0, 1], [0, 1], [0, 1], [1, 0], [1, 0]])
+        self.assertTrue(np.isnan(tracking.overlap[2]).all())
+        self.assertEqual(tracking.swaps, 2)
+        self.assertFalse(tracking.uncertain()[~np.isnan(tracking.overlap)].any())
+        n_eff = np.array([[2.0, 1.9], [2.0, 1.9], [np.nan, np.nan], [1.9, 2.0], [1.9, 2.0]])
+        np.testing.assert_allclose(relabel(n_eff, tracking.order)[[0, 3]], [[2.0, 1.9], [2.0, 1.9]])
+
+    def test_references(self):
+        """Test matching steps to given reference steps"""
+        y = z = np.linspace(-2, 2, 33)
+        modes = [(0.5, "te"), (0.6, "tm")]
+        steps = [gaussian_modes(y, z, modes, order) for order in ([0, 1], [1, 0], [1, 0])]
+        tracking = track_modes(steps, references=[-1, 0, -1])
+        self.assertEqual(tracking.order.tolist(), [[0, 1], [1, 0], [0, 1]])
+
+class TestSolvedModes(unittest.TestCase):
+    def test_tracking_fields(self):
+        """Test that the resampled modes of a solve are orthonormal"""
+        mode_data = solve(WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10, num_modes=2))
+        fields = tracking_fields(mode_data, points=32)
+        self.assertEqual(fields.fields.shape, (4, 2, 32, 32))
+        np.testing.assert_allclose(overlap_matrix(fields, fields), np.eye(2), atol=0.05)
+
+    def test_tracked_sweep(self):
+        """Test that a sweep through the TE0/TM0 crossing keeps TE0 as mode 0"""
+        spec = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10, num_modes=2,
+                             core_width=0.45, sidewall_angle=0.0)
+        axes = {"core_thickness": [0.35, 0.4, 0.5, 0.55]}
+        plain = run_sweep(spec, axes, max_workers=0)
+        tracked = run_sweep(spec, axes, max_workers=0, track_modes=True)
+        # The solver order swaps: the TE-like mode is no longer mode 0 at the end
+        self.assertLess(plain.te_fraction[-1, 0], 0.5)
+        self.assertTrue(np.all(tracked.te_fraction[:, 0] > 0.5))
+        self.assertEqual(tracked.mode_order[-1].tolist(), [1, 0])
+        self.assertTrue(np.all(tracked.mode_overlap > 0.9))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+import preflight
+from dispersion import dispersion_waveguide
+from preflight import (DEFAULT_MODEL, OK, REFUSE, WARN, CostModel, Limits, calibrate, estimate_cost, load_model,
+                       main, save_model)
+from waveguide_solver import WaveguideSpec, build_waveguide
+
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+class TestCostModel(unittest.TestCase):
+    def test_fit(self):
+        """Test that the fit recovers the coefficients of exact power-law samples"""
+        model = CostModel(memory=(1e4, 1.0, 0.1), time=(1e-3, 0.9, 0.5))
+        samples = [(cells, modes, model.time(cells, modes), model.memory(cells, modes))
+                   for cells, modes in [(1e3, 1), (1e4, 1), (1e5, 1), (1e4, 4)]]
+        fitted = CostModel.fit(samples)
+        np.testing.assert_allclose(fitted.memory_coefficients, model.memory_coefficients, rtol=1e-6)
+        np.testing.assert_allclose(fitted.time_coefficients, model.time_coefficients, rtol=1e-6)
+        with self.assertRaises(ValueError):
+            CostModel.fit(samples[:2])
+
+    def test_invalid_samples(self):
+        """Test that unmeasured memory is rejected instead of fitting NaN coefficients"""
+        with self.assertRaises(ValueError):
+            CostModel.fit([(1880, 1, 1.1, 29e6), (3630, 1, 1.4, 0.0), (2880, 2, 1.3, 34e6)])
+        with self.assertRaises(ValueError):
+            CostModel((float("nan"), 1.0, 0.0), (1.0, 1.0, 0.0))
+
+    def test_save_and_load(self):
+        """Test storing a calibrated model and falling back to the default model"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calibration.json")
+            self.assertIs(load_model(path), DEFAULT_MODEL)
+            save_model(CostModel((1.0, 1.0, 0.0), (2.0, 1.0, 0.0), source="test"), path)
+            model = load_model(path)
+            self.assertEqual(model.source, "test")
+            self.assertEqual(model.time(10), 20.0)
+            with open(path, "w") as f:
+                f.write('{"memory": [NaN, NaN, NaN], "time": [1.0, 1.0, 0.0]}')
+            self.assertIs(load_model(path), DEFAULT_MODEL)
+
+class TestEstimateCost(unittest.TestCase):
+    def test_grows_with_resolution(self):
+        """Test that the estimates grow with the grid resolution and the number of wavelengths"""
+        coarse = estimate_cost(build_waveguide(FAST_SPEC), DEFAULT_MODEL)
+        fine = estimate_cost(build_waveguide(FAST_SPEC.replace(grid_resolution=40)), DEFAULT_MODEL)
+        self.assertGreater(fine.cells, 4 * coarse.cells)
+        self.assertGreater(fine.memory, 4 * coarse.memory)
+        self.assertGreater(fine.time, coarse.time)
+        dispersion = estimate_cost(dispersion_waveguide(FAST_SPEC, [1.5, 1.55, 1.6]), DEFAULT_MODEL)
+        self.assertAlmostEqual(dispersion.time, 3 * coarse.time)
+        self.assertIn("cells", coarse.summary())
+
+    def test_limits(self):
+        """Test warning and refusal above the limits"""
+        waveguide = build_waveguide(FAST_SPEC)
+        estimate = estimate_cost(waveguide, DEFAULT_MODEL)
+        self.assertEqual(estimate_cost(waveguide, DEFAULT_MODEL, Limits()).level, OK)
+        warned = estimate_cost(waveguide, DEFAULT_MODEL, Limits(warn_time=estimate.time / 2))
+        self.assertEqual(warned.level, WARN)
+        self.assertIn("run time", warned.reasons[0])
+        refused = estimate_cost(waveguide, DEFAULT_MODEL, Limits(warn_time=0, max_memory=estimate.memory / 2))
+        self.assertEqual(refused.level, REFUSE)
+        self.assertEqual(len(refused.reasons), 2)
+
+    def test_concurrent(self):
+        """Test that concurrent solves multiply the memory but not the run time"""
+        waveguide = build_waveguide(FAST_SPEC)
+        single = estimate_cost(waveguide, DEFAULT_MODEL)
+        limits = Limits(max_memory=2 * single.memory)
+        sweep = estimate_cost(waveguide, DEFAULT_MODEL, limits, concurrent=4)
+        self.assertAlmostEqual(sweep.memory, 4 * single.memory)
+        self.assertAlmostEqual(sweep.time, single.time)
+        self.assertEqual(sweep.level, REFUSE)
+        self.assertIn("4 solves at once", sweep.summary())
+
+    def test_limits_from_env(self):
+        """Test overriding the limits from the environment"""
+        os.environ["MODE_EXPLORER_MAX_MEMORY_GB"] = "2"
+        try:
+            limits = Limits.from_env()
+        finally:
+            del os.environ["MODE_EXPLORER_MAX_MEMORY_GB"]
+        self.assertEqual(limits.max_memory, 2e9)
+        self.assertIsNone(limits.max_time)
+
+class TestCalibrate(unittest.TestCase):
+    def test_peak_memory(self):
+        """Test measuring the peak memory of a block that frees its memory again"""
+        # In a fresh process, where the memory cannot come from heap freed by earlier tests
+        code = (
+            "import time\n"
+            "import numpy as np\n"
+            "from preflight import PeakMemory\n"
+            "with PeakMemory() as memory:\n"
+            "    data = np.ones(50_000_000 // 8)\n"
+            "    time.sleep(0.1)\n"
+            "    del data\n"
+            "print(memory.peak)\n"
+        )
+        output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(preflight.__file__),
+                                capture_output=True, text=True, check=True).stdout
+        self.assertGreater(int(output), 40e6)
+
+    def test_calibrate(self):
+        """Test measuring small solves and fitting a model to them"""
+        log = io.StringIO()
+        model = calibrate([("strip", 6, 1), ("strip", 10, 1), ("strip", 8, 2)], log=log)
+        self.assertEqual(model.source, "calibrated")
+        self.assertEqual(len(log.getvalue().splitlines()), 3)
+        cells = estimate_cost(build_waveguide(FAST_SPEC), DEFAULT_MODEL).cells
+        self.assertGreater(model.time(cells), 0)
+        self.assertTrue(np.all(np.isfinite(model.memory_coefficients)))
+        self.assertGreater(model.memory_coefficients[0], 0)
+        self.assertGreater(model.memory(cells), 0)
+
+    def test_cli(self):
+        """Test printing the estimates of a spec file"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "specs.json")
+            with open(path, "w") as f:
+                json.dump([FAST_SPEC.to_dict()], f)
+            self.assertEqual(main([path]), 0)
+
+if __name__ == '__main__':
+    unittest.main()
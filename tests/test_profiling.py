@@ -0,0 +1,66 @@
+import json
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from profiling import Profiler, PROFILER, cprofile, summarize
+from waveguide_solver import WaveguideSpec, build_waveguide, solve_waveguide
+
+class TestProfiler(unittest.TestCase):
+    def test_spans(self):
+        """Test recording spans with arguments and selecting them by start time"""
+        profiler = Profiler()
+        with profiler.span("build", kind="strip") as args:
+            args["cells"] = 10
+        start = time.time()
+        profiler.record("queue", start, start + 0.5)
+        spans = profiler.spans
+        self.assertEqual([s.name for s in spans], ["build", "queue"])
+        self.assertEqual(spans[0].args, {"kind": "strip", "cells": 10})
+        self.assertEqual([s.name for s in profiler.since(start)], ["queue"])
+        self.assertEqual(summarize(profiler.since(start)), "queue 500 ms")
+
+    def test_bounded(self):
+        """Test that only the most recent spans are kept"""
+        profiler = Profiler(max_spans=2)
+        for name in "abc":
+            with profiler.span(name):
+                pass
+        self.assertEqual([s.name for s in profiler.spans], ["b", "c"])
+
+    def test_chrome_trace(self):
+        """Test exporting spans as Chrome trace complete events"""
+        profiler = Profiler()
+        profiler.add([("eigensolve", 100.0, 2.0, 1, 2, {"num_modes": 1})])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            profiler.write_chrome_trace(path)
+            with open(path) as f:
+                event = json.load(f)["traceEvents"][0]
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["ts"], 100.0e6)
+        self.assertEqual(event["dur"], 2.0e6)
+        self.assertEqual(event["args"], {"num_modes": 1})
+
+    def test_cprofile(self):
+        """Test dumping a cProfile of a block"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "solve.prof")
+            with cprofile(path):
+                sum(range(1000))
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+class TestSolvePhases(unittest.TestCase):
+    def test_local_solve_phases(self):
+        """Test that a local solve records its phases with grid size and mode count"""
+        start = time.time()
+        solve_waveguide(build_waveguide(WaveguideSpec(grid_resolution=10, num_modes=2)))
+        spans = {s.name: s for s in PROFILER.since(start)}
+        for name in ("build.materials", "build.waveguide", "grid", "eigensolve"):
+            self.assertIn(name, spans)
+        self.assertEqual(spans["eigensolve"].args["num_modes"], 2)
+        self.assertEqual(len(spans["eigensolve"].args["grid"]), 2)
+
+if __name__ == '__main__':
+    unittest.main()
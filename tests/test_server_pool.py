@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+import numpy as np
+from server_pool import LocalServer, ServerPool
+from sweep import run_sweep
+from waveguide_solver import WaveguideSpec
+
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+def core_width(mode_solver):
+    """Stand-in result that grows with the core width"""
+    return mode_solver.simulation.structures[-1].geometry.bounds[1][1] * 2
+
+def make_pool(server, **kwargs):
+    return ServerPool(server=server, poll_interval=0.01, sleep=lambda seconds: None, **kwargs)
+
+class TestServerPool(unittest.TestCase):
+    def test_deduplication(self):
+        """Test that identical requests in flight share one job"""
+        server = LocalServer(latency=2.0, solve=core_width)
+        specs = [FAST_SPEC.replace(core_width=w) for w in (0.4, 0.5, 0.4, 0.4)]
+        with make_pool(server) as pool:
+            results = sorted((index, result) for index, spec, result in pool.solve_specs(specs))
+        self.assertEqual(server.submitted, 2)
+        self.assertEqual(pool.deduplicated, 2)
+        self.assertEqual([index for index, _ in results], [0, 1, 2, 3])
+        self.assertAlmostEqual(results[2][1], results[0][1])
+
+    def test_retries(self):
+        """Test that transient failures are retried and give up after max_retries"""
+        with make_pool(LocalServer(failures=2, solve=core_width), max_retries=3) as pool:
+            [(_, _, result)] = list(pool.solve_specs([FAST_SPEC]))
+        self.assertNotIsInstance(result, Exception)
+        self.assertEqual(pool.retries, 2)
+
+        with make_pool(LocalServer(failures=5, solve=core_width), max_retries=1) as pool:
+            [(_, _, result)] = list(pool.solve_specs([FAST_SPEC]))
+        self.assertIsInstance(result, ConnectionError)
+        self.assertEqual(pool.retries, 1)
+
+    def test_solver_errors_not_retried(self):
+        """Test that failed solves are reported without retries"""
+        def fail(mode_solver):
+            raise ValueError("no modes")
+
+        with make_pool(LocalServer(solve=fail)) as pool:
+            [(_, _, result)] = list(pool.solve_specs([FAST_SPEC]))
+        self.assertIsInstance(result, RuntimeError)
+        self.assertEqual(pool.retries, 0)
+
+    def test_bounded_streaming(self):
+        """Test the concurrency bound and that results stream back as they finish"""
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def slow(mode_solver):
+            width = core_width(mode_solver)
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            # Wider cores take longer
+            time.sleep(width)
+            with lock:
+                running[0] -= 1
+            return width
+
+        specs = [FAST_SPEC.replace(core_width=w) for w in (0.6, 0.1, 0.2, 0.3)]
+        with make_pool(LocalServer(solve=slow), max_concurrent=2) as pool:
+            order = [index for index, spec, result in pool.solve_specs(specs)]
+        self.assertEqual(running[1], 2)
+        self.assertEqual(sorted(order), [0, 1, 2, 3])
+        self.assertNotEqual(order[0], 0)
+
+    def test_retry_delay(self):
+        """Test the exponential backoff with jitter and its cap"""
+        pool = ServerPool(backoff=1.0, max_backoff=5.0)
+        self.assertTrue(0.5 <= pool.retry_delay(0) <= 1.0)
+        self.assertTrue(2.0 <= pool.retry_delay(2) <= 4.0)
+        self.assertTrue(2.5 <= pool.retry_delay(10) <= 5.0)
+        pool.shutdown()
+
+    def test_server_sweep(self):
+        """Test that a server sweep against the local stand-in matches a local sweep"""
+        axes = {"core_width": [0.45, 0.6, -1.0]}
+        local = run_sweep(FAST_SPEC, axes, max_workers=0)
+        server = run_sweep(FAST_SPEC, axes, server=LocalServer())
+        np.testing.assert_allclose(server.n_eff[:2], local.n_eff[:2])
+        self.assertEqual(list(server.errors), [(2,)])
+        with self.assertRaises(ValueError):
+            run_sweep(FAST_SPEC, axes, server=LocalServer(), warm_start=True)
+
+if __name__ == '__main__':
+    unittest.main()
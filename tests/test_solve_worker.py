@@ -0,0 +1,107 @@
+import unittest
+import os
+import tempfile
+import time
+import numpy as np
+from field_storage import ModeFiles, open_modes
+from solve_worker import SolveWorker, STARTED, DONE, ERROR
+from solver_cache import SolveCache
+from waveguide_solver import WaveguideSpec, build_waveguide, load_cached, solve
+
+# Small domain and coarse grid to keep the real solves in this file fast
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+def wait_for_events(worker, kinds, timeout=120):
+    """Poll the worker until an event of one of the given kinds arrives"""
+    events = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        events.extend(worker.poll())
+        if any(kind in kinds for kind, _ in events):
+            return events
+        time.sleep(0.05)
+    raise AssertionError("Timed out waiting for {}".format(kinds))
+
+class TestSolveWorker(unittest.TestCase):
+    def setUp(self):
+        self.worker = SolveWorker()
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def test_solve_in_background(self):
+        """Test that a queued solve finishes in the worker process"""
+        job = self.worker.submit(build_waveguide(FAST_SPEC), context="first")
+        self.assertTrue(self.worker.busy)
+        events = wait_for_events(self.worker, (DONE, ERROR))
+        kinds = [kind for kind, _ in events]
+        self.assertIn(STARTED, kinds)
+        self.assertEqual(events[-1], (DONE, job))
+        self.assertEqual(job.context, "first")
+        self.assertGreater(float(job.result.n_eff.values[0][0]), 1.44)
+        self.assertFalse(self.worker.busy)
+        # The phases timed in the worker come back with the job
+        self.assertIn("eigensolve", [span.name for span in job.spans])
+
+    def test_queue_and_cancel(self):
+        """Test cancelling queued and running jobs"""
+        first = self.worker.submit(build_waveguide(FAST_SPEC))
+        second = self.worker.submit(build_waveguide(FAST_SPEC.replace(core_width=0.6)))
+        third = self.worker.submit(build_waveguide(FAST_SPEC.replace(core_width=0.7)))
+        self.assertIs(self.worker.running, first)
+        self.assertEqual(list(self.worker.queued), [second.job_id, third.job_id])
+
+        # Drop a queued job, then cancel the running one
+        self.assertIs(self.worker.cancel(second.job_id), second)
+        self.assertIs(self.worker.cancel(), first)
+        self.assertIs(self.worker.running, third)
+
+        events = wait_for_events(self.worker, (DONE, ERROR))
+        self.assertEqual(events[-1], (DONE, third))
+        self.assertTrue(all(job is third for _, job in events))
+
+    def test_error_is_reported(self):
+        """Test that solver errors come back as error events"""
+        # The mode solver rejects a bend radius smaller than the domain
+        job = self.worker.submit(build_waveguide(FAST_SPEC.replace(bend_radius=0.5)))
+        events = wait_for_events(self.worker, (DONE, ERROR))
+        self.assertEqual(events[-1][0], ERROR)
+        self.assertIsInstance(job.result, str)
+
+    def test_field_transport(self):
+        """Test that fields come back as memory-mapped files and the worker fills the cache"""
+        with tempfile.TemporaryDirectory() as tmp:
+            field_dir = os.path.join(tmp, "fields")
+            cache_dir = os.path.join(tmp, "cache")
+            waveguide = build_waveguide(FAST_SPEC)
+            job = self.worker.submit(waveguide, field_dir=field_dir, cache_dir=cache_dir)
+            events = wait_for_events(self.worker, (DONE, ERROR))
+            self.assertEqual(events[-1], (DONE, job))
+            self.assertIsInstance(job.result, ModeFiles)
+
+            expected = solve(FAST_SPEC)
+            modes = open_modes(job.result, retention="full")
+            np.testing.assert_allclose(modes.n_eff, expected.n_eff.values[0])
+            self.assertEqual(modes.nbytes, 0)
+            np.testing.assert_allclose(np.abs(modes.field("Ey", 0)),
+                                       np.abs(expected.Ey.isel(x=0, f=0, mode_index=0).values), rtol=1e-6, atol=1e-6)
+            self.assertIn("transport.export", [span.name for span in job.spans])
+            self.assertIsNotNone(load_cached(build_waveguide(FAST_SPEC), SolveCache(cache_dir)))
+            modes.close()
+            self.assertFalse(os.path.exists(field_dir))
+
+    def test_cancelled_fields_deleted(self):
+        """Test that the field directories of cancelled and failed jobs are deleted"""
+        with tempfile.TemporaryDirectory() as tmp:
+            dirs = [tempfile.mkdtemp(dir=tmp) for _ in range(3)]
+            first = self.worker.submit(build_waveguide(FAST_SPEC), field_dir=dirs[0])
+            self.worker.submit(build_waveguide(FAST_SPEC), field_dir=dirs[1])
+            self.worker.cancel_all()
+            self.worker.submit(build_waveguide(FAST_SPEC.replace(bend_radius=0.5)), field_dir=dirs[2])
+            events = wait_for_events(self.worker, (DONE, ERROR))
+            self.assertEqual(events[-1][0], ERROR)
+            self.assertTrue(all(job is not first for _, job in events))
+            self.assertEqual(os.listdir(tmp), [])
+
+if __name__ == '__main__':
+    unittest.main()
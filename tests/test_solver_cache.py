@@ -0,0 +1,75 @@
+import unittest
+import os
+import tempfile
+from solver_cache import SolveCache, cache_key
+from waveguide_solver import WaveguideSpec, build_waveguide, solve_waveguide
+
+# Small domain and coarse grid to keep the real solves in this file fast
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+class TestCacheKey(unittest.TestCase):
+    def test_key_is_canonical(self):
+        """Test that equal inputs hash equal and any change alters the key"""
+        key = cache_key(build_waveguide(FAST_SPEC).mode_solver)
+        self.assertEqual(key, cache_key(build_waveguide(FAST_SPEC).mode_solver))
+        self.assertNotEqual(key, cache_key(build_waveguide(FAST_SPEC).mode_solver, server=True))
+        self.assertNotEqual(key, cache_key(build_waveguide(FAST_SPEC.replace(core_width=0.51)).mode_solver))
+        self.assertNotEqual(key, cache_key(build_waveguide(FAST_SPEC.replace(num_modes=2)).mode_solver))
+
+class TestSolveCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Solve once and share the data between tests"""
+        cls.mode_data = solve_waveguide(build_waveguide(FAST_SPEC))
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SolveCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hits_and_misses(self):
+        """Test get/put round trip and the hit/miss counters"""
+        self.assertIsNone(self.cache.get("abc"))
+        self.cache.put("abc", self.mode_data)
+        data = self.cache.get("abc")
+        self.assertIsNotNone(data)
+        self.assertAlmostEqual(float(data.n_eff.values[0][0]), float(self.mode_data.n_eff.values[0][0]))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted first"""
+        self.cache.put("a", self.mode_data)
+        self.cache.put("b", self.mode_data)
+        entry_size = self.cache.size() // 2
+        # Make "a" older than "b", then use it so that "b" becomes the LRU entry
+        os.utime(os.path.join(self.tmp.name, "a.hdf5"), (1, 1))
+        os.utime(os.path.join(self.tmp.name, "b.hdf5"), (2, 2))
+        self.cache.get("a")
+        self.cache.max_bytes = 2 * entry_size + entry_size // 2
+        self.cache.put("c", self.mode_data)
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+    def test_corrupt_entry_is_a_miss(self):
+        """Test that unreadable files are dropped instead of raising"""
+        with open(os.path.join(self.tmp.name, "bad.hdf5"), "w") as f:
+            f.write("not hdf5")
+        self.assertIsNone(self.cache.get("bad"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_solve_waveguide_uses_cache(self):
+        """Test that a repeated solve is answered from the cache"""
+        solve_waveguide(build_waveguide(FAST_SPEC), cache=self.cache)
+        waveguide = build_waveguide(FAST_SPEC)
+        mode_data = solve_waveguide(waveguide, cache=self.cache)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        # The waveguide keeps the cached data instead of solving again
+        self.assertIs(waveguide.data, mode_data)
+
+if __name__ == '__main__':
+    unittest.main()
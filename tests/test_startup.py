@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestLazyImports(unittest.TestCase):
+    def test_gui_import_is_light(self):
+        """Test that importing the GUI does not import tidy3d or matplotlib"""
+        code = (
+            "import sys, waveguide_gui, waveguide_solver, sweep, solve_worker; "
+            "print(','.join(m for m in ('tidy3d', 'matplotlib') if m in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), "")
+
+    def test_build_imports_solver(self):
+        """Test that building a waveguide still works from a fresh interpreter"""
+        code = (
+            "from waveguide_solver import WaveguideSpec, build_waveguide; "
+            "print(type(build_waveguide(WaveguideSpec()).structure).__name__)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), "RectangularDielectric")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from surrogate import SurrogateTable, TABLE_PROPERTIES, build_table, load_tables, lookup
+from waveguide_solver import WaveguideSpec
+
+def analytic_table(func):
+    """Table whose properties are func(core_width, wavelength) for every mode"""
+    axes = {"core_width": np.linspace(0.4, 0.8, 5), "wavelength": np.linspace(1.5, 1.6, 4)}
+    w, wl = np.meshgrid(*axes.values(), indexing="ij")
+    values = np.repeat(func(w, wl)[..., None, None], len(TABLE_PROPERTIES), axis=-2)
+    return SurrogateTable(WaveguideSpec(num_modes=1), axes, values)
+
+class TestInterpolation(unittest.TestCase):
+    def test_linear_is_exact(self):
+        """Test that linear data is interpolated exactly with zero error estimate"""
+        table = analytic_table(lambda w, wl: 2 + w - 0.5 * wl)
+        values, errors = table.interpolate({"core_width": [0.45, 0.72], "wavelength": 1.55})
+        np.testing.assert_allclose(values["n_eff"][:, 0], 2 + np.array([0.45, 0.72]) - 0.775)
+        np.testing.assert_allclose(errors["n_eff"], 0, atol=1e-12)
+
+    def test_error_estimate(self):
+        """Test that the error estimate bounds the actual error of curved data"""
+        table = analytic_table(lambda w, wl: w**2 + wl)
+        w = np.linspace(0.4, 0.8, 37)
+        values, errors = table.interpolate({"core_width": w, "wavelength": 1.53})
+        actual = np.abs(values["n_eff"][:, 0] - (w**2 + 1.53))
+        estimate = errors["n_eff"][:, 0]
+        self.assertTrue(np.all(actual <= estimate * 1.01 + 1e-12))
+        self.assertLess(estimate.max(), 2 * actual.max())
+
+    def test_coverage(self):
+        """Test that specs outside the table or with other fixed fields are not answered"""
+        table = analytic_table(lambda w, wl: w + wl)
+        self.assertIsNotNone(table.lookup(WaveguideSpec(core_width=0.5, target_neff=2.0)))
+        self.assertIsNone(table.lookup(WaveguideSpec(core_width=0.9)))
+        self.assertIsNone(table.lookup(WaveguideSpec(core_width=0.5, core_index=3.0)))
+        self.assertIsNone(table.lookup(WaveguideSpec(core_width=0.5, num_modes=2)))
+        values, errors = table.interpolate({"core_width": 0.9, "wavelength": 1.55})
+        self.assertTrue(np.isnan(values["n_eff"]).all())
+        self.assertTrue(np.isinf(errors["n_eff"]).all())
+
+class TestBuildTable(unittest.TestCase):
+    def test_build_save_load(self):
+        """Test building a small table and answering a spec from the memory-mapped file"""
+        base = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+        with tempfile.TemporaryDirectory() as tmp:
+            table = build_table(os.path.join(tmp, "strip"), base,
+                                {"core_width": [0.45, 0.5, 0.55]}, max_workers=0)
+            self.assertEqual(table.values.shape, (3, len(TABLE_PROPERTIES), 1))
+            tables = load_tables(tmp)
+            self.assertEqual([t.name for t in tables], ["strip"])
+            self.assertIsInstance(tables[0].values, np.memmap)
+            found, values, errors = lookup(tables, base.replace(core_width=0.5))
+            self.assertAlmostEqual(values["n_eff"][0], table.values[1, 0, 0], places=5)
+            self.assertIsNone(lookup(tables, base.replace(core_width=0.6)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import scipy.sparse.linalg as spl
+from sweep import run_sweep, SweepResult, predict_neff, count_eigensolver_steps
+from waveguide_solver import WaveguideSpec
+
+# Small domain and coarse grid to keep the real solves in this file fast
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+class TestSweep(unittest.TestCase):
+    def test_rejects_unknown_parameter(self):
+        """Test that only spec fields can be swept"""
+        with self.assertRaises(ValueError):
+            run_sweep(FAST_SPEC, {"num_modes": [1, 2]})
+
+    def test_result_indexing(self):
+        """Test grid shape and the spec at each index"""
+        result = SweepResult(FAST_SPEC, {"core_width": [0.4, 0.5, 0.6], "gap": [0.1, 0.2]}, 2)
+        self.assertEqual(result.shape, (3, 2))
+        self.assertEqual(result.n_eff.shape, (3, 2, 2))
+        spec = result.spec_at((2, 1))
+        self.assertEqual((spec.core_width, spec.gap), (0.6, 0.2))
+
+    def test_serial_sweep(self):
+        """Test a 2-D sweep solved in this process"""
+        points = []
+        result = run_sweep(
+            FAST_SPEC,
+            {"core_width": [0.45, 0.6], "core_thickness": [0.2, 0.25]},
+            max_workers=0,
+            on_point=lambda index, props: points.append(index),
+        )
+        self.assertEqual(len(points), 4)
+        self.assertFalse(result.errors)
+        self.assertFalse(np.isnan(result.n_eff).any())
+        # Wider and thicker cores have higher effective indices
+        self.assertTrue(np.all(np.diff(result.n_eff[..., 0], axis=0) > 0))
+        self.assertTrue(np.all(np.diff(result.n_eff[..., 0], axis=1) > 0))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sweep.npz")
+            result.save(path)
+            saved = np.load(path)
+            np.testing.assert_array_equal(saved["n_eff"], result.n_eff)
+            np.testing.assert_array_equal(saved["axis_core_width"], [0.45, 0.6])
+
+    def test_process_pool_sweep(self):
+        """Test that pool and serial sweeps agree and failures are recorded"""
+        axes = {"core_width": [0.5, -1.0]}
+        serial = run_sweep(FAST_SPEC, axes, max_workers=0)
+        pooled = run_sweep(FAST_SPEC, axes, max_workers=2)
+        self.assertEqual(list(pooled.errors), [(1,)])
+        np.testing.assert_allclose(pooled.n_eff[0], serial.n_eff[0])
+        self.assertTrue(np.isnan(pooled.n_eff[1]).all())
+
+class TestWarmStart(unittest.TestCase):
+    def test_predict_neff(self):
+        """Test extrapolation from the previous points of a line"""
+        self.assertIsNone(predict_neff([], [], 0.5))
+        self.assertEqual(predict_neff([0.4], [2.3], 0.5), 2.3)
+        self.assertAlmostEqual(predict_neff([0.4, 0.5], [2.3, 2.4], 0.6), 2.5)
+        # Exact for a quadratic
+        values = [0.1, 0.2, 0.3]
+        self.assertAlmostEqual(predict_neff(values, [v**2 for v in values], 0.4), 0.16)
+
+    def test_counter_restores_eigs(self):
+        """Test that the eigensolver counter is scoped to its block"""
+        original = spl.eigs
+        with count_eigensolver_steps() as steps:
+            self.assertIsNot(spl.eigs, original)
+        self.assertIs(spl.eigs, original)
+        self.assertEqual(steps.count, 0)
+
+    def test_warm_start_saves_iterations(self):
+        """Test that seeded solves need fewer eigensolver steps and agree with cold solves"""
+        # With a single mode ARPACK converges in its first restart either way
+        spec = FAST_SPEC.replace(num_modes=3)
+        result = run_sweep(
+            spec,
+            {"core_width": [0.45, 0.5, 0.55, 0.6]},
+            max_workers=0,
+            warm_start=True,
+            compare_cold=True,
+        )
+        self.assertTrue(np.isnan(result.target_neff[0]))
+        self.assertFalse(np.isnan(result.target_neff[1:]).any())
+        self.assertGreater(result.cold_eigensolver_steps[1], 0)
+
+        savings = result.warm_start_savings()
+        self.assertEqual(savings["points"], 3)
+        self.assertGreater(savings["eigensolver_steps_saved"], 0)
+
+        cold = run_sweep(spec, {"core_width": [0.45, 0.5, 0.55, 0.6]}, max_workers=0)
+        np.testing.assert_allclose(result.n_eff, cold.n_eff, rtol=1e-6)
+
+    def test_warm_start_chunks(self):
+        """Test that warm-started lines are split between the workers and every point is reported"""
+        points = []
+        result = run_sweep(
+            FAST_SPEC,
+            {"core_width": [0.45, 0.5, 0.55, 0.6, 0.65, 0.7]},
+            max_workers=2,
+            warm_start=True,
+            on_point=lambda index, props: points.append(index),
+        )
+        self.assertEqual(sorted(points), [(i,) for i in range(6)])
+        self.assertFalse(result.errors)
+        # Every chunk starts cold and seeds its later points from its own solves
+        np.testing.assert_array_equal(np.isnan(result.target_neff), [True, False, False, True, False, False])
+        # Eigensolver iterations are only counted when comparing with cold solves
+        self.assertTrue(np.isnan(result.eigensolver_steps).all())
+        self.assertFalse(np.isnan(result.solve_time).any())
+
+if __name__ == '__main__':
+    unittest.main()
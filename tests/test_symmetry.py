@@ -0,0 +1,80 @@
+import unittest
+import numpy as np
+from symmetry import detect_symmetry, mirrored_grid_spec, symmetry_classes
+from waveguide_solver import WaveguideSpec, build_waveguide, solve, solve_waveguide
+
+class TestDetectSymmetry(unittest.TestCase):
+    def test_strip(self):
+        """Test that a strip with angled sidewalls is only laterally symmetric"""
+        waveguide = build_waveguide(WaveguideSpec())
+        self.assertEqual(detect_symmetry(waveguide), (True, False))
+        self.assertEqual(symmetry_classes(waveguide), [(0, 1, 0), (0, -1, 0)])
+
+    def test_vertical(self):
+        """Test that upright sidewalls in a uniform cladding add the vertical symmetry"""
+        spec = WaveguideSpec(sidewall_angle=0.0, clad_index=1.44)
+        self.assertEqual(detect_symmetry(build_waveguide(spec)), (True, True))
+        self.assertEqual(len(symmetry_classes(build_waveguide(spec))), 4)
+        self.assertEqual(detect_symmetry(build_waveguide(spec.replace(box_thickness=1.0))), (True, False))
+
+    def test_broken_symmetries(self):
+        """Test that bends, rib slabs and unequal slot cores break symmetries"""
+        spec = WaveguideSpec(sidewall_angle=0.0, clad_index=1.44)
+        self.assertEqual(detect_symmetry(build_waveguide(spec.replace(bend_radius=5.0))), (False, True))
+        self.assertEqual(detect_symmetry(build_waveguide(spec.replace(waveguide_type="rib"))), (True, False))
+        slot = spec.replace(waveguide_type="slot", core_width=0.3, second_core_width=0.3)
+        self.assertEqual(detect_symmetry(build_waveguide(slot)), (True, True))
+        self.assertEqual(detect_symmetry(build_waveguide(slot.replace(second_core_width=0.25))), (False, True))
+        self.assertEqual(symmetry_classes(build_waveguide(WaveguideSpec(bend_radius=5.0))), [(0, 0, 0)])
+
+class TestMirroredGrid(unittest.TestCase):
+    def test_mirror_symmetric(self):
+        """Test that the grid is mirrored about the core center and has boundaries on the core edges"""
+        waveguide = build_waveguide(WaveguideSpec(sidewall_angle=0.0, clad_index=1.44, grid_resolution=15))
+        center = waveguide.mode_solver.simulation.center
+        for axis, coords in ((1, waveguide.grid_spec.grid_y.coords), (2, waveguide.grid_spec.grid_z.coords)):
+            coords = np.array(coords) - center[axis]
+            np.testing.assert_allclose(coords, -coords[::-1], atol=1e-12)
+        self.assertIn(0.25, waveguide.grid_spec.grid_y.coords)
+        self.assertIn(-0.25, waveguide.grid_spec.grid_y.coords)
+
+    def test_asymmetric_unchanged(self):
+        """Test that cross-sections without a mirror plane keep their grid spec"""
+        waveguide = build_waveguide(WaveguideSpec(bend_radius=5.0))
+        self.assertEqual(mirrored_grid_spec(waveguide.structure), waveguide.structure.grid_spec)
+        self.assertEqual(waveguide.grid_spec, waveguide.structure.grid_spec)
+
+class TestSymmetricSolve(unittest.TestCase):
+    def assert_matches_full(self, spec, num_classes):
+        full = solve(spec)
+        waveguide = build_waveguide(spec.replace(use_symmetry=True))
+        self.assertEqual(len(symmetry_classes(waveguide)), num_classes)
+        merged = solve_waveguide(waveguide, use_symmetry=True)
+        self.assertEqual(merged.n_eff.shape, full.n_eff.shape)
+        self.assertEqual(merged.Ex.sizes["mode_index"], spec.num_modes)
+        np.testing.assert_allclose(merged.n_eff.values, full.n_eff.values, rtol=1e-6)
+        self.assertTrue(np.all(np.diff(merged.n_eff.values[0]) < 0))
+        self.assertIs(waveguide.data, merged)
+
+    def test_merged_modes(self):
+        """Test that the merged classes of a laterally symmetric strip match a full-domain solve"""
+        self.assert_matches_full(WaveguideSpec(grid_resolution=15, num_modes=3), 2)
+
+    def test_upright_sidewalls(self):
+        """Test that upright sidewalls, where the grid meets both core edges, match a full-domain solve"""
+        self.assert_matches_full(WaveguideSpec(sidewall_angle=0.0, grid_resolution=20, num_modes=2), 2)
+
+    def test_four_classes(self):
+        """Test that the four classes of a doubly symmetric strip match a full-domain solve"""
+        spec = WaveguideSpec(sidewall_angle=0.0, clad_index=1.44, clad_thickness=1.0, box_thickness=1.0,
+                             grid_resolution=20, num_modes=2)
+        self.assert_matches_full(spec, 4)
+
+    def test_refined_rib(self):
+        """Test that a rib on an edge-refined grid matches a full-domain solve"""
+        spec = WaveguideSpec(waveguide_type="rib", clad_thickness=1.0, box_thickness=1.0, grid_resolution=10,
+                             edge_resolution=40, num_modes=2)
+        self.assert_matches_full(spec, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -90,8 +90,13 @@ class TestWaveguideCreation(unittest.TestCase):
         self.app.wavelength_var.set(1.55)
         self.app.num_modes_var.set(1)
         
-        # Trigger local mode solve
+        # Trigger local mode solve and wait for the background worker
+        self.app.mode_data = None
         self.app._solve_local_mode()
+        deadline = time.time() + 120
+        while self.app.mode_data is None and time.time() < deadline:
+            self.root.update()
+            time.sleep(0.05)
         self.root.update()
         
         # Verify that mode data was generated
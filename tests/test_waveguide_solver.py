@@ -0,0 +1,102 @@
+import unittest
+import json
+import os
+import tempfile
+from waveguide_solver import (
+    WaveguideSpec, build_waveguide, solve, solve_waveguide, mode_properties, load_specs, main,
+    MODE_PROPERTIES
+)
+
+# Small domain and coarse grid to keep the real solves in this file fast
+FAST_SPEC = WaveguideSpec(clad_thickness=1.0, box_thickness=1.0, grid_resolution=10)
+
+class TestWaveguideSpec(unittest.TestCase):
+    def test_from_dict_converts_strings(self):
+        """Test that CSV-style string values are converted to field types"""
+        spec = WaveguideSpec.from_dict({
+            "waveguide_type": "rib",
+            "core_width": "0.6",
+            "num_modes": "2",
+            "use_pml": "True",
+            "target_neff": "",
+        })
+        self.assertEqual(spec.waveguide_type, "rib")
+        self.assertEqual(spec.core_width, 0.6)
+        self.assertEqual(spec.num_modes, 2)
+        self.assertTrue(spec.use_pml)
+        self.assertIsNone(spec.target_neff)
+
+    def test_from_dict_rejects_unknown_fields(self):
+        """Test that unknown fields and waveguide types are rejected"""
+        with self.assertRaises(ValueError):
+            WaveguideSpec.from_dict({"core_wdith": 0.5})
+        with self.assertRaises(ValueError):
+            WaveguideSpec(waveguide_type="ridge")
+
+    def test_round_trip(self):
+        """Test that to_dict and from_dict round-trip"""
+        spec = WaveguideSpec(waveguide_type="slot", gap=0.15, bend_radius=10.0)
+        self.assertEqual(WaveguideSpec.from_dict(spec.to_dict()), spec)
+
+class TestBuildAndSolve(unittest.TestCase):
+    def test_build_each_type(self):
+        """Test building strip, rib and slot waveguides"""
+        for waveguide_type in ("strip", "rib", "slot"):
+            waveguide = build_waveguide(FAST_SPEC.replace(waveguide_type=waveguide_type))
+            self.assertIsNotNone(waveguide.mode_solver)
+
+        slot = build_waveguide(FAST_SPEC.replace(waveguide_type="slot", gap=0.2))
+        self.assertEqual(len(slot.core_width), 2)
+        self.assertAlmostEqual(float(slot.gap[0]), 0.2)
+
+    def test_mode_spec_options(self):
+        """Test that optional mode spec settings are passed through"""
+        spec = FAST_SPEC.replace(target_neff=2.4, bend_radius=20.0, use_pml=True)
+        mode_spec = build_waveguide(spec).mode_spec
+        self.assertEqual(mode_spec.target_neff, 2.4)
+        self.assertEqual(mode_spec.bend_radius, 20.0)
+        self.assertEqual(mode_spec.bend_axis, 1)
+        self.assertEqual(tuple(mode_spec.num_pml), (12, 12))
+
+    def test_solve(self):
+        """Test a headless local solve and property extraction"""
+        mode_data = solve(FAST_SPEC.replace(num_modes=2))
+        props = mode_properties(mode_data)
+        self.assertEqual(len(props), 2)
+        self.assertEqual(set(props[0]), set(MODE_PROPERTIES))
+        self.assertGreater(props[0]["n_eff"], 1.44)
+        self.assertLess(props[0]["n_eff"], 3.47)
+
+    def test_release_data(self):
+        """Test that the waveguide keeps its solve result until it is released"""
+        waveguide = build_waveguide(FAST_SPEC)
+        mode_data = solve_waveguide(waveguide)
+        self.assertIs(waveguide.data, mode_data)
+        waveguide.release_data()
+        self.assertIsNone(waveguide.data)
+        self.assertNotIn("mode_solver", vars(waveguide))
+
+class TestBatchCLI(unittest.TestCase):
+    def test_csv_to_json(self):
+        """Test the batch entry point from a CSV spec list to JSON results"""
+        with tempfile.TemporaryDirectory() as tmp:
+            specs_path = os.path.join(tmp, "specs.csv")
+            output_path = os.path.join(tmp, "results.json")
+            with open(specs_path, "w") as f:
+                f.write("waveguide_type,core_width,clad_thickness,box_thickness,grid_resolution\n")
+                f.write("strip,0.5,1.0,1.0,10\n")
+                f.write("strip,-1.0,1.0,1.0,10\n")
+
+            self.assertEqual(len(load_specs(specs_path)), 2)
+            status = main([specs_path, "-o", output_path, "--cache-dir", tmp])
+
+            with open(output_path) as f:
+                rows = json.load(f)
+            self.assertEqual(status, 1)
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(rows[0]["mode_index"], 0)
+            self.assertIn("n_eff", rows[0])
+            self.assertIn("error", rows[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import math
+import unittest
+import numpy as np
+from waveguide_solver import WaveguideSpec, solve
+from window import MAX_MARGIN, MIN_MARGIN, auto_window, decay_length, saved_cells, window_margins
+
+class TestDecayLength(unittest.TestCase):
+    def test_decay_length(self):
+        """Test the decay length against the analytic value and for unguided modes"""
+        self.assertAlmostEqual(float(decay_length(2.0, 1.0, 2 * math.pi)), 1 / math.sqrt(3))
+        self.assertTrue(np.isinf(decay_length(1.4, 1.44, 1.55)))
+
+class TestAutoWindow(unittest.TestCase):
+    def test_margins(self):
+        """Test that a tighter tolerance and weaker confinement widen the window"""
+        spec = WaveguideSpec()
+        loose = window_margins(spec, 1e-2)
+        tight = window_margins(spec, 1e-4)
+        self.assertEqual(set(loose), {"clad_thickness", "box_thickness", "side_margin"})
+        for name in loose:
+            self.assertGreater(tight[name], loose[name])
+            self.assertTrue(MIN_MARGIN <= loose[name] <= MAX_MARGIN)
+        # The cladding (n = 1) confines more than the box (n = 1.44)
+        self.assertLess(loose["clad_thickness"], loose["box_thickness"])
+        weak = window_margins(spec.replace(core_index=2.0), 1e-2)
+        self.assertGreater(weak["box_thickness"], loose["box_thickness"])
+
+    def test_unguided(self):
+        """Test that specs without a guided estimate keep their manual window"""
+        spec = WaveguideSpec(core_index=1.44)
+        self.assertEqual(window_margins(spec), {})
+        self.assertEqual(auto_window(spec), spec)
+        with self.assertRaises(ValueError):
+            window_margins(spec, 0.0)
+
+    def test_solve(self):
+        """Test that a windowed solve saves cells and keeps n_eff"""
+        spec = WaveguideSpec(core_width=0.8, core_thickness=0.4, grid_resolution=15)
+        windowed = auto_window(spec)
+        manual, auto = saved_cells(spec, windowed)
+        self.assertLess(auto, manual)
+        # Within the grid error of the coarse grid
+        np.testing.assert_allclose(solve(windowed).n_eff.values, solve(spec).n_eff.values, atol=5e-3)
+
+if __name__ == '__main__':
+    unittest.main()
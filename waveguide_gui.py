@@ -1,15 +1,66 @@
 # -*- coding: utf-8 -*-
 import tkinter as tk
-import math
-from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-from tidy3d import Medium, ModeSpec
-from tidy3d.plugins.waveguide import RectangularDielectric
-from tidy3d.plugins.mode.web import run as run_mode_solver
+from tkinter import ttk, messagebox, filedialog
+import atexit
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from convergence import DEFAULT_TOLERANCE, GridConvergence
+from design_target import QUANTITIES, ParameterSearch
+from dispersion import DispersionResult, dispersion_waveguide
+from mesh_refinement import MeshComparison, grid_shape, uniform_spec
+from effective_index import estimate_spec
+from field_storage import DEFAULT_RETENTION, RETENTIONS, ModeFiles, open_modes, store_modes
+from preflight import REFUSE, WARN, Limits, estimate_cost, load_model
+from profiling import PROFILER, summarize
+from solve_worker import SolveWorker, DONE, ERROR
+from solver_cache import SolveCache
+from surrogate import load_tables, lookup
+from sweep import SWEEP_PARAMETERS, run_sweep
+from waveguide_solver import WaveguideSpec, build_waveguide, load_cached, load_solver_modules, mode_properties, store_result
+from window import DEFAULT_WINDOW_TOLERANCE, auto_window, saved_cells
 import traceback
 
+# Delay before the live preview redraws after a parameter edit (ms)
+PREVIEW_DELAY_MS = 150
+
+# Largest estimated n_eff error for which a lookup table answer replaces a solve
+TABLE_TOLERANCE = 1e-4
+
+def _load_plot_modules():
+    """Import matplotlib and tidy3d (run in a background thread at startup)."""
+    import matplotlib.backends.backend_tkagg
+    import matplotlib.figure
+    import geometry_preview
+    load_solver_modules()
+
+class DispersionContext:
+    """Marks a background solve as a dispersion solve over ``wavelengths``."""
+    def __init__(self, wavelengths):
+        self.wavelengths = wavelengths
+
+class ConvergenceContext:
+    """Marks a background solve as one step of a grid-convergence study."""
+    def __init__(self, study):
+        self.study = study
+
+class TargetContext:
+    """Marks a background solve as one step of a solve-for-parameter search."""
+    def __init__(self, search):
+        self.search = search
+
+class MeshComparisonContext:
+    """Marks a background solve as the uniform or refined mesh of a mesh comparison."""
+    def __init__(self, spec, mesh, results):
+        self.spec = spec
+        self.mesh = mesh
+        # Shared by both solves: mesh -> (cells, n_eff)
+        self.results = results
+
 class WaveguideGUI:
     def __init__(self, root):
         self.root = root
@@ -27,11 +78,17 @@ class WaveguideGUI:
         self.right_frame = ttk.Frame(self.main_frame)
         self.right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
         
-        # Create figure for plot
-        self.fig = Figure(figsize=(6, 4))
-        self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.right_frame)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # The plot is created once matplotlib and tidy3d have been imported in
+        # the background, so the window appears without waiting for them
+        self.fig = None
+        self.ax = None
+        self.canvas = None
+        self.preview = None
+        self._preview_id = None
+        self.loading_label = ttk.Label(self.right_frame, text="Loading solver...")
+        self.loading_label.pack(expand=True)
+        self._loader = threading.Thread(target=_load_plot_modules, daemon=True)
+        self._loader.start()
         
         # Create waveguide type selection
         self.type_frame = ttk.LabelFrame(self.left_frame, text="Waveguide Type")
@@ -156,6 +213,20 @@ class WaveguideGUI:
         pml_combo.grid(row=10, column=1, padx=5, pady=5)
         pml_combo.set("False")
         
+        ttk.Label(self.common_frame, text="Use Symmetry:").grid(row=11, column=0, padx=5, pady=5)
+        self.use_symmetry_var = tk.StringVar(value="False")
+        symmetry_combo = ttk.Combobox(self.common_frame, textvariable=self.use_symmetry_var, values=["True", "False"], width=7, state="readonly")
+        symmetry_combo.grid(row=11, column=1, padx=5, pady=5)
+        symmetry_combo.set("False")
+        
+        ttk.Label(self.common_frame, text="Edge Resolution:").grid(row=12, column=0, padx=5, pady=5)
+        self.edge_resolution_entry = ttk.Entry(self.common_frame, width=10, validate='key', validatecommand=vcmd)
+        self.edge_resolution_entry.grid(row=12, column=1, padx=5, pady=5)
+        
+        ttk.Label(self.common_frame, text="Keep Fields:").grid(row=13, column=0, padx=5, pady=5)
+        self.retention_var = tk.StringVar(value=DEFAULT_RETENTION)
+        ttk.Combobox(self.common_frame, textvariable=self.retention_var, values=list(RETENTIONS), width=7, state="readonly").grid(row=13, column=1, padx=5, pady=5)
+        
         # Create simulation parameters frame
         self.sim_frame = ttk.LabelFrame(self.left_frame, text="Simulation Parameters")
         self.sim_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -184,14 +255,219 @@ class WaveguideGUI:
             command=self._solve_server_mode
         ).pack(side=tk.LEFT, padx=5)
         
-        # Store mode data
-        self.mode_data = None
+        # Estimated cost of a local solve, updated as parameters change
+        self.cost_model = load_model()
+        self.solve_limits = Limits.from_env()
+        self.cost_var = tk.StringVar(value="")
+        self.cost_label = ttk.Label(self.button_frame, textvariable=self.cost_var, anchor='w')
+        self.cost_label.pack(side=tk.LEFT, padx=5)
+        
+        # Effective index estimate, updated as parameters change
+        self.estimate_var = tk.StringVar(value="")
+        ttk.Label(self.left_frame, textvariable=self.estimate_var, anchor='w').pack(fill=tk.X, padx=5)
+        
+        # Precomputed lookup tables, answered before running a solve
+        self.surrogate_tables = load_tables()
+        self.table_var = tk.StringVar(value="")
+        ttk.Label(self.left_frame, textvariable=self.table_var, anchor='w').pack(fill=tk.X, padx=5)
+        self.use_table_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.left_frame, text="Answer solves from lookup tables", variable=self.use_table_var).pack(anchor='w', padx=5)
+        
+        # Create solve progress panel
+        self.progress_frame = ttk.LabelFrame(self.left_frame, text="Solve Progress")
+        self.progress_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode='indeterminate')
+        self.progress_bar.grid(row=0, column=0, columnspan=3, sticky='ew', padx=5, pady=5)
+        self.progress_frame.columnconfigure(0, weight=1)
+        
+        self.progress_var = tk.StringVar(value="Idle")
+        ttk.Label(self.progress_frame, textvariable=self.progress_var).grid(row=1, column=0, sticky='w', padx=5, pady=5)
+        self.cancel_button = ttk.Button(self.progress_frame, text="Cancel", command=self._cancel_solve)
+        self.cancel_button.grid(row=1, column=1, padx=5, pady=5)
+        self.cancel_button.state(['disabled'])
+        ttk.Button(self.progress_frame, text="Cancel all", command=self._cancel_all_solves).grid(row=1, column=2, padx=5, pady=5)
+        
+        # Profiling controls
+        self.cprofile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.progress_frame, text="cProfile solves", variable=self.cprofile_var).grid(row=2, column=0, sticky='w', padx=5, pady=2)
+        ttk.Button(self.progress_frame, text="Export trace...", command=self._export_trace).grid(row=2, column=1, padx=5, pady=2)
+        ttk.Button(self.progress_frame, text="Export profile...", command=self._export_profile).grid(row=2, column=2, padx=5, pady=2)
+        
+        # Background solver process, polled from the Tk main loop
+        self.solve_worker = SolveWorker()
+        self._poll_id = None
+        self._progress_running = False
+        # Start time of every submitted solve, for its phase timings
+        self._solve_starts = {}
+        self._profile_dir = None
+        self.last_profile_path = None
+        
+        # Create dispersion panel
+        self.dispersion_frame = ttk.LabelFrame(self.left_frame, text="Dispersion")
+        self.dispersion_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(self.dispersion_frame, text="Start (um):").grid(row=0, column=0, padx=5, pady=2)
+        self.dispersion_start_var = tk.DoubleVar(value=1.5)
+        ttk.Entry(self.dispersion_frame, textvariable=self.dispersion_start_var, width=7).grid(row=0, column=1, padx=5, pady=2)
+        
+        ttk.Label(self.dispersion_frame, text="Stop (um):").grid(row=0, column=2, padx=5, pady=2)
+        self.dispersion_stop_var = tk.DoubleVar(value=1.6)
+        ttk.Entry(self.dispersion_frame, textvariable=self.dispersion_stop_var, width=7).grid(row=0, column=3, padx=5, pady=2)
+        
+        ttk.Label(self.dispersion_frame, text="Points:").grid(row=1, column=0, padx=5, pady=2)
+        self.dispersion_points_var = tk.IntVar(value=11)
+        ttk.Entry(self.dispersion_frame, textvariable=self.dispersion_points_var, width=7).grid(row=1, column=1, padx=5, pady=2)
+        
+        ttk.Button(self.dispersion_frame, text="Solve dispersion", command=self._solve_dispersion).grid(row=1, column=2, columnspan=2, padx=5, pady=2)
+        
+        # Create computational window panel
+        self.window_frame = ttk.LabelFrame(self.left_frame, text="Computational Window")
+        self.window_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.auto_window_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.window_frame, text="Auto window", variable=self.auto_window_var).grid(row=0, column=0, padx=5, pady=2)
+        ttk.Label(self.window_frame, text="Field tolerance:").grid(row=0, column=1, padx=5, pady=2)
+        self.window_tolerance_var = tk.DoubleVar(value=DEFAULT_WINDOW_TOLERANCE)
+        ttk.Entry(self.window_frame, textvariable=self.window_tolerance_var, width=9).grid(row=0, column=2, padx=5, pady=2)
+        self.window_var = tk.StringVar(value="")
+        ttk.Label(self.window_frame, textvariable=self.window_var, anchor='w').grid(row=1, column=0, columnspan=3, sticky='w', padx=5, pady=2)
+        
+        # Create grid convergence panel
+        self.convergence_frame = ttk.LabelFrame(self.left_frame, text="Grid Convergence")
+        self.convergence_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(self.convergence_frame, text="n_eff tolerance:").grid(row=0, column=0, padx=5, pady=2)
+        self.convergence_tolerance_var = tk.DoubleVar(value=DEFAULT_TOLERANCE)
+        ttk.Entry(self.convergence_frame, textvariable=self.convergence_tolerance_var, width=9).grid(row=0, column=1, padx=5, pady=2)
+        self.convergence_button = ttk.Button(self.convergence_frame, text="Converge grid", command=self._converge_grid)
+        self.convergence_button.grid(row=0, column=2, padx=5, pady=2)
+        ttk.Button(self.convergence_frame, text="Compare meshes", command=self._compare_meshes).grid(row=1, column=2, padx=5, pady=2)
+        
+        # Create parameter sweep panel
+        self.sweep_frame = ttk.LabelFrame(self.left_frame, text="Parameter Sweep")
+        self.sweep_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(self.sweep_frame, text="Parameter:").grid(row=0, column=0, padx=5, pady=2)
+        self.sweep_param_var = tk.StringVar(value="core_width")
+        ttk.Combobox(
+            self.sweep_frame,
+            textvariable=self.sweep_param_var,
+            values=SWEEP_PARAMETERS,
+            state="readonly",
+            width=15
+        ).grid(row=0, column=1, columnspan=3, sticky='w', padx=5, pady=2)
+        
+        ttk.Label(self.sweep_frame, text="Start:").grid(row=1, column=0, padx=5, pady=2)
+        self.sweep_start_var = tk.DoubleVar(value=0.4)
+        ttk.Entry(self.sweep_frame, textvariable=self.sweep_start_var, width=7).grid(row=1, column=1, padx=5, pady=2)
+        
+        ttk.Label(self.sweep_frame, text="Stop:").grid(row=1, column=2, padx=5, pady=2)
+        self.sweep_stop_var = tk.DoubleVar(value=0.8)
+        ttk.Entry(self.sweep_frame, textvariable=self.sweep_stop_var, width=7).grid(row=1, column=3, padx=5, pady=2)
+        
+        ttk.Label(self.sweep_frame, text="Points:").grid(row=2, column=0, padx=5, pady=2)
+        self.sweep_points_var = tk.IntVar(value=9)
+        ttk.Entry(self.sweep_frame, textvariable=self.sweep_points_var, width=7).grid(row=2, column=1, padx=5, pady=2)
+        
+        self.sweep_button = ttk.Button(self.sweep_frame, text="Run sweep", command=self._run_sweep)
+        self.sweep_button.grid(row=2, column=2, columnspan=2, padx=5, pady=2)
+        
+        # Seed each point's target n_eff from the previous points
+        self.sweep_warm_start_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.sweep_frame, text="Warm start", variable=self.sweep_warm_start_var).grid(row=3, column=0, columnspan=2, sticky='w', padx=5, pady=2)
+        # Server sweeps keep many jobs in flight instead of warm-starting
+        self.sweep_server_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.sweep_frame, text="On server", variable=self.sweep_server_var).grid(row=3, column=2, columnspan=2, sticky='w', padx=5, pady=2)
+        # Keep mode indices on the same mode where modes cross
+        self.sweep_track_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.sweep_frame, text="Track modes", variable=self.sweep_track_var).grid(row=4, column=0, columnspan=2, sticky='w', padx=5, pady=2)
+        
+        # Sweeps run in a thread that drives a process pool
+        self.sweep_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.sweep_future = None
+        self.sweep_done_points = 0
+        
+        # Create solve-for-parameter panel
+        self.target_frame = ttk.LabelFrame(self.left_frame, text="Solve for Parameter")
+        self.target_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(self.target_frame, text="Parameter:").grid(row=0, column=0, padx=5, pady=2)
+        self.target_param_var = tk.StringVar(value="core_width")
+        ttk.Combobox(
+            self.target_frame,
+            textvariable=self.target_param_var,
+            values=("core_width", "core_thickness"),
+            state="readonly",
+            width=15
+        ).grid(row=0, column=1, columnspan=3, sticky='w', padx=5, pady=2)
+        
+        ttk.Label(self.target_frame, text="Lower:").grid(row=1, column=0, padx=5, pady=2)
+        self.target_lower_var = tk.DoubleVar(value=0.4)
+        ttk.Entry(self.target_frame, textvariable=self.target_lower_var, width=7).grid(row=1, column=1, padx=5, pady=2)
+        
+        ttk.Label(self.target_frame, text="Upper:").grid(row=1, column=2, padx=5, pady=2)
+        self.target_upper_var = tk.DoubleVar(value=0.8)
+        ttk.Entry(self.target_frame, textvariable=self.target_upper_var, width=7).grid(row=1, column=3, padx=5, pady=2)
+        
+        ttk.Label(self.target_frame, text="Quantity:").grid(row=2, column=0, padx=5, pady=2)
+        self.target_quantity_var = tk.StringVar(value="n_eff")
+        ttk.Combobox(
+            self.target_frame,
+            textvariable=self.target_quantity_var,
+            values=QUANTITIES,
+            state="readonly",
+            width=7
+        ).grid(row=2, column=1, padx=5, pady=2)
+        
+        # Empty for the default of the quantity (cladding index / mode 1 for cutoff)
+        ttk.Label(self.target_frame, text="Target:").grid(row=2, column=2, padx=5, pady=2)
+        self.target_value_var = tk.StringVar(value="2.5")
+        ttk.Entry(self.target_frame, textvariable=self.target_value_var, width=7).grid(row=2, column=3, padx=5, pady=2)
+        
+        ttk.Label(self.target_frame, text="Mode:").grid(row=3, column=0, padx=5, pady=2)
+        self.target_mode_var = tk.StringVar(value="")
+        ttk.Entry(self.target_frame, textvariable=self.target_mode_var, width=7).grid(row=3, column=1, padx=5, pady=2)
+        
+        self.target_button = ttk.Button(self.target_frame, text="Solve for parameter", command=self._solve_for_parameter)
+        self.target_button.grid(row=3, column=2, columnspan=2, padx=5, pady=2)
+        
+        # Create status bar
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.left_frame, textvariable=self.status_var, anchor='w').pack(fill=tk.X, padx=5, pady=5)
+        
+        # Phase timings of the last solve
+        self.profile_var = tk.StringVar(value="")
+        ttk.Label(self.left_frame, textvariable=self.profile_var, anchor='w', wraplength=350).pack(fill=tk.X, padx=5, pady=5)
+        
+        # Persistent cache of solver results
+        self.solve_cache = SolveCache()
+        self._update_cache_status()
+        
+        # Modes of the current result (a field_storage.StoredModes)
+        self.modes = None
+        self._field_dir = None
         self.current_waveguide = None
         self.current_mode_index = 0
-        self.current_colorbar = None  # Store reference to current colorbar
+        self.mode_browser = None
+        
+        # Redraw the preview and the cost estimate (debounced) whenever a parameter is edited
+        for var in (
+            self.core_width_var, self.core_thickness_var, self.sidewall_angle_var,
+            self.rib_width_var, self.rib_thickness_var, self.rib_angle_var, self.slab_thickness_var,
+            self.first_core_width_var, self.second_core_width_var, self.gap_var,
+            self.slot_thickness_var, self.slot_angle_var,
+            self.clad_thickness_var, self.box_thickness_var,
+            self.core_index_var, self.clad_index_var, self.box_index_var, self.wavelength_var,
+            self.grid_resolution_var, self.num_modes_var, self.auto_window_var, self.window_tolerance_var,
+        ):
+            var.trace_add('write', lambda *args: self._schedule_preview())
+        for entry in (self.target_neff_entry, self.edge_resolution_entry, self.bend_radius_entry):
+            entry.bind('<KeyRelease>', lambda e: self._schedule_preview())
         
         # Show initial waveguide type
         self._on_type_change()
+        self._wait_for_plot_modules()
         
     def _on_type_change(self):
         waveguide_type = self.waveguide_type_var.get()
@@ -212,88 +488,107 @@ class WaveguideGUI:
         # Update the plot
         self._update_plot()
     
+    def _get_spec(self):
+        """Collect the current parameter values into a WaveguideSpec."""
+        waveguide_type = self.waveguide_type_var.get()
+        
+        # Get parameters based on waveguide type
+        if waveguide_type == "Strip waveguide":
+            type_params = {
+                'waveguide_type': "strip",
+                'core_width': self.core_width_var.get(),
+                'core_thickness': self.core_thickness_var.get(),
+                'sidewall_angle': self.sidewall_angle_var.get(),
+            }
+        elif waveguide_type == "Rib waveguide":
+            type_params = {
+                'waveguide_type': "rib",
+                'core_width': self.rib_width_var.get(),
+                'core_thickness': self.rib_thickness_var.get(),
+                'sidewall_angle': self.rib_angle_var.get(),
+                'slab_thickness': self.slab_thickness_var.get(),
+            }
+        else:  # Slot waveguide
+            type_params = {
+                'waveguide_type': "slot",
+                'core_width': self.first_core_width_var.get(),
+                'second_core_width': self.second_core_width_var.get(),
+                'gap': self.gap_var.get(),
+                'core_thickness': self.slot_thickness_var.get(),
+                'sidewall_angle': self.slot_angle_var.get(),
+            }
+        
+        return WaveguideSpec(
+            core_index=self.core_index_var.get(),
+            clad_index=self.clad_index_var.get(),
+            box_index=self.box_index_var.get(),
+            clad_thickness=self.clad_thickness_var.get(),
+            box_thickness=self.box_thickness_var.get(),
+            wavelength=self.wavelength_var.get(),
+            grid_resolution=self.grid_resolution_var.get(),
+            edge_resolution=self._get_edge_resolution(),
+            num_modes=self.num_modes_var.get(),
+            # Get bend radius and target n_eff (None if empty or invalid)
+            bend_radius=self._get_bend_radius(),
+            target_neff=self._get_target_neff(),
+            use_pml=self.use_pml_var.get() == "True",
+            use_symmetry=self.use_symmetry_var.get() == "True",
+            **type_params
+        )
+    
+    def _wait_for_plot_modules(self):
+        """Create the plot once the background imports have finished."""
+        if self._loader.is_alive():
+            self.root.after(50, self._wait_for_plot_modules)
+            return
+        self._create_plot()
+        self._update_plot()
+        # Start the solver process now so the first solve does not wait for it
+        self.solve_worker.start()
+    
+    def _create_plot(self):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        from geometry_preview import GeometryPreview
+        
+        self.loading_label.destroy()
+        
+        # Create figure for plot
+        self.fig = Figure(figsize=(6, 4))
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.right_frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        # Cross-section preview, updated in place as parameters change
+        self.preview = GeometryPreview(self.ax)
+    
+    def _get_solve_spec(self):
+        """The current spec, with the EIM estimate as target n_eff if none is given.
+        
+        With "Auto window" the cladding, box and lateral margins are sized from
+        the evanescent decay, and the grid cells saved are reported.
+        """
+        spec = self._get_spec()
+        if spec.target_neff is None:
+            spec = spec.replace(target_neff=max(estimate_spec(spec)))
+        if self.auto_window_var.get():
+            windowed = auto_window(spec, self.window_tolerance_var.get())
+            # Counting the grid cells needs tidy3d
+            self._loader.join()
+            manual, auto = saved_cells(spec, windowed)
+            self.window_var.set("{} grid cells instead of {} ({:.0%} saved)".format(auto, manual, 1 - auto / manual))
+            spec = windowed
+        else:
+            self.window_var.set("")
+        return spec
+    
     def _create_waveguide(self):
+        # Never import tidy3d here while the loader thread is importing it
+        self._loader.join()
         try:
-            # Create materials
-            core = Medium(permittivity=self.core_index_var.get()**2)
-            clad = Medium(permittivity=self.clad_index_var.get()**2)
-            box = Medium(permittivity=self.box_index_var.get()**2)
-            
-            # Get common parameters
-            wavelength = self.wavelength_var.get()
-            grid_resolution = self.grid_resolution_var.get()
-            num_modes = self.num_modes_var.get()
-            
-            # Get bend radius (None if empty or invalid)
-            bend_radius = self._get_bend_radius()
-            
-            # Get target n_eff (None if empty or invalid)
-            target_neff = self._get_target_neff()
+            return build_waveguide(self._get_solve_spec())
             
-            # Get PML setting
-            use_pml = self.use_pml_var.get() == "True"
-            num_pml = (12, 12) if use_pml else (0, 0)
-            
-            # Create mode specification
-            mode_spec_params = {
-                'num_modes': num_modes,
-                'bend_radius': bend_radius,
-                'num_pml': num_pml,
-                'group_index_step': True,
-                'precision': 'double'
-            }
-            
-            # Add optional parameters
-            if target_neff is not None:
-                mode_spec_params['target_neff'] = target_neff
-            
-            if bend_radius is not None:
-                mode_spec_params['bend_axis'] = 1
-            
-            mode_spec = ModeSpec(**mode_spec_params)
-            
-            # Get parameters based on waveguide type
-            waveguide_type = self.waveguide_type_var.get()
-            
-            if waveguide_type == "Strip waveguide":
-                width = self.core_width_var.get()
-                thickness = self.core_thickness_var.get()
-                sidewall_angle_rad = math.radians(self.sidewall_angle_var.get())
-                slab_thickness = 0.0
-                gap = 0.0
-            elif waveguide_type == "Rib waveguide":
-                width = self.rib_width_var.get()
-                thickness = self.rib_thickness_var.get()
-                sidewall_angle_rad = math.radians(self.rib_angle_var.get())
-                slab_thickness = self.slab_thickness_var.get()
-                gap = 0.0
-            else:  # Slot waveguide
-                width = [self.first_core_width_var.get(), self.second_core_width_var.get()]
-                thickness = self.slot_thickness_var.get()
-                sidewall_angle_rad = math.radians(self.slot_angle_var.get())
-                slab_thickness = 0.0
-                gap = self.gap_var.get()
-            
-            # Create waveguide
-            waveguide = RectangularDielectric(
-                core_width=width,
-                core_thickness=thickness,
-                wavelength=wavelength,
-                core_medium=core,
-                clad_medium=clad,
-                box_medium=box,
-                clad_thickness=self.clad_thickness_var.get(),
-                box_thickness=self.box_thickness_var.get(),
-                slab_thickness=slab_thickness,
-                sidewall_angle=sidewall_angle_rad,
-                gap=gap,
-                mode_spec=mode_spec,
-                grid_resolution=grid_resolution,
-            )
-            
-            return waveguide
-            
-        except ValueError as e:
+        except (ValueError, tk.TclError) as e:
             messagebox.showerror("Input Error", "Please enter valid numbers for all fields.")
             return None
         except Exception as e:
@@ -301,145 +596,696 @@ class WaveguideGUI:
             return None
     
     def _update_plot(self):
-        waveguide = self._create_waveguide()
-        if waveguide is None:
+        """Redraw the cross-section preview now, reporting invalid input."""
+        self._cancel_preview()
+        try:
+            spec = self._get_spec()
+        except (ValueError, tk.TclError):
+            messagebox.showerror("Input Error", "Please enter valid numbers for all fields.")
+            return
+        self._update_estimate(spec)
+        if self.preview is None:
+            # Drawn as soon as the plot modules are loaded
             return
         
+        self.preview.invalidate()
         try:
-            # Clear the plot
-            self.ax.clear()
-            
-            # Plot the waveguide
-            waveguide.mode_solver.plot(ax=self.ax)
-            self.ax.set_title("Mode solver cross-section")
-            
-            # Update the canvas
-            self.canvas.draw()
-            
+            if self._update_preview(spec):
+                self.canvas.draw_idle()
         except Exception as e:
             messagebox.showerror("Plot Error", str(e))
     
-    def _create_mode_window(self, mode_index, mode_data):
-        """Create a window displaying mode properties and field plot."""
-        # Create new window for this mode
-        mode_window = tk.Toplevel(self.root)
-        mode_window.title("Mode {}".format(mode_index))
-        
-        # Create frame for mode properties
-        props_frame = ttk.Frame(mode_window)
-        props_frame.pack(pady=5, padx=10, fill=tk.X)
-        
-        # Get mode properties
-        n_eff = float(mode_data.n_eff.values[0][mode_index])
-        k_eff = float(mode_data.k_eff.values[0][mode_index])
-        n_group = float(mode_data.n_group.values[0][mode_index])
-        te_frac = float(mode_data.pol_fraction.te.values[0][mode_index])
-        tm_frac = float(mode_data.pol_fraction.tm.values[0][mode_index])
-        mode_area = float(mode_data.mode_area.values[0][mode_index])
-        
-        # Create labels for properties
-        props = [
-            ("n_eff", "{:.6f}".format(n_eff)),
-            ("k_eff", "{:.6f}".format(k_eff)),
-            ("Group Index", "{:.6f}".format(n_group)),
-            ("TE Fraction", "{:.1f}%".format(te_frac * 100)),
-            ("TM Fraction", "{:.1f}%".format(tm_frac * 100)),
-            ("Mode Area", "{:.2f} um²".format(mode_area))
-        ]
+    def _schedule_preview(self):
+        """Redraw the preview once edits have paused for PREVIEW_DELAY_MS."""
+        self._cancel_preview()
+        self._preview_id = self.root.after(PREVIEW_DELAY_MS, self._refresh_preview)
+    
+    def _cancel_preview(self):
+        if self._preview_id is not None:
+            self.root.after_cancel(self._preview_id)
+            self._preview_id = None
+    
+    def _refresh_preview(self):
+        """Live preview update; incomplete input is ignored while typing."""
+        self._preview_id = None
+        try:
+            spec = self._get_spec()
+        except Exception:
+            return
+        self._update_estimate(spec)
+        if self.preview is None:
+            return
+        try:
+            changed = self._update_preview(spec)
+        except Exception:
+            return
+        if changed:
+            self.canvas.draw_idle()
+    
+    def _update_estimate(self, spec):
+        """Show the effective index method estimate of the fundamental n_eff."""
+        try:
+            te, tm = estimate_spec(spec)
+        except Exception:
+            self.estimate_var.set("")
+            return
+        text = "EIM estimate: n_eff ~ {:.4f} (TE), {:.4f} (TM)".format(te, tm)
+        if spec.target_neff is None:
+            text += ", used as target n_eff"
+        self.estimate_var.set(text)
         
-        # Add properties to frame
-        for i, (label, value) in enumerate(props):
-            ttk.Label(props_frame, text=f"{label}:").grid(row=i, column=0, sticky='e', padx=5, pady=2)
-            ttk.Label(props_frame, text=value).grid(row=i, column=1, sticky='w', padx=5, pady=2)
-        
-        # Create figure and canvas for field plot
-        fig, ax = plt.subplots(figsize=(6, 4))
-        canvas = FigureCanvasTkAgg(fig, master=mode_window)
-        canvas.get_tk_widget().pack(pady=5)
-        
-        # Plot field for this mode
-        self.current_waveguide.plot_field(
-            field_name="E",
-            val="abs",
-            mode_index=mode_index,
-            ax=ax
-        )
-        ax.set_title("Mode profile")
-        canvas.draw()
+        answer = lookup(self.surrogate_tables, spec)
+        if answer is None:
+            self.table_var.set("")
+        else:
+            table, values, errors = answer
+            self.table_var.set("Table {}: n_eff {:.5f} +/- {:.1e}".format(
+                table.name, values["n_eff"][0], errors["n_eff"][0]))
+    
+    def _update_preview(self, spec):
+        """Show the cost of solving a spec and redraw the preview of its solved cross-section.
+        
+        The waveguide is built once for both; returns True if the preview changed.
+        """
+        try:
+            if self.auto_window_var.get():
+                spec = auto_window(spec, self.window_tolerance_var.get())
+            waveguide = build_waveguide(spec)
+        except Exception:
+            self.cost_var.set("")
+            raise
+        self._update_cost(waveguide)
+        return self.preview.update(spec, lambda spec: waveguide)
+    
+    def _update_cost(self, waveguide):
+        """Show the grid size and the estimated memory and time of a local solve."""
+        try:
+            estimate = estimate_cost(waveguide, self.cost_model, self.solve_limits)
+        except Exception:
+            self.cost_var.set("")
+            return
+        text = estimate.summary()
+        color = ""
+        if estimate.level == REFUSE:
+            text += " (too large)"
+            color = "red"
+        elif estimate.level == WARN:
+            text += " (large)"
+            color = "darkorange"
+        self.cost_var.set(text)
+        self.cost_label.configure(foreground=color)
+    
+    def _check_cost(self, waveguide, concurrent=1):
+        """Check a local solve against the memory and time limits; returns True if it may run.
+        
+        ``concurrent`` is the number of such solves running at once.
+        """
+        estimate = estimate_cost(waveguide, self.cost_model, self.solve_limits, concurrent)
+        if estimate.level == REFUSE:
+            messagebox.showerror(
+                "Solve Too Large",
+                "Not solving locally: {}.\n\n{}\n\nLower the grid resolution or the window size, "
+                "or solve on the server.".format("; ".join(estimate.reasons), estimate.summary()))
+            return False
+        if estimate.level == WARN:
+            return messagebox.askyesno(
+                "Large Solve", "This solve is large: {}.\n\n{}\n\nSolve anyway?".format(
+                    "; ".join(estimate.reasons), estimate.summary()))
+        return True
+    
+    def _answer_from_table(self):
+        """Report the current spec from a lookup table if it is accurate enough.
+        
+        Returns True if the table answer replaces a solve.
+        """
+        if not self.use_table_var.get() or not self.surrogate_tables:
+            return False
+        try:
+            spec = self._get_spec()
+        except (ValueError, tk.TclError):
+            return False
+        answer = lookup(self.surrogate_tables, spec)
+        if answer is None:
+            return False
+        table, values, errors = answer
+        if not errors["n_eff"].max() < TABLE_TOLERANCE:
+            return False
+        modes = ["mode {}: n_eff {:.5f}, n_group {:.4f}, area {:.3f} um²".format(
+            i, values["n_eff"][i], values["n_group"][i], values["mode_area"][i]) for i in range(spec.num_modes)]
+        self.status_var.set("From table {} (no solve run): {}".format(table.name, "; ".join(modes)))
+        return True
     
     def _solve_local_mode(self):
+        self._submit_solve(server=False)
+    
+    def _solve_server_mode(self):
+        self._submit_solve(server=True)
+    
+    def _submit_solve(self, server, waveguide=None, context=None):
+        """Queue a solve of the current parameters in the background worker.
+        
+        ``context`` is passed on to ``_show_result`` to pick the result display.
+        """
+        start = time.time()
         try:
+            # Plain solves of tabulated geometries need no solver
+            if waveguide is None and context is None and self._answer_from_table():
+                return
+            
             # Create the waveguide
-            self.current_waveguide = self._create_waveguide()
-            if self.current_waveguide is None:
+            if waveguide is None:
+                waveguide = self._create_waveguide()
+            if waveguide is None:
+                return
+            
+            # Answer repeated solves straight from the cache
+            use_symmetry = self.use_symmetry_var.get() == "True"
+            mode_data = load_cached(waveguide, self.solve_cache, server=server, use_symmetry=use_symmetry)
+            self._update_cache_status()
+            if mode_data is not None:
+                self._show_result(waveguide, mode_data, context)
+                self._show_phase_timings(start)
+                return
+            
+            # Check the size of local solves before they can exhaust the memory
+            if not server and not self._check_cost(waveguide):
                 return
-                
-            # Solve for modes
-            self.mode_data = self.current_waveguide.mode_solver.solve()
             
-            # Create a window for each mode
-            for mode_index in range(len(self.mode_data.n_eff.values[0])):
-                self._create_mode_window(mode_index, self.mode_data)
+            # Plain solves send their fields back through memory-mapped files,
+            # and the worker updates the cache itself
+            field_dir = self._new_field_dir() if context is None else None
+            cache_dir = self.solve_cache.cache_dir if context is None else None
+            job = self.solve_worker.submit(
+                waveguide, server=server, context=context, profile_path=self._new_profile_path(),
+                use_symmetry=use_symmetry, field_dir=field_dir, cache_dir=cache_dir)
+            self._solve_starts[job.job_id] = start
+            self._poll_solves()
             
         except Exception as e:
-            print("Error in local mode solve:", str(e))
+            print("Error in mode solve:", str(e))
             print("Full error:", traceback.format_exc())
             messagebox.showerror("Error", str(e))
     
-    def _solve_server_mode(self):
+    def _poll_solves(self):
+        """Handle finished background solves and update the progress panel."""
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        
+        for kind, job in self.solve_worker.poll():
+            if kind in (DONE, ERROR):
+                # Merge the worker's phase timings with the time spent queued
+                PROFILER.add(job.spans)
+                if job.started is not None:
+                    PROFILER.record("queue", job.submitted, job.started)
+                if job.profile_path is not None and os.path.exists(job.profile_path):
+                    self.last_profile_path = job.profile_path
+            if kind == DONE:
+                try:
+                    if job.field_dir is None:
+                        store_result(job.waveguide, job.result, cache=self.solve_cache, server=job.server,
+                                     use_symmetry=job.use_symmetry)
+                    self._update_cache_status()
+                    self._show_result(job.waveguide, job.result, job.context)
+                    self._show_phase_timings(self._solve_starts.pop(job.job_id, job.submitted))
+                except Exception as e:
+                    print("Error showing mode solve result:", str(e))
+                    print("Full error:", traceback.format_exc())
+                    messagebox.showerror("Error", str(e))
+            elif kind == ERROR:
+                self._solve_starts.pop(job.job_id, None)
+                self._drop_jobs([job])
+                location = "server" if job.server else "local"
+                print("Error during {} mode solve:".format(location), job.result)
+                messagebox.showerror("Solve Error", "Error during {} mode solve: {}".format(
+                    location, job.result.splitlines()[0]))
+        
+        running = self.solve_worker.running
+        num_queued = len(self.solve_worker.queued)
+        if running is None:
+            self.progress_bar.stop()
+            self._progress_running = False
+            self.progress_var.set("Idle")
+            self.cancel_button.state(['disabled'])
+            return
+        
+        # Keep polling while there is work left
+        if running.started is None:
+            text = "Starting solver..."
+        else:
+            text = "Solving {}... {:.1f} s".format("on server" if running.server else "locally", running.elapsed)
+        if num_queued:
+            text += " ({} queued)".format(num_queued)
+        if not self._progress_running:
+            self.progress_bar.start(10)
+        self._progress_running = True
+        self.progress_var.set(text)
+        self.cancel_button.state(['!disabled'])
+        self._poll_id = self.root.after(100, self._poll_solves)
+    
+    def _new_profile_path(self):
+        """File for the cProfile dump of a new solve, or None if profiling is off."""
+        if not self.cprofile_var.get():
+            return None
+        if self._profile_dir is None:
+            self._profile_dir = tempfile.mkdtemp(prefix="mode-explorer-profiles-")
+        return os.path.join(self._profile_dir, "solve_{}.prof".format(int(time.time() * 1000)))
+    
+    def _show_phase_timings(self, start):
+        """Show the timed phases of the solve started at ``start`` in the status area."""
+        spans = PROFILER.since(start)
+        details = []
+        for s in spans:
+            if s.name == "grid":
+                details.append("grid {}".format("x".join(str(n) for n in s.args["grid"])))
+            elif s.name == "eigensolve":
+                details.append("{} modes".format(s.args["num_modes"]))
+        text = summarize(spans)
+        if details:
+            text = "Last solve ({}): {}".format(", ".join(details), text)
+        else:
+            text = "Last solve: {}".format(text)
+        self.profile_var.set(text)
+    
+    def _export_trace(self):
+        """Save all recorded phase timings as a Chrome trace JSON file."""
+        path = filedialog.asksaveasfilename(
+            title="Export trace", defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if not path:
+            return
         try:
-            # Create the waveguide
-            self.current_waveguide = self._create_waveguide()
-            if self.current_waveguide is None:
-                return
-                
-            # Create progress window
-            progress_window = tk.Toplevel(self.root)
-            progress_window.title("Server Mode Solve")
-            progress_window.geometry("300x80")
-            progress_window.transient(self.root)
-            progress_window.grab_set()  # Make the window modal
-            
-            # Center the progress window
-            window_width = 300
-            window_height = 80
-            screen_width = self.root.winfo_screenwidth()
-            screen_height = self.root.winfo_screenheight()
-            x = (screen_width - window_width) // 2
-            y = (screen_height - window_height) // 2
-            progress_window.geometry(f"{window_width}x{window_height}+{x}+{y}")
-            
-            # Add message
-            message = tk.Label(progress_window, text="Solving modes on server...\nThis may take a few moments.")
-            message.pack(expand=True)
-            
-            # Solve for modes using server
+            PROFILER.write_chrome_trace(path)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+    
+    def _export_profile(self):
+        """Save the cProfile dump of the last profiled solve."""
+        if self.last_profile_path is None:
+            messagebox.showinfo("Export profile", "Check 'cProfile solves' and run a solve first.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Export profile", defaultextension=".prof", filetypes=[("cProfile stats", "*.prof")])
+        if not path:
+            return
+        try:
+            shutil.copyfile(self.last_profile_path, path)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+    
+    def _cancel_solve(self):
+        """Cancel the running solve; queued solves continue."""
+        job = self.solve_worker.cancel()
+        if job is not None:
+            self._drop_jobs([job])
+        self._poll_solves()
+    
+    def _cancel_all_solves(self):
+        """Cancel the running solve and drop all queued solves."""
+        self._drop_jobs(self.solve_worker.cancel_all())
+        self._poll_solves()
+    
+    def _drop_jobs(self, jobs):
+        """Clean up after solves that failed or were cancelled."""
+        for job in jobs:
+            self._solve_starts.pop(job.job_id, None)
+            # A convergence study stops at its failed or cancelled step
+            if isinstance(job.context, ConvergenceContext):
+                self.convergence_button.state(['!disabled'])
+            elif isinstance(job.context, TargetContext):
+                self.target_button.state(['!disabled'])
+    
+    def _show_result(self, waveguide, mode_data, context=None):
+        """Display a finished solve according to the context it was submitted with."""
+        if isinstance(context, DispersionContext):
+            self._create_dispersion_window(DispersionResult(context.wavelengths, mode_data))
+        elif isinstance(context, ConvergenceContext):
+            context.study.add(mode_data.n_eff.values[0])
+            self._continue_convergence(context.study)
+        elif isinstance(context, TargetContext):
+            context.search.add(mode_properties(mode_data))
+            self._continue_target_search(context.search)
+        elif isinstance(context, MeshComparisonContext):
+            context.results[context.mesh] = (int(np.prod(grid_shape(waveguide))), mode_data.n_eff.values[0])
+            if len(context.results) == 2:
+                (uniform_cells, uniform_neff), (refined_cells, refined_neff) = (
+                    context.results["uniform"], context.results["refined"])
+                comparison = MeshComparison(context.spec, uniform_cells, refined_cells, uniform_neff, refined_neff)
+                messagebox.showinfo("Mesh Comparison", comparison.summary())
+        else:
+            self._show_modes(waveguide, mode_data)
+    
+    def _solve_dispersion(self):
+        """Queue a local solve over the dispersion wavelength range."""
+        try:
+            wavelengths = np.linspace(
+                self.dispersion_start_var.get(),
+                self.dispersion_stop_var.get(),
+                self.dispersion_points_var.get()
+            )
+            self._loader.join()
+            waveguide = dispersion_waveguide(self._get_solve_spec(), wavelengths)
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror("Input Error", "Please enter a valid wavelength range: {}".format(e))
+            return
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self._submit_solve(server=False, waveguide=waveguide, context=DispersionContext(wavelengths))
+    
+    def _create_dispersion_window(self, result):
+        """Create a window plotting n_eff, group index and GVD against wavelength."""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        
+        dispersion_window = tk.Toplevel(self.root)
+        dispersion_window.title("Dispersion")
+        
+        fig = Figure(figsize=(9, 3.5))
+        plots = [
+            ("n_eff", result.n_eff),
+            ("Group Index", result.n_group),
+            ("GVD (ps/nm/km)", result.gvd),
+        ]
+        for i, (label, data) in enumerate(plots):
+            ax = fig.add_subplot(1, 3, i + 1)
+            for mode_index in range(result.num_modes):
+                ax.plot(result.wavelengths, data[:, mode_index], 'o-', label="Mode {}".format(mode_index))
+            ax.set_xlabel("Wavelength (um)")
+            ax.set_ylabel(label)
+        fig.axes[0].legend()
+        fig.tight_layout()
+        
+        canvas = FigureCanvasTkAgg(fig, master=dispersion_window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        canvas.draw()
+    
+    def _converge_grid(self):
+        """Start a grid-convergence study of the current parameters."""
+        try:
+            study = GridConvergence(self._get_solve_spec(), tolerance=self.convergence_tolerance_var.get())
+        except (ValueError, tk.TclError):
+            messagebox.showerror("Input Error", "Please enter valid numbers for all fields.")
+            return
+        self.convergence_button.state(['disabled'])
+        self._continue_convergence(study)
+    
+    def _compare_meshes(self):
+        """Solve the current parameters with the refined mesh and a uniform mesh at the edge resolution."""
+        try:
+            spec = self._get_solve_spec()
+            uniform = uniform_spec(spec)
+            self._loader.join()
+            waveguides = {"uniform": build_waveguide(uniform), "refined": build_waveguide(spec)}
+        except ValueError:
+            messagebox.showerror("Input Error", "Enter an edge resolution to compare meshes.")
+            return
+        except tk.TclError:
+            messagebox.showerror("Input Error", "Please enter valid numbers for all fields.")
+            return
+        results = {}
+        for mesh, waveguide in waveguides.items():
+            self._submit_solve(server=False, waveguide=waveguide, context=MeshComparisonContext(spec, mesh, results))
+    
+    def _continue_convergence(self, study):
+        """Queue the next resolution of a convergence study, or show its result."""
+        spec = study.next_spec()
+        if spec is None:
+            self.convergence_button.state(['!disabled'])
+            self._create_convergence_window(study.result())
+            return
+        if study.n_eff:
+            self.status_var.set("Grid convergence: n_eff {:.6f} at resolution {}, solving {}".format(
+                study.n_eff[-1][0], study.resolutions[-1], spec.grid_resolution))
+        self._loader.join()
+        try:
+            waveguide = build_waveguide(spec)
+        except Exception as e:
+            self.convergence_button.state(['!disabled'])
+            messagebox.showerror("Error", str(e))
+            return
+        self._submit_solve(server=False, waveguide=waveguide, context=ConvergenceContext(study))
+    
+    def _create_convergence_window(self, result):
+        """Create a window with n_eff against grid resolution and the extrapolated value."""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        
+        convergence_window = tk.Toplevel(self.root)
+        convergence_window.title("Grid Convergence")
+        
+        fig = Figure(figsize=(6, 4))
+        ax = fig.add_subplot(111)
+        for mode_index in range(result.num_modes):
+            line, = ax.plot(result.resolutions, result.n_eff[:, mode_index], 'o-', label="Mode {}".format(mode_index))
+            ax.axhline(result.extrapolated[mode_index], color=line.get_color(), linestyle='--')
+        ax.set_xlabel("Grid resolution")
+        ax.set_ylabel("n_eff")
+        ax.legend()
+        fig.tight_layout()
+        
+        canvas = FigureCanvasTkAgg(fig, master=convergence_window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        canvas.draw()
+        
+        if result.converged:
+            text = "Converged to {:g} at resolution {}.".format(result.tolerance, result.resolutions[-1])
+        else:
+            text = "Not converged to {:g} by resolution {}.".format(result.tolerance, result.resolutions[-1])
+        text += " Extrapolated n_eff: {:.6f} (order {:.2f}).".format(result.extrapolated[0], result.order)
+        if result.recommended_resolution is not None:
+            text += " Cheapest resolution within tolerance: {}.".format(result.recommended_resolution)
+        ttk.Label(convergence_window, text=text, wraplength=450).pack(fill=tk.X, padx=10, pady=5)
+        
+        if result.recommended_resolution is not None:
+            ttk.Button(
+                convergence_window,
+                text="Use resolution {}".format(result.recommended_resolution),
+                command=lambda: self.grid_resolution_var.set(result.recommended_resolution)
+            ).pack(pady=5)
+    
+    def _solve_for_parameter(self):
+        """Start a search for the parameter value that gives the target mode property."""
+        try:
+            target = self.target_value_var.get().strip()
+            mode = self.target_mode_var.get().strip()
+            spec = self._get_solve_spec()
+            # The estimate of the current geometry is a poor seed at the bounds
+            spec = spec.replace(target_neff=self._get_target_neff())
+            search = ParameterSearch(
+                spec, self.target_param_var.get(), (self.target_lower_var.get(), self.target_upper_var.get()),
+                target=float(target) if target else None, quantity=self.target_quantity_var.get(),
+                mode_index=int(mode) if mode else None)
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror("Input Error", "Please enter a valid search: {}".format(e))
+            return
+        self.target_button.state(['disabled'])
+        self._continue_target_search(search)
+    
+    def _continue_target_search(self, search):
+        """Queue the next solve of a solve-for-parameter search, or show its result."""
+        spec = search.next_spec()
+        if spec is None:
+            self.target_button.state(['!disabled'])
+            self._create_target_window(search.result())
+            return
+        if search.values:
+            self.status_var.set("Solve for {}: {} {:.6f} at {:.4f}, solving {:.4f} ({} solves)".format(
+                search.parameter, search.quantity, search.quantities[-1], search.values[-1],
+                getattr(spec, search.parameter), len(search.values)))
+        self._loader.join()
+        try:
+            waveguide = build_waveguide(spec)
+        except Exception as e:
+            self.target_button.state(['!disabled'])
+            messagebox.showerror("Error", str(e))
+            return
+        self._submit_solve(server=False, waveguide=waveguide, context=TargetContext(search))
+    
+    def _parameter_var(self, parameter):
+        """The entry variable of a geometry parameter for the current waveguide type."""
+        waveguide_type = self.waveguide_type_var.get()
+        if waveguide_type == "Strip waveguide":
+            variables = {'core_width': self.core_width_var, 'core_thickness': self.core_thickness_var}
+        elif waveguide_type == "Rib waveguide":
+            variables = {'core_width': self.rib_width_var, 'core_thickness': self.rib_thickness_var}
+        else:  # Slot waveguide
+            variables = {'core_width': self.first_core_width_var, 'core_thickness': self.slot_thickness_var}
+        return variables[parameter]
+    
+    def _create_target_window(self, result):
+        """Create a window with the solved parameter values and the value found."""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        
+        target_window = tk.Toplevel(self.root)
+        target_window.title("Solve for {}".format(result.parameter))
+        
+        fig = Figure(figsize=(6, 4))
+        ax = fig.add_subplot(111)
+        order = np.argsort(result.values)
+        ax.plot(result.values[order], result.quantities[order], '-', color='lightgray')
+        ax.plot(result.values, result.quantities, 'o')
+        for step, (value, quantity) in enumerate(zip(result.values, result.quantities)):
+            ax.annotate(str(step + 1), (value, quantity), textcoords="offset points", xytext=(4, 4))
+        ax.axhline(result.target, color='k', linestyle='--')
+        ax.set_xlabel("{} (um)".format(result.parameter))
+        ax.set_ylabel("n_eff of mode {}".format(result.mode_index) if result.quantity == "cutoff" else
+                      "{} of mode {}".format(result.quantity, result.mode_index))
+        fig.tight_layout()
+        
+        canvas = FigureCanvasTkAgg(fig, master=target_window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        canvas.draw()
+        
+        ttk.Label(target_window, text=result.summary(), wraplength=450).pack(fill=tk.X, padx=10, pady=5)
+        if result.error is None:
+            ttk.Button(
+                target_window,
+                text="Use {} {:.4f}".format(result.parameter, result.value),
+                command=lambda: self._parameter_var(result.parameter).set(round(result.value, 4))
+            ).pack(pady=5)
+    
+    def _new_field_dir(self):
+        """A new directory for the field files of one result, deleted at exit at the latest."""
+        if self._field_dir is None:
+            self._field_dir = tempfile.mkdtemp(prefix="mode-explorer-fields-")
+            atexit.register(shutil.rmtree, self._field_dir, True)
+        return tempfile.mkdtemp(dir=self._field_dir)
+    
+    def _show_modes(self, waveguide, mode_data):
+        """Make a solve result current and show it in the mode browser."""
+        from mode_browser import ModeBrowser
+        
+        self.current_waveguide = waveguide
+        
+        # Keep the fields at the selected retention; the full-precision
+        # fields of the previous result are deleted
+        retention = self.retention_var.get()
+        if self.modes is not None:
+            self.modes.close()
+        if isinstance(mode_data, ModeFiles):
+            # Fields written by the worker process
+            self.modes = open_modes(mode_data, retention=retention)
+        else:
+            directory = None if retention == "full" else self._new_field_dir()
+            self.modes = store_modes(mode_data, retention=retention, directory=directory)
+            if retention != "full":
+                # Drop the full-precision ModeSolverData kept with the waveguide
+                waveguide.release_data()
+        
+        # Reuse the open mode browser, or create a new one
+        if self.mode_browser is None or not self.mode_browser.exists():
+            self.mode_browser = ModeBrowser(self.root)
+        self.mode_browser.set_result(waveguide, self.modes)
+    
+    def _run_sweep(self):
+        """Start a 1-D sweep of the selected parameter around the current parameters."""
+        if self.sweep_future is not None:
+            return
+        try:
+            base_spec = self._get_solve_spec()
+            values = np.linspace(self.sweep_start_var.get(), self.sweep_stop_var.get(), self.sweep_points_var.get())
+        except (ValueError, tk.TclError):
+            messagebox.showerror("Input Error", "Please enter valid numbers for all fields.")
+            return
+        
+        axes = {self.sweep_param_var.get(): values}
+        server = self.sweep_server_var.get()
+        if not server:
+            # Every sweep worker (one per core, as in run_sweep) solves a point at once
+            workers = min(os.cpu_count() or 1, len(values))
+            self._loader.join()
             try:
-                # Update the GUI
-                progress_window.update()
-                
-                # Run the solver
-                self.mode_data = run_mode_solver(self.current_waveguide.mode_solver)
-                
-                # Close progress window
-                progress_window.destroy()
-                
-                # Create a window for each mode
-                for mode_index in range(len(self.mode_data.n_eff.values[0])):
-                    self._create_mode_window(mode_index, self.mode_data)
-                
-            except Exception as server_error:
-                # Close progress window if there's an error
-                progress_window.destroy()
-                print("Error during server mode solve:", str(server_error))
-                print("Full server error:", traceback.format_exc())
-                messagebox.showerror("Server Error", "Error during server mode solve: {}".format(str(server_error)))
+                waveguide = build_waveguide(base_spec)
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
                 return
-            
+            if not self._check_cost(waveguide, workers):
+                return
+        self.sweep_done_points = 0
+        self.sweep_future = self.sweep_executor.submit(
+            run_sweep, base_spec, axes,
+            cache_dir=self.solve_cache.cache_dir,
+            on_point=self._on_sweep_point,
+            warm_start=self.sweep_warm_start_var.get() and not server,
+            server=server,
+            track_modes=self.sweep_track_var.get()
+        )
+        self.sweep_button.state(['disabled'])
+        self._poll_sweep()
+    
+    def _on_sweep_point(self, index, props):
+        """Count finished sweep points (called from the sweep thread)."""
+        self.sweep_done_points += 1
+    
+    def _poll_sweep(self):
+        """Update the sweep progress and show the results when the sweep finishes."""
+        future = self.sweep_future
+        if not future.done():
+            self.status_var.set("Sweep: {} points done".format(self.sweep_done_points))
+            self.root.after(200, self._poll_sweep)
+            return
+        
+        self.sweep_future = None
+        self.sweep_button.state(['!disabled'])
+        self._update_cache_status()
+        try:
+            result = future.result()
         except Exception as e:
-            print("Error in server mode solve:", str(e))
-            print("Full error:", traceback.format_exc())
-            messagebox.showerror("Error", str(e))
+            self.status_var.set("Sweep failed: {}".format(e))
+            messagebox.showerror("Sweep Error", str(e))
+            return
+        if result.errors:
+            messagebox.showwarning(
+                "Sweep Warning",
+                "{} of {} sweep points failed, e.g.: {}".format(
+                    len(result.errors), result.n_eff[..., 0].size, next(iter(result.errors.values())))
+            )
+        if np.isnan(result.solve_time).all():
+            # Server sweeps do not time the individual points
+            self.status_var.set("Sweep: {} points solved".format(result.n_eff[..., 0].size - len(result.errors)))
+        else:
+            self.status_var.set("Sweep: {:.2f} s per point on average".format(np.nanmean(result.solve_time)))
+        if result.mode_order is not None:
+            reordered = int(np.any(result.mode_order != np.arange(result.num_modes), axis=-1).sum())
+            self.status_var.set(self.status_var.get() + "; modes reordered at {} points".format(reordered))
+        self._create_sweep_window(result)
+    
+    def _create_sweep_window(self, result):
+        """Create a window plotting the mode properties of a 1-D sweep."""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        
+        sweep_window = tk.Toplevel(self.root)
+        name, values = next(iter(result.axes.items()))
+        sweep_window.title("Sweep of {}".format(name))
+        
+        fig = Figure(figsize=(8, 6))
+        plots = [
+            ("n_eff", result.n_eff),
+            ("Group Index", result.n_group),
+            ("TE Fraction", result.te_fraction),
+            ("Mode Area (um²)", result.mode_area),
+        ]
+        for i, (label, data) in enumerate(plots):
+            ax = fig.add_subplot(2, 2, i + 1)
+            for mode_index in range(result.num_modes):
+                ax.plot(values, data[:, mode_index], 'o-', label="Mode {}{}".format(
+                    mode_index, " (tracked)" if result.mode_order is not None else ""))
+            ax.set_xlabel(name)
+            ax.set_ylabel(label)
+        fig.axes[0].legend()
+        fig.tight_layout()
+        
+        canvas = FigureCanvasTkAgg(fig, master=sweep_window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        canvas.draw()
+    
+    def _update_cache_status(self):
+        """Show the solver cache counters in the status bar."""
+        stats = self.solve_cache.stats()
+        self.status_var.set("Cache: {} hits, {} misses, {} entries ({:.1f} MB)".format(
+            stats["hits"], stats["misses"], stats["entries"], stats["bytes"] / 1024**2))
     
     def _reset_values(self):
         # Reset to default values
@@ -498,6 +1344,16 @@ class WaveguideGUI:
         except ValueError:
             return None
             
+    def _get_edge_resolution(self):
+        """Get edge resolution value, returns None if empty or invalid."""
+        value = self.edge_resolution_entry.get().strip()
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    
     def _get_target_neff(self):
         """Get target n_eff value, returns None if empty or invalid."""
         value = self.target_neff_entry.get().strip()
@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+"""Headless waveguide construction and mode solving.
+
+This module holds everything needed to build a :class:`Waveguide` (a
+``RectangularDielectric`` and its mode solver) and solve it without a Tk root, so it can be used from scripts and batch jobs as
+well as from :class:`waveguide_gui.WaveguideGUI`.
+
+Batch usage::
+
+    python -m waveguide_solver specs.json -o results.csv [--server]
+
+The input file is either a JSON list of objects or a CSV file whose header
+names :class:`WaveguideSpec` fields.  The output format follows the output
+file extension (``.json`` or ``.csv``).
+
+tidy3d is only imported when a waveguide is first built, so importing this
+module (and the GUI) is fast; :func:`load_solver_modules` imports it ahead
+of time, e.g. from a background thread.
+"""
+import argparse
+import csv
+import dataclasses
+import functools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Optional
+
+from mesh_refinement import grid_shape, refined_grid_spec
+from profiling import PROFILER, cprofile, span
+from solver_cache import SolveCache, cache_key
+from symmetry import merge_mode_data, mirrored_grid_spec, symmetry_classes
+
+# Waveguide type keys and the labels used for them in the GUI
+WAVEGUIDE_TYPES = {
+    "strip": "Strip waveguide",
+    "rib": "Rib waveguide",
+    "slot": "Slot waveguide",
+}
+
+# Names of the per-mode properties reported by ``mode_properties``
+MODE_PROPERTIES = ("n_eff", "k_eff", "n_group", "te_fraction", "tm_fraction", "mode_area")
+
+
+@dataclass(frozen=True)
+class WaveguideSpec:
+    """Every input needed to build and solve one waveguide cross-section.
+
+    Lengths are in um and ``sidewall_angle`` is in degrees.  ``slab_thickness``
+    is only used by rib waveguides; ``second_core_width`` and ``gap`` are only
+    used by slot waveguides, where ``core_width`` is the first core width.
+    ``edge_resolution`` refines the grid around the core edges, rib slab and
+    slot gap, with ``grid_resolution`` as the background (see
+    :mod:`mesh_refinement`).  ``side_margin`` is the domain size beside the
+    cores (tidy3d's default if None); see :func:`window.auto_window` for
+    sizing the window automatically.
+    With ``use_symmetry`` the mirror symmetries of the cross-section are
+    detected and every symmetry class is solved on the reduced domain (see
+    :mod:`symmetry`).
+    """
+    waveguide_type: str = "strip"
+    core_width: float = 0.5
+    core_thickness: float = 0.22
+    sidewall_angle: float = 10.0
+    slab_thickness: float = 0.1
+    second_core_width: float = 0.5
+    gap: float = 0.1
+    core_index: float = 3.47
+    clad_index: float = 1.0
+    box_index: float = 1.44
+    clad_thickness: float = 2.0
+    box_thickness: float = 2.0
+    side_margin: Optional[float] = None
+    wavelength: float = 1.55
+    grid_resolution: float = 25
+    edge_resolution: Optional[float] = None
+    num_modes: int = 1
+    target_neff: Optional[float] = None
+    bend_radius: Optional[float] = None
+    use_pml: bool = False
+    use_symmetry: bool = False
+
+    def __post_init__(self):
+        if self.waveguide_type not in WAVEGUIDE_TYPES:
+            raise ValueError("Unknown waveguide type '{}', expected one of {}.".format(
+                self.waveguide_type, ", ".join(WAVEGUIDE_TYPES)))
+
+    def replace(self, **changes):
+        """Return a copy of this spec with the given fields changed."""
+        return dataclasses.replace(self, **changes)
+
+    def to_dict(self):
+        """Return the spec as a plain dictionary."""
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, values):
+        """Create a spec from a dictionary, converting string values as needed.
+
+        Unknown keys raise ``ValueError``; missing keys take their defaults.
+        Empty strings are treated as missing, so CSV rows may leave optional
+        columns blank.
+        """
+        fields = {field.name: field for field in dataclasses.fields(cls)}
+        unknown = set(values) - set(fields)
+        if unknown:
+            raise ValueError("Unknown waveguide spec fields: {}".format(", ".join(sorted(unknown))))
+
+        kwargs = {}
+        for name, value in values.items():
+            if isinstance(value, str):
+                value = value.strip()
+                if value == "":
+                    continue
+            kwargs[name] = _convert_field(name, fields[name].type, value)
+        return cls(**kwargs)
+
+
+def _convert_field(name, field_type, value):
+    """Convert a raw value (possibly a string) to the type of a spec field."""
+    if value is None:
+        return None
+    if name == "waveguide_type":
+        return str(value)
+    if field_type in (bool, "bool"):
+        if isinstance(value, str):
+            return value.lower() in ("1", "true", "yes", "on")
+        return bool(value)
+    if field_type in (int, "int"):
+        return int(float(value))
+    return float(value)
+
+
+def load_solver_modules():
+    """Import the tidy3d modules used to build and solve waveguides."""
+    import tidy3d
+    import tidy3d.plugins.waveguide
+
+
+def build_mode_spec(spec):
+    """Create the ``ModeSpec`` for a waveguide spec."""
+    from tidy3d import ModeSpec
+
+    num_pml = (12, 12) if spec.use_pml else (0, 0)
+
+    mode_spec_params = {
+        'num_modes': spec.num_modes,
+        'bend_radius': spec.bend_radius,
+        'num_pml': num_pml,
+        'group_index_step': True,
+        'precision': 'double'
+    }
+
+    # Add optional parameters
+    if spec.target_neff is not None:
+        mode_spec_params['target_neff'] = spec.target_neff
+
+    if spec.bend_radius is not None:
+        mode_spec_params['bend_axis'] = 1
+
+    return ModeSpec(**mode_spec_params)
+
+
+class Waveguide:
+    """A built waveguide: the tidy3d structure and the grid and mode solver for it.
+
+    ``structure`` is the ``RectangularDielectric`` and ``grid_spec`` the grid
+    of the mode solver (the structure's own grid, or a locally refined one).
+    ``mode_solver`` is built from both on first use.  ``data`` is the last
+    ``ModeSolverData`` solved, loaded or received for the waveguide (None
+    before).  Other attributes (``wavelength``, ``mode_spec``,
+    ``plot_geometry_edges``, ...) are those of the structure.
+    """
+
+    def __init__(self, structure, grid_spec=None):
+        self.structure = structure
+        self.grid_spec = structure.grid_spec if grid_spec is None else grid_spec
+        self.data = None
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set on the waveguide itself
+        if name.startswith("__") or "structure" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.structure, name)
+
+    @functools.cached_property
+    def mode_solver(self):
+        mode_solver = self.structure.mode_solver
+        if self.grid_spec != self.structure.grid_spec:
+            mode_solver = mode_solver.updated_copy(
+                simulation=mode_solver.simulation.updated_copy(grid_spec=self.grid_spec))
+        return mode_solver
+
+    def release_data(self):
+        """Drop the mode data, including the copy a local solve keeps in the mode solver."""
+        self.data = None
+        self.__dict__.pop("mode_solver", None)
+
+
+def build_waveguide(spec, wavelength=None):
+    """Create the :class:`Waveguide` described by a waveguide spec.
+
+    ``wavelength`` replaces the spec's wavelength, e.g. with several
+    wavelengths for a dispersion solve.
+    """
+    from tidy3d import Medium
+    from tidy3d.plugins.waveguide import RectangularDielectric
+
+    with span("build.materials"):
+        # Create materials
+        core = Medium(permittivity=spec.core_index**2)
+        clad = Medium(permittivity=spec.clad_index**2)
+        box = Medium(permittivity=spec.box_index**2)
+        mode_spec = build_mode_spec(spec)
+
+    # Get parameters based on waveguide type
+    if spec.waveguide_type == "strip":
+        width = spec.core_width
+        slab_thickness = 0.0
+        gap = 0.0
+    elif spec.waveguide_type == "rib":
+        width = spec.core_width
+        slab_thickness = spec.slab_thickness
+        gap = 0.0
+    else:  # Slot waveguide
+        width = [spec.core_width, spec.second_core_width]
+        slab_thickness = 0.0
+        gap = spec.gap
+
+    with span("build.waveguide", waveguide_type=spec.waveguide_type):
+        structure = RectangularDielectric(
+            core_width=width,
+            core_thickness=spec.core_thickness,
+            wavelength=spec.wavelength if wavelength is None else wavelength,
+            core_medium=core,
+            clad_medium=clad,
+            box_medium=box,
+            clad_thickness=spec.clad_thickness,
+            box_thickness=spec.box_thickness,
+            side_margin=spec.side_margin,
+            slab_thickness=slab_thickness,
+            sidewall_angle=math.radians(spec.sidewall_angle),
+            gap=gap,
+            mode_spec=mode_spec,
+            grid_resolution=spec.grid_resolution,
+        )
+    with span("build.grid"):
+        grid_spec = None
+        if spec.edge_resolution is not None:
+            grid_spec = refined_grid_spec(structure, spec.edge_resolution)
+        # Full and symmetry-reduced solves share one mirror-symmetric grid
+        grid_spec = mirrored_grid_spec(structure, grid_spec)
+    return Waveguide(structure, grid_spec)
+
+
+def load_cached(waveguide, cache, server=False, use_symmetry=False):
+    """Return cached data for a waveguide, or None if it has not been solved yet."""
+    mode_data = cache.get(cache_key(waveguide.mode_solver, server=server, symmetry=use_symmetry))
+    if mode_data is not None:
+        waveguide.data = mode_data
+    return mode_data
+
+
+def store_result(waveguide, mode_data, cache=None, server=False, use_symmetry=False):
+    """Attach data solved elsewhere to a waveguide and store it in the cache."""
+    waveguide.data = mode_data
+    if cache is not None:
+        cache.put(cache_key(waveguide.mode_solver, server=server, symmetry=use_symmetry), mode_data)
+
+
+def solve_waveguide(waveguide, server=False, cache=None, use_symmetry=False):
+    """Solve the modes of an already built waveguide.
+
+    Local solves run ``mode_solver.solve()`` in this process; server solves
+    submit the mode solver to the Flexcompute server and wait for the result.
+    With ``use_symmetry`` every symmetry class of the cross-section is solved
+    on the reduced domain and the modes are merged.  If a
+    :class:`solver_cache.SolveCache` is given, it is checked first and
+    updated after a fresh solve.
+    """
+    if cache is not None:
+        with span("cache.load"):
+            mode_data = load_cached(waveguide, cache, server=server, use_symmetry=use_symmetry)
+        if mode_data is not None:
+            return mode_data
+
+    # Set up one solver per symmetry class, all on the waveguide's grid
+    classes = symmetry_classes(waveguide) if use_symmetry else [(0, 0, 0)]
+    mode_solvers = []
+    with span("grid") as args:
+        for symmetry in classes:
+            mode_solver = waveguide.mode_solver
+            if any(symmetry):
+                mode_solver = mode_solver.updated_copy(
+                    simulation=mode_solver.simulation.updated_copy(symmetry=symmetry))
+            mode_solvers.append(mode_solver)
+        args["grid"] = grid_shape(waveguide)
+        args["classes"] = len(classes)
+    num_modes = waveguide.mode_solver.mode_spec.num_modes
+
+    mode_datas = []
+    for symmetry, mode_solver in zip(classes, mode_solvers):
+        if server:
+            mode_datas.append(run_on_server(mode_solver))
+        else:
+            with span("eigensolve", grid=args["grid"], num_modes=num_modes, symmetry=symmetry):
+                mode_datas.append(mode_solver.solve())
+    if len(mode_datas) > 1:
+        with span("symmetry.merge"):
+            mode_data = merge_mode_data(mode_datas, num_modes)
+    else:
+        mode_data = mode_datas[0]
+
+    waveguide.data = mode_data
+    if cache is not None:
+        with span("cache.store"):
+            cache.put(cache_key(waveguide.mode_solver, server=server, symmetry=use_symmetry), mode_data)
+    return mode_data
+
+
+def run_on_server(mode_solver, poll_interval=0.5, create_task=None):
+    """Run a mode solver on the Flexcompute server and return its data.
+
+    Unlike ``tidy3d.plugins.mode.web.run``, the upload, every server status
+    (queued, running, ...) and the download are recorded as separate spans.
+    ``create_task`` creates the server task (``ModeSolverTask.create`` by
+    default; see :class:`server_pool.LocalServer` for a local stand-in).
+    """
+    if create_task is None:
+        from tidy3d.web.api.mode import ModeSolverTask
+        create_task = ModeSolverTask.create
+
+    with span("server.upload"):
+        task = create_task(mode_solver)
+        task.upload(verbose=False)
+        task.submit()
+
+    # Time every status the task goes through until it finishes
+    status = task.status
+    while status not in ("success", "error", "diverged", "deleted"):
+        with span("server." + status):
+            current = status
+            while status == current:
+                time.sleep(poll_interval)
+                status = task.get_info().status
+    if status != "success":
+        raise RuntimeError("Server mode solve ended with status '{}'.".format(status))
+
+    with span("server.download"), tempfile.TemporaryDirectory() as tmp:
+        return task.get_result(to_file=os.path.join(tmp, "mode_solver_data.hdf5"), verbose=False)
+
+
+def solve(spec, server=False, cache=None):
+    """Build the waveguide described by ``spec`` and return its ``ModeSolverData``."""
+    return solve_waveguide(build_waveguide(spec), server=server, cache=cache, use_symmetry=spec.use_symmetry)
+
+
+def mode_properties(mode_data, freq_index=0):
+    """Extract the scalar properties of every mode at one frequency.
+
+    Returns a list with one dictionary per mode, keyed by ``MODE_PROPERTIES``.
+    """
+    columns = {
+        "n_eff": mode_data.n_eff.values[freq_index],
+        "k_eff": mode_data.k_eff.values[freq_index],
+        "n_group": mode_data.n_group.values[freq_index],
+        "te_fraction": mode_data.pol_fraction.te.values[freq_index],
+        "tm_fraction": mode_data.pol_fraction.tm.values[freq_index],
+        "mode_area": mode_data.mode_area.values[freq_index],
+    }
+    num_modes = len(columns["n_eff"])
+    return [
+        {name: float(columns[name][mode_index]) for name in MODE_PROPERTIES}
+        for mode_index in range(num_modes)
+    ]
+
+
+def load_specs(path):
+    """Read a list of waveguide specs from a JSON or CSV file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path) as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows.get("specs", [rows])
+    return [WaveguideSpec.from_dict(row) for row in rows]
+
+
+def write_results(path, rows):
+    """Write result rows to a JSON or CSV file, depending on the file extension."""
+    if path.lower().endswith(".csv"):
+        fieldnames = []
+        for row in rows:
+            for key in row:
+                if key not in fieldnames:
+                    fieldnames.append(key)
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def run_batch(specs, server=False, cache=None, log=None):
+    """Solve a list of specs one after the other and return flat result rows.
+
+    Each row holds the spec index, the spec fields, the mode index and the mode
+    properties.  A spec that fails to build or solve produces a single row with
+    an ``error`` entry instead of aborting the batch.
+    """
+    rows = []
+    for spec_index, spec in enumerate(specs):
+        base = {"spec_index": spec_index}
+        base.update(spec.to_dict())
+        try:
+            mode_data = solve(spec, server=server, cache=cache)
+        except Exception as e:
+            if log is not None:
+                log.write("Spec {} failed: {}\n".format(spec_index, e))
+                log.write(traceback.format_exc())
+            row = dict(base)
+            row["error"] = str(e)
+            rows.append(row)
+            continue
+
+        for mode_index, props in enumerate(mode_properties(mode_data)):
+            row = dict(base)
+            row["mode_index"] = mode_index
+            row.update(props)
+            rows.append(row)
+
+        if log is not None:
+            log.write("Solved spec {} of {}\n".format(spec_index + 1, len(specs)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m waveguide_solver",
+        description="Solve a batch of waveguide cross-sections without the GUI.",
+    )
+    parser.add_argument("specs", help="JSON or CSV file with one waveguide spec per entry")
+    parser.add_argument("-o", "--output", default=None,
+                        help="JSON or CSV file for the results (default: <specs>_results.json)")
+    parser.add_argument("--server", action="store_true",
+                        help="solve on the Flexcompute server instead of locally")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory of the result cache (default: ~/.cache/tidy3d-mode-explorer)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always solve, without reading or writing the result cache")
+    parser.add_argument("--auto-window", type=float, default=None, metavar="TOLERANCE",
+                        help="size the cladding, box and lateral margins from the evanescent decay "
+                             "to this field tolerance (e.g. 1e-3)")
+    parser.add_argument("--trace", default=None,
+                        help="write the timed solve phases to this Chrome trace JSON file")
+    parser.add_argument("--profile", default=None,
+                        help="write a cProfile dump of the batch to this file")
+    args = parser.parse_args(argv)
+
+    output = args.output
+    if output is None:
+        output = os.path.splitext(args.specs)[0] + "_results.json"
+
+    cache = None if args.no_cache else SolveCache(args.cache_dir)
+
+    specs = load_specs(args.specs)
+    if args.auto_window is not None:
+        from window import auto_window, saved_cells
+
+        windowed = [auto_window(spec, args.auto_window) for spec in specs]
+        manual, auto = map(sum, zip(*(saved_cells(spec, w) for spec, w in zip(specs, windowed))))
+        sys.stderr.write("Auto window: {} grid cells instead of {} ({:.0%} saved)\n".format(
+            auto, manual, 1 - auto / manual))
+        specs = windowed
+    if args.profile is not None:
+        with cprofile(args.profile):
+            rows = run_batch(specs, server=args.server, cache=cache, log=sys.stderr)
+    else:
+        rows = run_batch(specs, server=args.server, cache=cache, log=sys.stderr)
+    if args.trace is not None:
+        PROFILER.write_chrome_trace(args.trace)
+    write_results(output, rows)
+
+    if cache is not None:
+        stats = cache.stats()
+        sys.stderr.write("Cache: {} hits, {} misses\n".format(stats["hits"], stats["misses"]))
+
+    failed = sum(1 for row in rows if "error" in row)
+    sys.stderr.write("Wrote {} rows to {} ({} failed specs)\n".format(len(rows), output, failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
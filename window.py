@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Computational window sizing from the evanescent decay of the mode.
+
+Outside the core the guided field decays as ``exp(-gamma d)`` with
+``gamma = k0 sqrt(n_eff^2 - n^2)``.  :func:`auto_window` estimates n_eff
+with the effective index method and sets the cladding and box thicknesses
+and the lateral margin so that the field has decayed to ``tolerance`` (a
+fraction of its amplitude at the core boundary) at the window edges::
+
+    windowed = auto_window(spec, tolerance=1e-3)
+    saved_cells(spec, windowed)
+
+The window fits the less confined of the guided TE- and TM-like
+fundamental modes.  Higher-order modes closer to cutoff
+decay more slowly; use a smaller tolerance when solving several modes.
+"""
+import math
+
+import numpy as np
+
+from effective_index import estimate_spec, slab_neff
+from mesh_refinement import grid_shape
+from waveguide_solver import build_waveguide
+
+# Field amplitude at the window edge relative to the core boundary
+DEFAULT_WINDOW_TOLERANCE = 1e-3
+
+# Bounds of the automatic cladding, box and lateral margins, in um
+MIN_MARGIN = 0.2
+MAX_MARGIN = 10.0
+
+
+def decay_length(n_eff, index, wavelength):
+    """Evanescent 1/e field decay length (um) in a medium of the given index.
+
+    Infinite where the mode is not guided, i.e. ``n_eff <= index``.
+    """
+    n_eff, index = np.broadcast_arrays(np.asarray(n_eff, dtype=float), np.asarray(index, dtype=float))
+    k0 = 2 * math.pi / np.asarray(wavelength, dtype=float)
+    with np.errstate(divide="ignore"):
+        return np.where(n_eff > index, 1 / (k0 * np.sqrt(np.maximum(n_eff**2 - index**2, 0))), np.inf)
+
+
+def window_margins(spec, tolerance=DEFAULT_WINDOW_TOLERANCE):
+    """Cladding thickness, box thickness and lateral margin (um) for a spec.
+
+    Returns a dictionary of :class:`waveguide_solver.WaveguideSpec` fields,
+    or an empty one if the estimate finds no guided mode.
+    """
+    if not 0 < tolerance < 1:
+        raise ValueError("The window tolerance must be between 0 and 1.")
+    # The field beside the core sits in the rib slab, or in the cladding and box stack
+    slab_thickness = spec.slab_thickness if spec.waveguide_type == "rib" else 0.0
+    decays = []
+    for polarization, n_eff in zip(("TE", "TM"), estimate_spec(spec)):
+        n_side = float(slab_neff([spec.box_index, spec.core_index, spec.clad_index], [slab_thickness],
+                                 spec.wavelength, polarization))
+        decay = decay_length(n_eff, [spec.clad_index, spec.box_index, n_side], spec.wavelength)
+        if np.all(np.isfinite(decay)):
+            decays.append(decay)
+    if not decays:
+        return {}
+    # The less confined polarization needs the larger window
+    clad, box, side = np.clip(np.max(decays, axis=0) * math.log(1 / tolerance), MIN_MARGIN, MAX_MARGIN)
+    return {"clad_thickness": float(clad), "box_thickness": float(box), "side_margin": float(side)}
+
+
+def auto_window(spec, tolerance=DEFAULT_WINDOW_TOLERANCE):
+    """Copy of ``spec`` with the window sized from the evanescent decay.
+
+    The spec is returned unchanged if the estimate finds no guided mode.
+    """
+    return spec.replace(**window_margins(spec, tolerance))
+
+
+def grid_cells(spec):
+    """Number of cells of the mode solver grid of a spec."""
+    return int(np.prod(grid_shape(build_waveguide(spec))))
+
+
+def saved_cells(spec, windowed):
+    """``(manual_cells, windowed_cells)`` of a spec and its automatic window."""
+    return grid_cells(spec), grid_cells(windowed)